@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the crawl + processing path (no Reddit credentials needed).
+
+What it does
+- Drives the real code against fakereddit.FakeReddit (synthetic corpus or a recorded fixture); the
+  API-path benchmarks (run_e2e, crawl_comments) go through fakereddit.replay_reddit, so praw's
+  requestor, JSON parsing, object construction and rate limiter are part of what is timed
+- Benchmarks: run() end-to-end, crawl_comments_for_submission, RotatingWriter (csv/json),
+  buffered comment rows (memory per row), find_subreddits_for_topics, cleaner.clean_posts,
+  preprocess.preprocess, sentiment scoring
+- Benchmarks whose optional dependency is missing are reported as "skipped", not failed
+- Writes machine-readable JSON (min/median/mean seconds, rows/s, optional peak memory + GC runs)
+- --baseline compares medians against an earlier run and exits 1 on regressions
+- `imports` times `python -X importtime -c "import <module>"` for the entry points and fails if
+  one of them pulls in torch / sentence_transformers / sklearn / nltk / pandas at load time
+
+Usage
+  python benchmark.py -o out/bench.json
+  python benchmark.py --only clean_posts preprocess --repeat 5 --posts 5000
+  python benchmark.py --baseline out/bench_main.json --tolerance 0.2
+  python benchmark.py --fixture fixtures/python.json
+  python benchmark.py record --subreddit python --limit 50 -o fixtures/python.json   # needs .env
+  python benchmark.py imports -o out/imports.json --baseline out/imports_main.json   # startup time
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+from fakereddit import FakeReddit
+
+# A benchmark is setup(ctx) -> (fn, rows); fn() is what gets timed.
+Bench = Callable[["Context"], Tuple[Callable[[], Any], int]]
+
+class Context:
+    def __init__(self, reddit: FakeReddit, workdir: str):
+        self.reddit = reddit
+        self.workdir = workdir
+        self._posts: Optional[List[Dict[str, Any]]] = None
+        self._replay = None
+
+    def replay(self):
+        """Real praw.Reddit over the same corpus (fakereddit.replay_reddit)."""
+        if self._replay is None:
+            from fakereddit import replay_reddit
+            self._replay = replay_reddit(self.reddit)
+        return self._replay
+
+    @property
+    def subreddits(self) -> List[str]:
+        return list(self.reddit._subs)
+
+    def submissions(self):
+        return [s for sub in self.reddit._subs.values() for s in sub._posts]
+
+    def post_rows(self) -> List[Dict[str, Any]]:
+        if self._posts is None:
+            from redditCrawler import flatten_submission
+            self._posts = [flatten_submission(s) for s in self.submissions()]
+        return self._posts
+
+    def posts_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.post_rows())
+
+# ---------------- Benchmarks ----------------
+
+def bench_run(ctx: Context):
+    from redditCrawler import RedditClient, run
+    out_dir = os.path.join(ctx.workdir, "run_out")
+    cfg_path = os.path.join(ctx.workdir, "bench_config.yaml")
+    with open(cfg_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump({
+            "subreddits": ctx.subreddits, "query": "", "since": "", "until": "",
+            "max_posts_per_subreddit": 0, "fetch_comments": True, "comment_depth": "all",
+            "out_dir": out_dir, "format": "csv", "rotate_every_n_posts": 2000,
+            "sleep_between_requests_ms": 0, "metrics": {"json_path": ""},
+        }, f)
+    args = SimpleNamespace(config=cfg_path, subreddit=None)
+    rows = len(ctx.post_rows()) + sum(len(s._raw.get("comments", [])) for s in ctx.submissions())
+    return (lambda: run(args, rc=RedditClient(reddit=ctx.replay()))), rows
+
+def bench_crawl_comments(ctx: Context):
+    from redditCrawler import crawl_comments_for_submission
+    subs = ctx.submissions()
+    reddit = ctx.replay()
+
+    def fn():
+        for s in subs:
+            # a fresh lazy submission each time: /comments/<id> is fetched and parsed by praw
+            crawl_comments_for_submission(reddit.submission(id=s.id), max_comments=0, sleep_ms=0,
+                                          depth_limit=None, subreddit=s.subreddit.display_name)
+    return fn, sum(len(s._raw.get("comments", [])) for s in subs)
+
+def _bench_writer(fmt: str):
+    def setup(ctx: Context):
+        from redditCrawler import RotatingWriter
+        rows = ctx.post_rows()
+
+        def fn():
+            w = RotatingWriter(os.path.join(ctx.workdir, f"writer_{fmt}"), "posts", fmt, 2000)
+            for r in rows:
+                w.add(r)
+            w.flush()
+        return fn, len(rows)
+    return setup
+
+def bench_buffer_rows(ctx: Context):
+    """Every comment flattened and held at once, like a RotatingWriter buffer before a flush."""
+    from redditCrawler import flatten_comment
+    comments = [(c, s.id, s.subreddit.display_name) for s in ctx.submissions() for c in s.comments.list()]
+
+    def fn():
+        buffer = [flatten_comment(c, sid, sub) for c, sid, sub in comments]
+        return len(buffer)
+    return fn, len(comments)
+
+def bench_find_subreddits(ctx: Context):
+    from subredditSelector import find_subreddits_for_topics
+    topics = ["python release", "race driver season", "gpu benchmark"]
+    return (lambda: find_subreddits_for_topics(ctx.reddit, topics, max_per_topic=3,
+                                               min_subscribers=0, cache_path=None)), len(topics)
+
+def bench_clean_posts(ctx: Context):
+    from cleaner import clean_posts
+    df = ctx.posts_frame()
+    return (lambda: clean_posts(df.copy(), None, None, None, None, False, "", verbose=False)), len(df)
+
+def bench_preprocess(ctx: Context):
+    from preprocess import preprocess
+    df = ctx.posts_frame()
+    return (lambda: preprocess(df.copy())), len(df)
+
+def bench_sentiment(ctx: Context):
+    from preprocess import preprocess
+    from sentiment import add_sentiment, analyzer
+    analyzer()  # LookupError here (no vader lexicon offline) → reported as skipped
+    df = preprocess(ctx.posts_frame())
+    return (lambda: add_sentiment(df.copy())), len(df)
+
+BENCHMARKS: Dict[str, Bench] = {
+    "run_e2e": bench_run,
+    "crawl_comments": bench_crawl_comments,
+    "rotating_writer_csv": _bench_writer("csv"),
+    "rotating_writer_json": _bench_writer("json"),
+    "buffer_rows": bench_buffer_rows,
+    "find_subreddits": bench_find_subreddits,
+    "clean_posts": bench_clean_posts,
+    "preprocess": bench_preprocess,
+    "sentiment": bench_sentiment,
+}
+
+# ---------------- Runner ----------------
+
+def _quiet(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """Silences stdout/stderr chatter (prints, tqdm) while timing."""
+    def wrapped():
+        with open(os.devnull, "w") as devnull:
+            old = sys.stdout, sys.stderr
+            sys.stdout = sys.stderr = devnull
+            try:
+                return fn()
+            finally:
+                sys.stdout, sys.stderr = old
+    return wrapped
+
+def run_benchmark(name: str, setup: Bench, ctx: Context, repeat: int, memory: bool) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"name": name}
+    try:
+        fn, rows = _quiet(lambda: setup(ctx))()
+    except ImportError as e:
+        return {**result, "status": "skipped", "reason": f"missing dependency: {e.name or e}"}
+    except LookupError as e:
+        # nltk data (e.g. vader_lexicon) not available offline
+        what = next((l.strip() for l in str(e).splitlines() if "Resource" in l), "nltk data")
+        return {**result, "status": "skipped", "reason": f"missing resource: {what}"}
+    except Exception as e:
+        return {**result, "status": "error", "reason": f"{type(e).__name__}: {e}"}
+    fn = _quiet(fn)
+
+    try:
+        fn()  # warm-up (imports, model load, file creation)
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        if memory:
+            gc_before = sum(g["collections"] for g in gc.get_stats())
+            tracemalloc.start()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["gc_collections"] = sum(g["collections"] for g in gc.get_stats()) - gc_before
+            result["peak_kb"] = round(peak / 1024, 1)
+            result["peak_bytes_per_row"] = round(peak / rows, 1) if rows else None
+    except ImportError as e:
+        return {**result, "status": "skipped", "reason": f"missing dependency: {e.name or e}"}
+    except Exception as e:
+        return {**result, "status": "error", "reason": f"{type(e).__name__}: {e}"}
+
+    med = statistics.median(times)
+    result.update({
+        "status": "ok",
+        "repeat": repeat,
+        "rows": rows,
+        "min_s": round(min(times), 6),
+        "median_s": round(med, 6),
+        "mean_s": round(statistics.fmean(times), 6),
+        "rows_per_s": round(rows / med, 1) if med > 0 else None,
+    })
+    return result
+
+# ---------------- Import time ----------------
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "sklearn", "nltk", "pandas")
+
+# module -> heavy modules it must not import at load time
+IMPORT_TARGETS = {
+    "cli": HEAVY_MODULES,
+    "redditCrawler": HEAVY_MODULES,
+    "topicCrawl": HEAVY_MODULES,
+    "subredditSelector": HEAVY_MODULES,
+    "sentiment": ("torch", "sentence_transformers", "sklearn", "nltk"),
+    "embeddings": ("torch", "sentence_transformers", "sklearn", "nltk"),
+}
+
+def measure_import(module: str, forbidden: Sequence[str], repeat: int) -> Dict[str, Any]:
+    """`python -X importtime -c "import <module>"` in a fresh interpreter, `repeat` times."""
+    result: Dict[str, Any] = {"name": f"import:{module}"}
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, imported = [], set()
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=here, capture_output=True, text=True)
+        if proc.returncode != 0:
+            last = (proc.stderr.strip().splitlines() or ["?"])[-1]
+            status = "skipped" if "ModuleNotFoundError" in last else "error"
+            return {**result, "status": status, "reason": last}
+        cumulative = None
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cum, name = line.split("|", 2)
+            name = name.strip()
+            imported.add(name.split(".")[0])
+            if name == module and cum.strip().isdigit():
+                cumulative = int(cum) / 1e6
+        if cumulative is not None:
+            times.append(cumulative)
+    if not times:
+        return {**result, "status": "error", "reason": "module not found in -X importtime output"}
+    med = statistics.median(times)
+    result.update({
+        "status": "ok",
+        "repeat": repeat,
+        "min_s": round(min(times), 6),
+        "median_s": round(med, 6),
+        "heavy_imports": sorted(h for h in forbidden if h in imported),
+    })
+    return result
+
+def run_import_benchmarks(repeat: int) -> Tuple[List[Dict[str, Any]], List[str]]:
+    results, problems = [], []
+    for module, forbidden in IMPORT_TARGETS.items():
+        r = measure_import(module, forbidden, repeat)
+        results.append(r)
+        if r["status"] != "ok":
+            print(f"[bench] {r['name']:<26} {r['status']}: {r.get('reason')}")
+            continue
+        print(f"[bench] {r['name']:<26} median={r['median_s']:.4f}s"
+              + (f"  heavy={','.join(r['heavy_imports'])}" if r["heavy_imports"] else ""))
+        if r["heavy_imports"]:
+            problems.append(f"{r['name']}: imports {', '.join(r['heavy_imports'])} at load time")
+    return results, problems
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {r["name"]: r for r in json.load(f).get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get(r["name"])
+        if r.get("status") != "ok" or not b or b.get("status") != "ok":
+            continue
+        ratio = r["median_s"] / b["median_s"] if b["median_s"] else 1.0
+        r["baseline_median_s"] = b["median_s"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > 1.0 + tolerance:
+            regressions.append(f"{r['name']}: {b['median_s']:.4f}s → {r['median_s']:.4f}s (x{ratio:.2f})")
+    return regressions
+
+def record_fixture(subreddit: List[str], limit: int, max_comments: int, output: str):
+    """Captures real listings through praw into the fakereddit fixture format."""
+    from redditCrawler import RedditClient, flatten_submission, flatten_comment
+    rc = RedditClient()
+    data: Dict[str, Any] = {"subreddits": {}}
+    for name in subreddit:
+        sr = rc.reddit.subreddit(name)
+        posts = []
+        for s in sr.new(limit=limit):
+            p = flatten_submission(s)._asdict()
+            s.comments.replace_more(limit=0)
+            p["comments"] = [flatten_comment(c, s.id, name)._asdict() for c in s.comments.list()[:max_comments]]
+            posts.append(p)
+        data["subreddits"][name] = {
+            "title": getattr(sr, "title", name), "public_description": getattr(sr, "public_description", ""),
+            "subscribers": getattr(sr, "subscribers", 0), "lang": getattr(sr, "lang", None), "posts": posts,
+        }
+        print(f"[record] r/{name}: {len(posts)} posts")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    print(f"[write] fixture → {output}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmarks against a fake Reddit API.")
+    ap.add_argument("cmd", nargs="?", choices=["run", "record", "imports"], default="run")
+    ap.add_argument("-o", "--output", default="out/bench.json", help="Results JSON (default: out/bench.json)")
+    ap.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed repetitions per benchmark (default: 3)")
+    ap.add_argument("--memory", action="store_true", help="Also record peak traced memory (one extra run)")
+    ap.add_argument("--fixture", help="Recorded fixture JSON instead of synthetic data")
+    ap.add_argument("--subreddits", type=int, default=3, help="Synthetic subreddits (default: 3)")
+    ap.add_argument("--posts", type=int, default=500, help="Synthetic posts per subreddit (default: 500)")
+    ap.add_argument("--comments", type=int, default=20, help="Mean synthetic comments per post (default: 20)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Fake delay per page/comment fetch")
+    ap.add_argument("--baseline", help="Earlier results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed median slowdown vs baseline (default: 0.25)")
+    ap.add_argument("--subreddit", nargs="+", help="[record] subreddits to capture")
+    ap.add_argument("--limit", type=int, default=50, help="[record] posts per subreddit (default: 50)")
+    ap.add_argument("--max-comments", type=int, default=200, help="[record] comments per post (default: 200)")
+    args = ap.parse_args()
+
+    if args.cmd == "record":
+        if not args.subreddit:
+            ap.error("record needs --subreddit")
+        record_fixture(args.subreddit, args.limit, args.max_comments, args.output)
+        return
+
+    if args.cmd == "imports":
+        # startup cost: fails on heavy modules imported at load time or (with --baseline) slowdowns
+        results, problems = run_import_benchmarks(args.repeat)
+        problems += compare(results, args.baseline, args.tolerance) if args.baseline else []
+        _write_report(args.output, {"python": platform.python_version(), "repeat": args.repeat}, results, problems)
+        return
+
+    if args.fixture:
+        reddit = FakeReddit.from_fixture(args.fixture, latency_ms=args.latency_ms)
+        source = {"fixture": args.fixture}
+    else:
+        reddit = FakeReddit.synthetic(args.subreddits, args.posts, args.comments, args.seed,
+                                      latency_ms=args.latency_ms)
+        source = {"synthetic": {"subreddits": args.subreddits, "posts": args.posts,
+                                "comments": args.comments, "seed": args.seed}}
+
+    names = args.only or list(BENCHMARKS)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        ctx = Context(reddit, workdir)
+        for name in names:
+            r = run_benchmark(name, BENCHMARKS[name], ctx, args.repeat, args.memory)
+            results.append(r)
+            if r["status"] == "ok":
+                print(f"[bench] {name:<22} median={r['median_s']:.4f}s  rows/s={r['rows_per_s']}")
+            else:
+                print(f"[bench] {name:<22} {r['status']}: {r.get('reason')}")
+
+    regressions = compare(results, args.baseline, args.tolerance) if args.baseline else []
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "source": source,
+        "repeat": args.repeat,
+        "latency_ms": args.latency_ms,
+    }
+    _write_report(args.output, meta, results, regressions)
+
+def _write_report(output: str, meta: Dict[str, Any], results: List[Dict[str, Any]], regressions: List[str]):
+    report = {
+        "meta": {"timestamp_utc": int(time.time()), **meta},
+        "results": results,
+        "regressions": regressions,
+    }
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"[write] → {output}")
+
+    if regressions:
+        print("[bench] regressions vs baseline:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
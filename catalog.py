@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Local SQLite catalog over crawler output for fast filtered queries.
+
+What it does
+- Ingests posts.partNNN / comments.partNNN files (CSV or NDJSON) into tables posts / comments
+- Remembers every ingested file (path, size, mtime), so re-runs only load new or changed parts
+- Upserts by id, so overlapping crawls don't duplicate rows
+- Flags (over_18, stickied, ...) are stored as INTEGER 0/1 whatever the part format wrote
+  ("False", false, "0") and come back from query_posts / query_comments as bools
+- Indexes subreddit (case-insensitive), created_utc, id and submission_id
+- query_posts / query_comments push since / until / subreddits / min_score down into SQL,
+  so a filter touches only the matching index range instead of every CSV part
+
+Usage
+  python catalog.py ingest out/catalog.db "out/posts.part*.csv" "out/comments.part*.csv"
+  python catalog.py query out/catalog.db --subreddits formula1 --since 2025-01-01 --min-score 10 -o out/f1.csv
+  python cleaner.py "out/posts.part*.csv" -o out/f1_clean.csv --catalog out/catalog.db --subreddits formula1
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# Same fields as redditCrawler.flatten_submission / flatten_comment
+POST_COLUMNS = [
+    ("kind", "TEXT"), ("id", "TEXT PRIMARY KEY"), ("subreddit", "TEXT COLLATE NOCASE"),
+    ("author", "TEXT"), ("title", "TEXT"), ("selftext", "TEXT"), ("url", "TEXT"),
+    ("is_self", "INTEGER"), ("over_18", "INTEGER"), ("spoiler", "INTEGER"), ("stickied", "INTEGER"),
+    ("locked", "INTEGER"), ("upvote_ratio", "REAL"), ("ups", "INTEGER"), ("downs", "INTEGER"),
+    ("score", "INTEGER"), ("num_comments", "INTEGER"), ("created_utc", "INTEGER"),
+    ("link_flair_text", "TEXT"), ("edited", "TEXT"), ("permalink", "TEXT"),
+    ("source_file", "TEXT"),
+]
+COMMENT_COLUMNS = [
+    ("kind", "TEXT"), ("id", "TEXT PRIMARY KEY"), ("subreddit", "TEXT COLLATE NOCASE"),
+    ("submission_id", "TEXT"), ("author", "TEXT"), ("body", "TEXT"), ("score", "INTEGER"),
+    ("created_utc", "INTEGER"), ("is_submitter", "INTEGER"), ("parent_id", "TEXT"),
+    ("permalink", "TEXT"), ("depth", "INTEGER"),
+    ("source_file", "TEXT"),
+]
+TABLES = {"posts": POST_COLUMNS, "comments": COMMENT_COLUMNS}
+FLAG_COLUMNS = ("is_self", "over_18", "spoiler", "stickied", "locked", "is_submitter")
+
+SCHEMA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS posts_sub_created ON posts(subreddit, created_utc)",
+    "CREATE INDEX IF NOT EXISTS posts_created ON posts(created_utc)",
+    "CREATE INDEX IF NOT EXISTS posts_source ON posts(source_file)",
+    "CREATE INDEX IF NOT EXISTS comments_submission ON comments(submission_id)",
+    "CREATE INDEX IF NOT EXISTS comments_sub_created ON comments(subreddit, created_utc)",
+]
+
+# -----------------------
+# Connection / schema
+# -----------------------
+
+def connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for table, cols in TABLES.items():
+        ddl = ", ".join(f"{name} {typ}" for name, typ in cols)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({ddl})")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ingested_files ("
+        "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, rows INTEGER, ingested_utc INTEGER)"
+    )
+    for ddl in SCHEMA_INDEXES:
+        conn.execute(ddl)
+    conn.commit()
+    return conn
+
+# -----------------------
+# Ingest
+# -----------------------
+
+def _iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        csv.field_size_limit(sys.maxsize)
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                # CSV has no nulls; empty cells become NULL
+                yield {k: (v if v != "" else None) for k, v in row.items()}
+
+def _flag(v: Any) -> Optional[int]:
+    """True / "True" / "true" / 1 / "1" → 1, their False counterparts → 0, missing → None."""
+    if v is None or v == "" or v != v:  # v != v: NaN from pandas
+        return None
+    if isinstance(v, str):
+        return 1 if v.strip().lower() in ("true", "1", "yes") else 0
+    return int(bool(v))
+
+def _table_for(path: str, first_row: Dict[str, Any]) -> Optional[str]:
+    kind = first_row.get("kind")
+    if kind == "submission":
+        return "posts"
+    if kind == "comment":
+        return "comments"
+    base = os.path.basename(path).lower()
+    if base.startswith("posts"):
+        return "posts"
+    if base.startswith("comments"):
+        return "comments"
+    return None
+
+def ingest_file(conn: sqlite3.Connection, path: str, force: bool = False) -> int:
+    """Loads one crawler part file. Returns rows loaded (0 if already up to date)."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    prev = conn.execute("SELECT size, mtime FROM ingested_files WHERE path = ?", (path,)).fetchone()
+    if prev and not force and prev[0] == st.st_size and prev[1] == st.st_mtime:
+        return 0
+
+    rows = _iter_rows(path)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    table = _table_for(path, first)
+    if table is None:
+        print(f"[warn] cannot tell posts from comments for {path}; skipped", file=sys.stderr)
+        return 0
+
+    names = [n for n, _ in TABLES[table]]
+    sql = f"INSERT OR REPLACE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    source = os.path.basename(path)
+
+    flags = [n for n in names if n in FLAG_COLUMNS]
+
+    def _values(r: Dict[str, Any]) -> Tuple:
+        r["source_file"] = source
+        for f in flags:
+            r[f] = _flag(r.get(f))
+        return tuple(r.get(n) for n in names)
+
+    n = 0
+    with conn:
+        batch = [_values(first)]
+        for r in rows:
+            batch.append(_values(r))
+            if len(batch) >= 5000:
+                conn.executemany(sql, batch)
+                n += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            n += len(batch)
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (path, size, mtime, rows, ingested_utc) VALUES (?, ?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime, n, int(datetime.now(timezone.utc).timestamp())),
+        )
+    return n
+
+def ingest(conn: sqlite3.Connection, paths: Sequence[str], force: bool = False) -> int:
+    total = 0
+    for p in paths:
+        try:
+            n = ingest_file(conn, p, force=force)
+        except FileNotFoundError:
+            print(f"[warn] file not found: {p}", file=sys.stderr)
+            continue
+        except Exception as e:
+            print(f"[warn] failed to ingest {p}: {e}", file=sys.stderr)
+            continue
+        if n:
+            print(f"[catalog] {os.path.basename(p)}: {n} rows")
+        total += n
+    return total
+
+# -----------------------
+# Queries
+# -----------------------
+
+def to_epoch(value: Optional[str], end_of_day: bool = False) -> Optional[int]:
+    """YYYY-MM-DD or ISO8601 → epoch seconds (naive = UTC). Date-only + end_of_day → 23:59:59."""
+    if not value:
+        return None
+    if len(value) == 10 and end_of_day:
+        value = value + "T23:59:59"
+    d = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return int(d.timestamp())
+
+def _where(since: Optional[str], until: Optional[str], subreddits: Optional[List[str]],
+           min_score: Optional[int], source_files: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    if source_files:
+        clauses.append(f"source_file IN ({', '.join('?' * len(source_files))})")
+        params.extend(os.path.basename(p) for p in source_files)
+    lo, hi = to_epoch(since), to_epoch(until, end_of_day=True)
+    if subreddits:
+        clauses.append(f"subreddit IN ({', '.join('?' * len(subreddits))})")
+        params.extend(subreddits)
+    if lo is not None:
+        clauses.append("created_utc >= ?")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("created_utc <= ?")
+        params.append(hi)
+    if min_score is not None:
+        clauses.append("score >= ?")
+        params.append(min_score)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _query(conn: sqlite3.Connection, table: str, columns: Optional[List[str]], **filters) -> pd.DataFrame:
+    where, params = _where(**filters)
+    cols = ", ".join(columns) if columns else "*"
+    df = pd.read_sql_query(f"SELECT {cols} FROM {table}{where}", conn, params=params)
+    # catalogs created before flags were INTEGER hold "False" / "0" text: _flag reads both
+    for f in FLAG_COLUMNS:
+        if f in df.columns:
+            v = df[f].map(_flag)
+            df[f] = v.astype(bool) if v.notna().all() else v.map(lambda x: None if pd.isna(x) else bool(x))
+    return df
+
+def query_posts(conn: sqlite3.Connection,
+                since: Optional[str] = None,
+                until: Optional[str] = None,
+                subreddits: Optional[List[str]] = None,
+                min_score: Optional[int] = None,
+                columns: Optional[List[str]] = None,
+                source_files: Optional[List[str]] = None) -> pd.DataFrame:
+    """source_files: only rows last loaded from these part files (paths or basenames)."""
+    return _query(conn, "posts", columns, since=since, until=until, subreddits=subreddits, min_score=min_score,
+                  source_files=source_files)
+
+def query_comments(conn: sqlite3.Connection,
+                   since: Optional[str] = None,
+                   until: Optional[str] = None,
+                   subreddits: Optional[List[str]] = None,
+                   min_score: Optional[int] = None,
+                   columns: Optional[List[str]] = None,
+                   source_files: Optional[List[str]] = None) -> pd.DataFrame:
+    return _query(conn, "comments", columns, since=since, until=until, subreddits=subreddits, min_score=min_score,
+                  source_files=source_files)
+
+def expand_globs(patterns: Sequence[str]) -> List[str]:
+    paths: List[str] = []
+    for pat in patterns:
+        matched = sorted(glob.glob(pat))
+        if not matched:
+            print(f"[warn] no files matched pattern: {pat}", file=sys.stderr)
+        paths.extend(matched)
+    return paths
+
+# -----------------------
+# CLI
+# -----------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="SQLite catalog over crawler output.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ing = sub.add_parser("ingest", help="Load new/changed part files into the catalog")
+    ing.add_argument("db", help="Catalog path (e.g. out/catalog.db)")
+    ing.add_argument("inputs", nargs="+", help="Part files or glob patterns")
+    ing.add_argument("--force", action="store_true", help="Reload files even if unchanged")
+
+    q = sub.add_parser("query", help="Filter posts/comments with index pushdown")
+    q.add_argument("db", help="Catalog path")
+    q.add_argument("--table", choices=["posts", "comments"], default="posts")
+    q.add_argument("--since", default=None, help="YYYY-MM-DD or ISO8601 (inclusive)")
+    q.add_argument("--until", default=None, help="YYYY-MM-DD or ISO8601 (inclusive)")
+    q.add_argument("--subreddits", nargs="*", default=None, help="Subreddit names without r/")
+    q.add_argument("--min-score", type=int, default=None)
+    q.add_argument("-o", "--output", default=None, help="Write matches to CSV (default: print count + head)")
+    args = ap.parse_args()
+
+    conn = connect(args.db)
+    if args.cmd == "ingest":
+        n = ingest(conn, expand_globs(args.inputs), force=args.force)
+        print(f"[catalog] ingested {n} rows → {args.db}")
+        return
+
+    fn = query_posts if args.table == "posts" else query_comments
+    df = fn(conn, since=args.since, until=args.until, subreddits=args.subreddits, min_score=args.min_score)
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"[write] → {args.output} ({len(df)} rows)")
+    else:
+        print(f"[catalog] {len(df)} rows")
+        print(df.head(20).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Content centroids: what a subreddit actually posts, as one MiniLM vector per subreddit.
+
+What it does
+- Embeds a small sample (default 25) of a subreddit's most recent post titles and keeps their mean
+- Titles come from the catalog when the subreddit was crawled before (no API calls); otherwise from
+  one sr.new(limit=sample) listing, stickied posts skipped
+- Incremental: only titles newer than the newest one already folded in are fetched and encoded; the
+  centroid is a sliding mean over ~`sample` titles, so it follows the subreddit as it drifts
+- API samples are refreshed at most every max_age_s (default 3 days) per subreddit; subs with no usable
+  titles get an empty entry so they are not re-sampled every run either
+- subredditSelector.find_subreddits_for_topics blends topic·centroid similarity into _blend, so
+  subs whose description matches but whose posts don't (memes, shitposts, dead subs) sink
+- Cache: one .npz (names, mean vectors, counts, newest created_utc, last update)
+
+Usage
+  python centroids.py update --catalog out/catalog.db --subreddits formula1 nba
+  python centroids.py show --topic "formula one racing" --subreddits formula1 F1Technical formuladank
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CACHE_PATH = "out/sub_centroids.npz"
+
+def _name(sub: Any) -> str:
+    return sub if isinstance(sub, str) else str(sub.display_name)
+
+class ContentCentroids:
+    def __init__(self, path: Optional[str] = CACHE_PATH, sample: int = 25, max_age_s: int = 3 * 86400,
+                 catalog_db: Optional[str] = None, api_sample: bool = True):
+        self.path = path
+        self.sample = sample
+        self.max_age_s = max_age_s
+        self.catalog_db = catalog_db
+        self.api_sample = api_sample
+        self._conn = None
+        # lower-cased name → {"vec": mean (unnormalised), "n": titles in the mean, "newest": created_utc, "updated": utc}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            data = np.load(path, allow_pickle=False)
+            for i, name in enumerate(data["names"].tolist()):
+                self.entries[name] = {"vec": data["vecs"][i], "n": int(data["n"][i]),
+                                      "newest": int(data["newest"][i]), "updated": int(data["updated"][i])}
+
+    def save(self):
+        if not self.path or not self.entries:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        names = sorted(self.entries)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, names=np.array(names),
+                 vecs=np.stack([self.entries[k]["vec"] for k in names]).astype(np.float32),
+                 n=np.array([self.entries[k]["n"] for k in names], dtype=np.int64),
+                 newest=np.array([self.entries[k]["newest"] for k in names], dtype=np.int64),
+                 updated=np.array([self.entries[k]["updated"] for k in names], dtype=np.int64))
+        os.replace(tmp, self.path)
+
+    # ---- title sources ----
+
+    def _titles_catalog(self, name: str, after: int) -> List[Tuple[str, int]]:
+        if not self.catalog_db or not os.path.exists(self.catalog_db):
+            return []
+        if self._conn is None:
+            from catalog import connect
+            self._conn = connect(self.catalog_db)
+        return [(t, int(c)) for t, c in self._conn.execute(
+            "SELECT title, created_utc FROM posts WHERE subreddit = ? AND created_utc > ? "
+            "AND title IS NOT NULL AND title != '' ORDER BY created_utc DESC LIMIT ?",
+            (name, after, self.sample))]
+
+    def _titles_api(self, sr: Any, after: int) -> Optional[List[Tuple[str, int]]]:
+        """None when the listing failed (try again next run), [] when there was nothing new."""
+        out = []
+        try:
+            for s in sr.new(limit=self.sample):
+                created = int(getattr(s, "created_utc", 0) or 0)
+                if created <= after:
+                    break  # newest first: the rest is already folded in
+                if not getattr(s, "stickied", False) and getattr(s, "title", ""):
+                    out.append((str(s.title), created))
+        except Exception:
+            return None
+        return out
+
+    # ---- update / read ----
+
+    def refresh(self, model, subs: Sequence[Any], now: Optional[float] = None) -> int:
+        """
+        Folds new titles of `subs` (names or praw Subreddits; only the latter can be sampled through
+        the API) into their centroids with one batched encode. Returns the number of titles encoded.
+        """
+        now = int(now or time.time())
+        pending: Dict[str, List[Tuple[str, int]]] = {}
+        empty: List[str] = []  # sampled, but no usable titles (dead or all-stickied subs)
+        for sub in subs:
+            name = _name(sub)
+            key = name.lower()
+            e = self.entries.get(key)
+            after = e["newest"] if e else 0
+            rows = self._titles_catalog(name, after)
+            api_due = e is None or now - e["updated"] >= self.max_age_s
+            if not rows and self.api_sample and not isinstance(sub, str) and api_due:
+                api_rows = self._titles_api(sub, after)
+                rows = api_rows or []
+                if api_rows is not None:
+                    # don't ask again before max_age_s, even if nothing was new
+                    if e is not None:
+                        e["updated"] = now
+                    elif not rows:
+                        empty.append(key)
+            if rows:
+                pending[key] = rows
+
+        titles = [t for rows in pending.values() for t, _ in rows]
+        vecs = np.asarray(model.encode(titles, normalize_embeddings=True), dtype=np.float32) if titles else None
+        if empty:
+            # n=0 entries: no centroid (see vectors), but the sub isn't sampled again before max_age_s
+            dim = (vecs.shape[1] if vecs is not None
+                   else next((len(e["vec"]) for e in self.entries.values()), None)
+                   or model.get_sentence_embedding_dimension())
+            for key in empty:
+                self.entries[key] = {"vec": np.zeros(dim, dtype=np.float32), "n": 0, "newest": 0, "updated": now}
+        if vecs is None:
+            return 0
+        i = 0
+        for key, rows in pending.items():
+            batch = vecs[i:i + len(rows)]
+            i += len(rows)
+            e = self.entries.get(key)
+            m = len(rows)
+            if e and e["n"]:
+                keep = min(e["n"], max(self.sample - m, 0))  # sliding window over ~sample titles
+                vec = (keep * e["vec"] + batch.sum(axis=0)) / (keep + m)
+                n = keep + m
+            else:
+                vec, n = batch.mean(axis=0), m
+            newest = max(max(c for _, c in rows), e["newest"] if e else 0)
+            self.entries[key] = {"vec": vec.astype(np.float32), "n": n, "newest": newest, "updated": now}
+        return len(titles)
+
+    def vectors(self, subs: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """(len(subs), dim) L2-normalised centroids and a mask of which subs have one."""
+        got = [self.entries.get(_name(s).lower()) for s in subs]
+        dim = next((len(e["vec"]) for e in got if e), 0)
+        out = np.zeros((len(subs), dim), dtype=np.float32)
+        mask = np.array([bool(e and e["n"]) for e in got], dtype=bool)
+        for j, e in enumerate(got):
+            if mask[j]:
+                out[j] = e["vec"] / max(float(np.linalg.norm(e["vec"])), 1e-12)
+        return out, mask
+
+# ---------------- CLI ----------------
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Per-subreddit content centroids from recent post titles.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    up = sub.add_parser("update", help="Fold new titles into the centroids")
+    up.add_argument("--subreddits", nargs="+", required=True)
+    up.add_argument("--no-api", action="store_true", help="Catalog titles only (no Reddit calls)")
+    sh = sub.add_parser("show", help="Cosine similarity of a topic to each subreddit's centroid")
+    sh.add_argument("--topic", required=True)
+    sh.add_argument("--subreddits", nargs="+", required=True)
+    for p in (up, sh):
+        p.add_argument("--cache", default=CACHE_PATH)
+        p.add_argument("--catalog", default=None, help="Catalog DB with crawled posts (see catalog.py)")
+        p.add_argument("--sample", type=int, default=25)
+    args = ap.parse_args(argv)
+
+    from embeddings import load_model
+    model = load_model()
+    cc = ContentCentroids(args.cache, sample=args.sample, catalog_db=args.catalog,
+                          api_sample=args.cmd == "update" and not args.no_api)
+    if args.cmd == "update":
+        subs: List[Any] = list(args.subreddits)
+        if cc.api_sample:
+            from topicCrawl import get_reddit
+            reddit = get_reddit()
+            subs = [reddit.subreddit(s) for s in subs]
+        n = cc.refresh(model, subs)
+        cc.save()
+        print(f"[centroids] encoded {n} title(s); {len(cc.entries)} subreddit(s) in {args.cache}")
+        return
+
+    topic = np.asarray(model.encode([args.topic], normalize_embeddings=True), dtype=np.float32)[0]
+    vecs, mask = cc.vectors(args.subreddits)
+    for s, v, ok in zip(args.subreddits, vecs, mask):
+        e = cc.entries.get(s.lower())
+        print(f"  r/{s:<24} " + (f"sim={float(v @ topic):.3f} titles={e['n']}" if ok else "no centroid"))
+
+if __name__ == "__main__":
+    main()
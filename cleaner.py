@@ -10,6 +10,9 @@ Features:
 - Drops duplicates (by id, then permalink)
 - Optional: filter by date / subreddit / min score
 - Optional: anonymize authors (salted hash)
+- Optional: --catalog DB ingests new parts into a SQLite catalog (catalog.py) and pushes the
+  date / subreddit / min score filters down into it instead of reading every CSV; with inputs, only
+  their rows are returned, without inputs the whole catalog is
 - Outputs CSV (default) or Parquet
 
 Usage examples:
@@ -22,6 +25,13 @@ Usage examples:
   # Filter to Jan–Sept 2025 and r/formula1 only, min score 1
   python clean_reddit_csv.py "out/posts.part*.csv" -o out/f1_clean.csv \
       --since 2025-01-01 --until 2025-09-11 --subreddits formula1 --min-score 1
+
+  # Same filter, answered from the catalog (only new parts are loaded into it)
+  python clean_reddit_csv.py "out/posts.part*.csv" -o out/f1_clean.csv --catalog out/catalog.db \
+      --since 2025-01-01 --until 2025-09-11 --subreddits formula1 --min-score 1
+
+  # Everything ingested so far
+  python clean_reddit_csv.py -o out/all_clean.csv --catalog out/catalog.db
 """
 import argparse
 import glob
@@ -80,7 +90,8 @@ def clean_posts(df: pd.DataFrame,
                 subs: Optional[List[str]],
                 min_score: Optional[int],
                 anonymize_authors: bool,
-                salt: str) -> pd.DataFrame:
+                salt: str,
+                verbose: bool = True) -> pd.DataFrame:
     before = len(df)
 
     # Normalize key columns if present
@@ -145,13 +156,14 @@ def clean_posts(df: pd.DataFrame,
     df = df[cols]
 
     after = len(df)
-    print(f"[summary] rows in: {before}  →  rows out: {after}  (dropped {before - after})")
+    if verbose:
+        print(f"[summary] rows in: {before}  →  rows out: {after}  (dropped {before - after})")
     return df
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     ap = argparse.ArgumentParser(description="Clean Reddit crawler CSV exports.")
-    ap.add_argument("inputs", nargs="+", help="Input CSV file(s) or glob pattern(s). e.g. out/posts.part001.csv or 'out/posts.part*.csv'")
+    ap.add_argument("inputs", nargs="*", help="Input CSV file(s) or glob pattern(s). e.g. out/posts.part001.csv or 'out/posts.part*.csv'")
     ap.add_argument("-o", "--output", required=True, help="Output file path (e.g., out/posts_clean.csv or .parquet)")
     ap.add_argument("--format", choices=["csv", "parquet"], default=None, help="Force output format (default inferred from extension)")
     ap.add_argument("--since", help="Keep rows on/after this date/time (YYYY-MM-DD or ISO8601)", default=None)
@@ -160,7 +172,12 @@ def main():
     ap.add_argument("--min-score", type=int, help="Keep only rows with score >= N", default=None)
     ap.add_argument("--anonymize-authors", action="store_true", help="Replace author with salted hash")
     ap.add_argument("--salt", default="change_me_salt", help="Salt used when anonymizing authors")
-    args = ap.parse_args()
+    ap.add_argument("--catalog", default=None,
+                    help="SQLite catalog (see catalog.py); inputs are ingested incrementally and filters pushed "
+                         "down. Output covers the inputs only, or the whole catalog when no inputs are given")
+    args = ap.parse_args(argv)
+    if not args.inputs and not args.catalog:
+        ap.error("give input file(s) and/or --catalog")
 
     # Expand globs
     paths: List[str] = []
@@ -169,10 +186,18 @@ def main():
         if not matched:
             print(f"[warn] no files matched pattern: {pat}", file=sys.stderr)
         paths.extend(matched)
-    if not paths:
+    if args.inputs and not paths:
         raise SystemExit("[error] no input files found.")
-
-    df = _read_many(paths)
+    if args.catalog:
+        from catalog import connect, ingest, query_posts
+        conn = connect(args.catalog)
+        ingest(conn, paths)
+        df = query_posts(conn, since=args.since, until=args.until,
+                         subreddits=args.subreddits, min_score=args.min_score,
+                         source_files=paths or None)
+        df = df.rename(columns={"source_file": "__source_file"})
+    else:
+        df = _read_many(paths)
 
     df = clean_posts(
         df,
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+One entry point for the crawler tools. Each subcommand imports only its own module, so
+`crawl` never pays for torch / sentence_transformers and `--help` returns instantly.
+
+Usage
+  python -m cli crawl --config config.yaml [--subreddit python datascience]
+  python -m cli topic
+  python -m cli clean "out/posts.part*.csv" -o out/posts_clean.csv
+  python -m cli preprocess -i out/posts_clean.csv -o out/posts_preprocessed.csv
+  python -m cli sentiment -i out/posts_preprocessed.csv -o out/with_sentiment.csv
+  python -m cli <command> --help
+"""
+import importlib
+import sys
+from typing import List, Optional
+
+# command -> (module with main(argv), one-line help)
+COMMANDS = {
+    "crawl": ("redditCrawler", "Crawl posts/comments for the subreddits in config.yaml"),
+    "topic": ("topicCrawl", "Pick subreddits for a topic interactively, then crawl them"),
+    "clean": ("cleaner", "Filter / dedupe / anonymize crawler CSV parts"),
+    "preprocess": ("preprocess", "Clean text and normalize timestamps for analysis"),
+    "sentiment": ("sentiment", "Add VADER sentiment to a preprocessed CSV"),
+}
+
+def usage() -> str:
+    width = max(len(c) for c in COMMANDS)
+    lines = ["usage: python -m cli <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<{width}}  {help_}" for name, (_, help_) in COMMANDS.items()]
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    cmd, rest = argv[0], argv[1:]
+    if cmd not in COMMANDS:
+        print(f"unknown command: {cmd}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[cmd][0])
+    sys.argv[0] = f"cli {cmd}"  # so the subcommand's --help shows the right prog
+    try:
+        module.main(rest)
+    except KeyboardInterrupt:
+        print("\nAborted by user.")
+        return 130
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Coordinator / worker mode for crawling from several hosts (or processes) at once.
+
+How it works
+- `plan` splits the config into (subreddit, time-window, mode) tasks in a shared queue
+  - with `since`: one "search" task per subreddit per --window-days slice of since..until
+  - without:      one "new" task per subreddit
+- `worker` leases one task at a time, crawls it with its own RedditClient (own credentials via
+  --env-file) and reports back. While crawling it heartbeats the lease; a worker that dies stops
+  heartbeating, its lease expires and the task goes back to the queue (up to --max-attempts)
+- Each attempt writes to <out_dir>/tasks/task-<id>.a<attempt>/ so attempts never share files;
+  rows from a crashed attempt may repeat in the retry — catalog.py upserts by id
+- The queue is SQLite (WAL, one file on local disk or a shared volume). Anything implementing
+  TaskQueue (e.g. a Redis-backed one) can be dropped in via open_queue()
+
+Usage
+  python coordinator.py plan --config config.yaml --db out/queue.db --window-days 7
+  python coordinator.py worker --config config.yaml --db out/queue.db --worker-id host1 --env-file .env.host1
+  python coordinator.py status --db out/queue.db
+  python coordinator.py local --config config.yaml --db out/queue.db -n 4     # plan + 4 worker processes
+"""
+import argparse
+import dataclasses
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from metrics import METRICS
+from redditCrawler import (CrawlSettings, RedditClient, crawl_subreddit, load_settings, make_client,
+                           make_writers)
+
+DAY = 86400
+
+@dataclass
+class Task:
+    subreddit: str
+    mode: str                     # "search" | "new"
+    since: Optional[int] = None
+    until: Optional[int] = None
+    id: Optional[int] = None
+    status: str = "pending"       # pending | leased | done | failed
+    worker: Optional[str] = None
+    attempts: int = 0
+    rows: int = 0
+    error: Optional[str] = None
+
+# ---------------- Queue ----------------
+
+class TaskQueue(ABC):
+    """Interface the coordinator and workers use; SQLiteQueue is the bundled backend."""
+
+    @abstractmethod
+    def add(self, tasks: List[Task]) -> int:
+        ...
+
+    @abstractmethod
+    def lease(self, worker: str, lease_s: float) -> Optional[Task]:
+        """Claims the next pending (or lease-expired) task, or None."""
+
+    @abstractmethod
+    def heartbeat(self, task_id: int, worker: str, lease_s: float) -> bool:
+        """Extends the lease; False if the worker no longer holds it."""
+
+    @abstractmethod
+    def complete(self, task_id: int, worker: str, rows: int):
+        ...
+
+    @abstractmethod
+    def fail(self, task_id: int, worker: str, error: str):
+        ...
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def tasks(self) -> List[Task]:
+        ...
+
+    def unfinished(self) -> int:
+        c = self.counts()
+        return c.get("pending", 0) + c.get("leased", 0)
+
+class SQLiteQueue(TaskQueue):
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subreddit TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    since INTEGER,
+                    until INTEGER,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated REAL
+                )""")
+            # NULL bounds ("new" tasks) must collide too, so re-planning stays idempotent
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_tasks ON tasks "
+                         "(subreddit, mode, IFNULL(since, -1), IFNULL(until, -1))")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_tasks_status ON tasks (status, lease_expires)")
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        # a connection per call keeps this safe across the worker and heartbeat threads
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _task(row) -> Task:
+        return Task(id=row[0], subreddit=row[1], mode=row[2], since=row[3], until=row[4], status=row[5],
+                    worker=row[6], attempts=row[7], rows=row[8], error=row[9])
+
+    _COLS = "id, subreddit, mode, since, until, status, worker, attempts, rows, error"
+
+    def add(self, tasks: List[Task]) -> int:
+        now = time.time()
+        with self._conn() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (subreddit, mode, since, until, updated) VALUES (?, ?, ?, ?, ?)",
+                [(t.subreddit, t.mode, t.since, t.until, now) for t in tasks],
+            )
+            return conn.total_changes - before
+
+    def lease(self, worker: str, lease_s: float) -> Optional[Task]:
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # expired leases that used up their attempts are given up on
+                conn.execute(
+                    "UPDATE tasks SET status = 'failed', error = COALESCE(error, 'lease expired'), updated = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                row = conn.execute(
+                    f"SELECT {self._COLS} FROM tasks "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY attempts, id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (worker, now + lease_s, now, row[0]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        task = self._task(row)
+        task.status, task.worker, task.attempts = "leased", worker, task.attempts + 1
+        return task
+
+    def heartbeat(self, task_id: int, worker: str, lease_s: float) -> bool:
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + lease_s, now, task_id, worker),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, task_id: int, worker: str, rows: int):
+        with self._conn() as conn:
+            # a late finisher still counts: its output is complete even if the lease was taken over
+            conn.execute(
+                "UPDATE tasks SET status = 'done', worker = ?, rows = ?, error = NULL, updated = ? "
+                "WHERE id = ? AND status != 'done'",
+                (worker, rows, time.time(), task_id),
+            )
+
+    def fail(self, task_id: int, worker: str, error: str):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_expires = NULL, error = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error[:500], time.time(), task_id, worker),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        now = time.time()
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT CASE WHEN status = 'leased' AND lease_expires < ? THEN 'expired' ELSE status END, "
+                "COUNT(*) FROM tasks GROUP BY 1",
+                (now,),
+            ).fetchall()
+        counts = dict(rows)
+        # expired leases are still owed work
+        if "expired" in counts:
+            counts["leased"] = counts.get("leased", 0) + counts.pop("expired")
+        return counts
+
+    def tasks(self) -> List[Task]:
+        with self._conn() as conn:
+            return [self._task(r) for r in conn.execute(f"SELECT {self._COLS} FROM tasks ORDER BY id")]
+
+def open_queue(url: str, max_attempts: int = 3) -> TaskQueue:
+    """`out/queue.db` or `sqlite:///out/queue.db`."""
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    elif "://" in url:
+        raise ValueError(f"unsupported queue backend: {url} (implement TaskQueue and register it here)")
+    return SQLiteQueue(url, max_attempts=max_attempts)
+
+# ---------------- Planning ----------------
+
+def plan_tasks(settings: CrawlSettings, window_days: float = 7.0, now: Optional[int] = None) -> List[Task]:
+    tasks: List[Task] = []
+    if not settings.since:
+        for sub in settings.subreddits:
+            tasks.append(Task(subreddit=sub, mode="new", until=settings.until))
+        return tasks
+
+    until = settings.until or int(now or time.time())
+    step = max(3600, int(window_days * DAY))
+    for sub in settings.subreddits:
+        hi = until
+        while hi >= settings.since:
+            lo = max(settings.since, hi - step + 1)
+            tasks.append(Task(subreddit=sub, mode="search", since=lo, until=hi))
+            hi = lo - 1
+    return tasks
+
+# ---------------- Worker ----------------
+
+def task_settings(base: CrawlSettings, task: Task) -> CrawlSettings:
+    out_dir = os.path.join(base.out_dir, "tasks", f"task-{task.id:05d}.a{task.attempts}")
+    return dataclasses.replace(base, subreddits=[task.subreddit], since=task.since, until=task.until,
+                               mode=task.mode, out_dir=out_dir)
+
+class _Heartbeat:
+    def __init__(self, queue: TaskQueue, task: Task, worker: str, lease_s: float):
+        self.queue, self.task, self.worker, self.lease_s = queue, task, worker, lease_s
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"heartbeat-{task.id}", daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.lease_s / 3.0):
+            try:
+                if not self.queue.heartbeat(self.task.id, self.worker, self.lease_s):
+                    self.lost = True
+            except Exception as e:  # a busy queue shouldn't kill the crawl; the lease has slack
+                print(f"[warn] heartbeat failed for task {self.task.id}: {e}", file=sys.stderr)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_worker(queue: TaskQueue, settings: CrawlSettings, worker: str, rc: RedditClient,
+               lease_s: float = 300.0, poll_s: float = 5.0, wait: bool = False) -> int:
+    """Processes tasks until the queue is drained (or forever with wait=True); returns tasks done."""
+    done = 0
+    while True:
+        task = queue.lease(worker, lease_s)
+        if task is None:
+            if not wait and queue.unfinished() == 0:
+                return done
+            # others still hold leases: wait in case one expires (crashed worker)
+            time.sleep(poll_s)
+            continue
+
+        ts = task_settings(settings, task)
+        print(f"[{worker}] task {task.id} r/{task.subreddit} {task.mode} "
+              f"{task.since or '∅'}..{task.until or '∅'} (attempt {task.attempts})")
+        try:
+            with _Heartbeat(queue, task, worker, lease_s) as hb:
+                posts_writer, comments_writer = make_writers(ts)
+                try:
+                    # breaker open / retries exhausted raise here, so the window is re-queued, not done
+                    rows = crawl_subreddit(rc, task.subreddit, ts, posts_writer, comments_writer,
+                                           raise_on_failure=True).rows
+                finally:
+                    posts_writer.close()
+                    if comments_writer:
+                        comments_writer.close()
+        except Exception as e:
+            METRICS.inc("tasks_total", status="failed")
+            print(f"[{worker}] task {task.id} failed: {e}", file=sys.stderr)
+            queue.fail(task.id, worker, f"{type(e).__name__}: {e}")
+            continue
+        if hb.lost:
+            # another worker may own the task by now; its run decides the outcome
+            METRICS.inc("tasks_total", status="lost")
+            print(f"[warn] [{worker}] lease on task {task.id} was lost while crawling; not completing it",
+                  file=sys.stderr)
+            continue
+        queue.complete(task.id, worker, rows)
+        METRICS.inc("tasks_total", status="done")
+        done += 1
+
+# ---------------- CLI ----------------
+
+def _print_status(queue: TaskQueue, verbose: bool = False):
+    counts = queue.counts()
+    print("[queue] " + " | ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if verbose:
+        for t in queue.tasks():
+            print(f"  {t.id:>5} {t.status:<7} r/{t.subreddit:<20} {t.mode:<6} "
+                  f"{t.since or '∅'}..{t.until or '∅'} worker={t.worker or '-'} "
+                  f"attempts={t.attempts} rows={t.rows}" + (f" error={t.error}" if t.error else ""))
+
+def _client(args, settings: CrawlSettings) -> RedditClient:
+    if getattr(args, "fixture", None):
+        from fakereddit import FakeReddit
+        return RedditClient(reddit=FakeReddit.from_fixture(args.fixture), retry_cfg=settings.raw.get("retry"))
+    if getattr(args, "env_file", None):
+        # this worker's credentials win over anything already in the environment
+        load_dotenv(args.env_file, override=True)
+    return make_client(settings.raw.get("retry"))
+
+def main():
+    ap = argparse.ArgumentParser(description="Distributed crawl: shared task queue, leasing workers.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    def common(p, config=True):
+        p.add_argument("--db", default="out/queue.db", help="Queue (SQLite path or sqlite:///path)")
+        p.add_argument("--max-attempts", type=int, default=3)
+        if config:
+            p.add_argument("--config", default="config.yaml")
+            p.add_argument("--subreddit", nargs="+", help="Override subreddits from config")
+
+    p = sub.add_parser("plan", help="Split the config into tasks")
+    common(p)
+    p.add_argument("--window-days", type=float, default=7.0, help="Width of search time windows")
+
+    w = sub.add_parser("worker", help="Lease and crawl tasks until the queue is drained")
+    common(w)
+    w.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    w.add_argument("--env-file", default=None, help="dotenv file with this worker's REDDIT_* credentials")
+    w.add_argument("--lease-s", type=float, default=300.0)
+    w.add_argument("--poll-s", type=float, default=5.0)
+    w.add_argument("--wait", action="store_true", help="Keep polling for new tasks instead of exiting")
+    w.add_argument("--fixture", default=None, help="Crawl a fakereddit fixture instead of the API (testing)")
+
+    s = sub.add_parser("status", help="Task counts (and per-task detail with -v)")
+    common(s, config=False)
+    s.add_argument("-v", "--verbose", action="store_true")
+
+    loc = sub.add_parser("local", help="Plan, then run N worker processes on this machine")
+    common(loc)
+    loc.add_argument("-n", "--workers", type=int, default=2)
+    loc.add_argument("--window-days", type=float, default=7.0)
+    loc.add_argument("--lease-s", type=float, default=300.0)
+    loc.add_argument("--env-files", nargs="*", default=None, help="One dotenv per worker (cycled)")
+    loc.add_argument("--fixture", default=None)
+    args = ap.parse_args()
+
+    queue = open_queue(args.db, max_attempts=args.max_attempts)
+
+    if args.cmd == "status":
+        _print_status(queue, verbose=args.verbose)
+        return
+
+    settings = load_settings(args.config, args.subreddit)
+
+    if args.cmd in ("plan", "local"):
+        added = queue.add(plan_tasks(settings, window_days=args.window_days))
+        print(f"[plan] {added} new task(s) → {args.db}")
+
+    if args.cmd == "plan":
+        _print_status(queue)
+        return
+
+    if args.cmd == "worker":
+        mcfg = settings.raw.get("metrics", {}) or {}
+        metrics_json = mcfg.get("json_path", os.path.join(settings.out_dir, "metrics.json"))
+        if metrics_json:
+            root, ext = os.path.splitext(metrics_json)
+            METRICS.start_reporter(f"{root}.{args.worker_id}{ext or '.json'}", float(mcfg.get("interval_s", 15) or 15))
+        rc = _client(args, settings)
+        n = run_worker(queue, settings, args.worker_id, rc, lease_s=args.lease_s,
+                       poll_s=args.poll_s, wait=args.wait)
+        if metrics_json:
+            METRICS.stop_reporter()
+        print(f"[{args.worker_id}] done: {n} task(s)")
+        return
+
+    # local: N worker processes sharing the queue file
+    procs = []
+    for i in range(args.workers):
+        cmd = [sys.executable, os.path.abspath(__file__), "worker", "--db", args.db, "--config", args.config,
+               "--max-attempts", str(args.max_attempts), "--worker-id", f"local-{i + 1}",
+               "--lease-s", str(args.lease_s)]
+        if args.subreddit:
+            cmd += ["--subreddit", *args.subreddit]
+        if args.env_files:
+            cmd += ["--env-file", args.env_files[i % len(args.env_files)]]
+        if args.fixture:
+            cmd += ["--fixture", args.fixture]
+        procs.append(subprocess.Popen(cmd))
+    codes = [p.wait() for p in procs]
+    _print_status(queue)
+    if any(codes):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
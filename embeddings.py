@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Embed preprocessed Reddit text with the vendored MiniLM model and label it with a linear head.
+
+What it does
+- Encodes text_clean with sentence-transformers/all-MiniLM-L6-v2 from ./models (CPU only)
+- Batches texts sorted by length so each batch pads to a similar size
+- Caches vectors next to the output: <output>.emb.npy (float32, memory-mapped) + <output>.ids.npy
+- Re-runs reuse cached vectors by id and only encode rows that are new (inputs without an id column
+  are always encoded in full: row numbers don't identify a post across files)
+- Applies a linear head (.npz with W, b, labels) → label + label_score columns
+- Optionally fits that head from an existing label column (e.g. 'sentiment' from sentiment.py)
+
+The cached matrix is plain .npy, so clustering / search can np.load(..., mmap_mode="r")
+it without encoding the text again.
+
+Usage
+  # fit a sentiment head from VADER labels, then label the same file
+  python embeddings.py -i out/posts_with_sentiment.csv -o out/posts_labeled.csv \
+      --fit-from sentiment --save-head models/sentiment_head.npz
+
+  # apply a saved head to new data
+  python embeddings.py -i out/posts_preprocessed.csv -o out/posts_labeled.csv \
+      --head models/sentiment_head.npz
+
+  # only build the embedding cache (next to the output; the input is left as is)
+  python embeddings.py -i out/posts_preprocessed.csv -o out/posts_embedded.csv
+"""
+
+import argparse
+import os
+import sys
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:  # imported in load_model(): torch + sentence_transformers are slow to import
+    from sentence_transformers import SentenceTransformer
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_DIR = "./models"
+
+# -----------------------
+# Model + encoding
+# -----------------------
+
+def load_model(device: str = "cpu") -> "SentenceTransformer":
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME, cache_folder=MODEL_DIR, device=device)
+
+def encode_texts(model: "SentenceTransformer",
+                 texts: List[str],
+                 batch_size: int = 256,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Encode texts into L2-normalized float32 vectors.
+
+    Texts are processed longest-first in batches of similar length, which keeps
+    padding (and wasted CPU) per batch small. Results are written back in the
+    original order, into `out` if given (e.g. a memmap).
+    """
+    dim = model.get_sentence_embedding_dimension()
+    if out is None:
+        out = np.empty((len(texts), dim), dtype=np.float32)
+    if not texts:
+        return out
+
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        vecs = model.encode(
+            [texts[i] for i in idx],
+            batch_size=len(idx),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        out[idx] = vecs.astype(np.float32, copy=False)
+    return out
+
+# -----------------------
+# Embedding cache
+# -----------------------
+
+def cache_paths(output: str) -> Tuple[str, str]:
+    base = os.path.splitext(output)[0]
+    return f"{base}.emb.npy", f"{base}.ids.npy"
+
+def load_cache(output: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    emb_path, ids_path = cache_paths(output)
+    if not (os.path.exists(emb_path) and os.path.exists(ids_path)):
+        return None, None
+    try:
+        emb = np.load(emb_path, mmap_mode="r")
+        ids = np.load(ids_path, allow_pickle=False)
+    except Exception as e:
+        print(f"[warn] ignoring unreadable embedding cache {emb_path}: {e}", file=sys.stderr)
+        return None, None
+    if len(emb) != len(ids):
+        print(f"[warn] embedding cache {emb_path} does not match its ids; rebuilding", file=sys.stderr)
+        return None, None
+    return emb, ids
+
+def embed_frame(df: pd.DataFrame,
+                output: str,
+                model: Optional["SentenceTransformer"] = None,
+                text_col: str = "text_clean",
+                id_col: str = "id",
+                batch_size: int = 256,
+                use_cache: bool = True) -> np.ndarray:
+    """
+    Return a read-only memmap of embeddings aligned row-for-row with df.
+
+    Rows whose id is already in the cache next to `output` are copied from it;
+    only the rest are encoded. The cache is rewritten to match df exactly.
+    Without an id column the cache is never reused (rows are only known by position).
+    """
+    if text_col not in df.columns:
+        raise ValueError(f"Input must have a '{text_col}' column (run preprocess.py first).")
+
+    texts = df[text_col].fillna("").astype(str).tolist()
+    has_ids = id_col in df.columns
+    # "#<row>" can't collide with a real id, so a later run with ids doesn't match these rows either
+    ids = (df[id_col].astype(str) if has_ids else "#" + pd.Series(range(len(df))).astype(str)).to_numpy()
+    if use_cache and not has_ids:
+        print(f"[warn] no '{id_col}' column: not reusing the embedding cache", file=sys.stderr)
+        use_cache = False
+
+    emb_path, ids_path = cache_paths(output)
+    old_emb, old_ids = load_cache(output) if use_cache else (None, None)
+    if old_emb is not None and np.array_equal(old_ids, ids):
+        print(f"[embed] cache hit → {emb_path} (rows={len(ids)})")
+        return old_emb
+
+    model = model or load_model()
+    dim = model.get_sentence_embedding_dimension()
+
+    os.makedirs(os.path.dirname(emb_path) or ".", exist_ok=True)
+    tmp_path = emb_path + ".tmp.npy"
+    mat = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(ids), dim))
+
+    missing = np.arange(len(ids))
+    if old_emb is not None and old_emb.shape[1] == dim:
+        pos = {k: i for i, k in enumerate(old_ids.tolist())}
+        src = np.array([pos.get(k, -1) for k in ids.tolist()], dtype=np.int64)
+        hit = src >= 0
+        if hit.any():
+            mat[hit] = old_emb[src[hit]]
+        missing = np.flatnonzero(~hit)
+        print(f"[embed] reused {int(hit.sum())} cached rows, encoding {len(missing)}")
+
+    if len(missing):
+        mat[missing] = encode_texts(model, [texts[i] for i in missing], batch_size=batch_size)
+    mat.flush()
+    del mat, old_emb
+
+    os.replace(tmp_path, emb_path)
+    np.save(ids_path, ids.astype(str))
+    print(f"[write] embeddings → {emb_path} (rows={len(ids)}, dim={dim})")
+    return np.load(emb_path, mmap_mode="r")
+
+# -----------------------
+# Linear head
+# -----------------------
+
+class LinearHead:
+    """
+    Ridge-regression head on one-hot targets: scores = X @ W + b.
+    label_score is the score of the chosen label (≈ probability for well-fit heads).
+    """
+    def __init__(self, W: np.ndarray, b: np.ndarray, labels: List[str]):
+        self.W = np.asarray(W, dtype=np.float32)
+        self.b = np.asarray(b, dtype=np.float32)
+        self.labels = [str(x) for x in labels]
+
+    @classmethod
+    def fit(cls, X: np.ndarray, y: List[str], l2: float = 1.0, chunk: int = 65_536) -> "LinearHead":
+        labels = sorted({str(v) for v in y})
+        if len(labels) < 2:
+            raise ValueError("need at least two distinct labels to fit a head")
+        lab_idx = {l: i for i, l in enumerate(labels)}
+        y_idx = np.array([lab_idx[str(v)] for v in y], dtype=np.int64)
+
+        # accumulate normal equations in chunks so X can stay memory-mapped
+        d = X.shape[1] + 1
+        xtx = np.zeros((d, d), dtype=np.float64)
+        xty = np.zeros((d, len(labels)), dtype=np.float64)
+        for s in range(0, len(X), chunk):
+            xa = np.hstack([np.asarray(X[s:s + chunk], dtype=np.float64),
+                            np.ones((min(chunk, len(X) - s), 1))])
+            Y = np.zeros((len(xa), len(labels)))
+            Y[np.arange(len(xa)), y_idx[s:s + chunk]] = 1.0
+            xtx += xa.T @ xa
+            xty += xa.T @ Y
+        reg = l2 * np.eye(d)
+        reg[-1, -1] = 0.0  # don't shrink the bias
+        Wb = np.linalg.solve(xtx + reg, xty)
+        return cls(Wb[:-1], Wb[-1], labels)
+
+    def predict(self, X: np.ndarray, chunk: int = 65_536) -> Tuple[List[str], np.ndarray]:
+        out_idx = np.empty(len(X), dtype=np.int64)
+        out_score = np.empty(len(X), dtype=np.float32)
+        for s in range(0, len(X), chunk):
+            scores = np.asarray(X[s:s + chunk], dtype=np.float32) @ self.W + self.b
+            out_idx[s:s + chunk] = scores.argmax(axis=1)
+            out_score[s:s + chunk] = scores.max(axis=1)
+        return [self.labels[i] for i in out_idx], out_score
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, W=self.W, b=self.b, labels=np.array(self.labels))
+
+    @classmethod
+    def load(cls, path: str) -> "LinearHead":
+        data = np.load(path, allow_pickle=False)
+        return cls(data["W"], data["b"], data["labels"].tolist())
+
+# -----------------------
+# CLI
+# -----------------------
+
+def main():
+    p = argparse.ArgumentParser(description="Embed text_clean with the vendored MiniLM model and apply a linear head.")
+    p.add_argument("-i", "--input", required=True, help="Input CSV (output of preprocess.py / sentiment.py)")
+    p.add_argument("-o", "--output", required=True,
+                   help="Output CSV path; the embedding cache is written next to it")
+    p.add_argument("--text-col", default="text_clean", help="Column to embed (default: text_clean)")
+    p.add_argument("--id-col", default="id", help="Row id column used to reuse cached vectors (default: id)")
+    p.add_argument("--batch-size", type=int, default=256, help="Encoding batch size (default: 256)")
+    p.add_argument("--no-cache", action="store_true", help="Ignore any existing embedding cache")
+    p.add_argument("--head", help="Apply this saved head (.npz)")
+    p.add_argument("--fit-from", help="Fit a head from this label column (e.g. sentiment)")
+    p.add_argument("--save-head", help="Where to save the fitted head (.npz)")
+    p.add_argument("--l2", type=float, default=1.0, help="Ridge penalty when fitting (default: 1.0)")
+    p.add_argument("--label-col", default="label", help="Name of the predicted label column (default: label)")
+    args = p.parse_args()
+
+    try:
+        df = pd.read_csv(args.input, on_bad_lines="skip")
+    except TypeError:
+        df = pd.read_csv(args.input, error_bad_lines=False)
+
+    X = embed_frame(df, args.output, text_col=args.text_col, id_col=args.id_col,
+                    batch_size=args.batch_size, use_cache=not args.no_cache)
+
+    head: Optional[LinearHead] = None
+    if args.fit_from:
+        if args.fit_from not in df.columns:
+            raise SystemExit(f"[error] label column not found: {args.fit_from}")
+        mask = df[args.fit_from].notna().to_numpy()
+        head = LinearHead.fit(X[mask], df.loc[mask, args.fit_from].tolist(), l2=args.l2)
+        print(f"[head] fitted on {int(mask.sum())} rows, labels={head.labels}")
+        if args.save_head:
+            head.save(args.save_head)
+            print(f"[write] head → {args.save_head}")
+    elif args.head:
+        head = LinearHead.load(args.head)
+
+    if head is None:
+        print("[info] no --head/--fit-from given; embedding cache only.")
+        return
+
+    labels, scores = head.predict(X)
+    df[args.label_col] = labels
+    df[f"{args.label_col}_score"] = scores
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    df.to_csv(args.output, index=False)
+    print(f"[write] csv → {args.output} (rows={len(df)})")
+
+if __name__ == "__main__":
+    main()
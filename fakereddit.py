@@ -0,0 +1,411 @@
+"""
+Offline stand-ins for Reddit: duck-typed praw objects, or Reddit's JSON replayed through real praw.
+
+- FakeReddit exposes subreddit(name).new/search/hot, subreddits.search, submission(id), info(fullnames)
+  and get(path, params) for paged r/<sub>/new and r/<sub>/search listings (with `after` cursors)
+- Data comes from a seeded synthetic generator (posts + nested comment trees) or a recorded
+  JSON fixture (see `python benchmark.py record`)
+- Listings are capped like Reddit's (listing_cap, default 1000) and newest-first
+- latency_ms adds a fixed delay per 100-item page / comment fetch to mimic the network
+- FakeReddit skips praw entirely (no requestor, JSON parsing, object construction or rate limiter),
+  so it only measures our own code. replay_reddit(fake) returns a real praw.Reddit whose requestor
+  (metrics.InstrumentedRequestor) talks to a ReplaySession instead of the network: the same corpus
+  is served as Reddit's JSON (listings, /comments/<id>, /api/info, subreddit search/about, token),
+  and everything from prawcore's session and rate limiter up to praw's objects runs for real
+
+Fixture format
+  {"subreddits": {"<name>": {"title": ..., "public_description": ..., "subscribers": ...,
+                             "posts": [{<flatten_submission fields>, "comments": [<flatten_comment fields>]}]}}}
+"""
+import json
+import random
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+_TS_RE = re.compile(r"timestamp:(\d+)\.\.(\d+)")
+_LISTING_PATH_RE = re.compile(r"^/?r/([^/]+)/(new|search)/?$")
+
+_WORDS = (
+    "model training data paper results gpu benchmark python release update question help "
+    "news discussion project dataset compare review opinion best new first why how great bad "
+    "love hate issue fix bug feature team season race driver car game patch weapon planet"
+).split()
+
+class FakeListing(list):
+    """One page of a listing; `after` is the cursor for the next page (None at the end)."""
+    def __init__(self, items, after: Optional[str]):
+        super().__init__(items)
+        self.after = after
+
+class FakeRedditor:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+class FakeComment:
+    def __init__(self, d: Dict[str, Any]):
+        self.id = d["id"]
+        self.body = d.get("body", "")
+        self.author = FakeRedditor(d["author"]) if d.get("author") else None
+        self.score = d.get("score", 1)
+        self.created_utc = d.get("created_utc", 0)
+        self.is_submitter = d.get("is_submitter", False)
+        self.parent_id = d.get("parent_id")
+        self.depth = d.get("depth", 0)
+        permalink = d.get("permalink") or ""
+        self.permalink = permalink.replace("https://www.reddit.com", "")
+
+class FakeCommentForest:
+    def __init__(self, reddit: "FakeReddit", comments: List[Dict[str, Any]]):
+        self._reddit = reddit
+        self._raw = comments
+        self._items: Optional[List[FakeComment]] = None
+
+    def _load(self):
+        if self._items is None:
+            self._reddit._page_wait()
+            self._items = [FakeComment(c) for c in self._raw]
+
+    def replace_more(self, limit: Optional[int] = 32):
+        self._load()
+        return []
+
+    def list(self) -> List[FakeComment]:
+        self._load()
+        return list(self._items)
+
+class FakeSubmission:
+    def __init__(self, reddit: "FakeReddit", sub: "FakeSubreddit", d: Dict[str, Any]):
+        self._reddit = reddit
+        self._raw = d
+        self.id = d["id"]
+        self.name = f"t3_{self.id}"
+        self.subreddit = sub
+        self.author = FakeRedditor(d["author"]) if d.get("author") else None
+        for k in ("title", "selftext", "url", "is_self", "over_18", "spoiler", "stickied", "locked",
+                  "upvote_ratio", "ups", "downs", "score", "num_comments", "created_utc",
+                  "link_flair_text"):
+            setattr(self, k, d.get(k))
+        self.edited = d.get("edited", False)
+        permalink = d.get("permalink") or f"/r/{sub.display_name}/comments/{self.id}/"
+        self.permalink = permalink.replace("https://www.reddit.com", "")
+        self._comments: Optional[FakeCommentForest] = None
+
+    @property
+    def comments(self) -> FakeCommentForest:
+        if self._comments is None:
+            self._comments = FakeCommentForest(self._reddit, self._raw.get("comments", []))
+        return self._comments
+
+class FakeSubreddit:
+    def __init__(self, reddit: "FakeReddit", name: str, meta: Dict[str, Any]):
+        self._reddit = reddit
+        self.display_name = name
+        self.display_name_prefixed = f"r/{name}"
+        self.title = meta.get("title", name)
+        self.public_description = meta.get("public_description", "")
+        self.subscribers = meta.get("subscribers", 50_000)
+        self.accounts_active = meta.get("accounts_active")
+        self.lang = meta.get("lang", "en")
+        self.over18 = meta.get("over18", False)
+        posts = sorted(meta.get("posts", []), key=lambda p: p.get("created_utc") or 0, reverse=True)
+        self._posts = [FakeSubmission(reddit, self, p) for p in posts]
+
+    def __str__(self):
+        return self.display_name
+
+    def _matching(self, query: str) -> List[FakeSubmission]:
+        items = self._posts
+        m = _TS_RE.search(query or "")
+        if m:
+            lo, hi = int(m.group(1)), int(m.group(2))
+            items = [s for s in items if lo <= (s.created_utc or 0) <= hi]
+        words = [w.lower() for w in _TS_RE.sub(" ", query or "").split()]
+        if words:
+            items = [s for s in items if any(w in f"{s.title} {s.selftext}".lower() for w in words)]
+        return items
+
+    def _listing(self, items: List[FakeSubmission], limit: Optional[int]) -> Iterator[FakeSubmission]:
+        cap = self._reddit.listing_cap
+        n = min(len(items), cap if limit is None else min(limit, cap))
+        for i in range(n):
+            if i % 100 == 0:
+                self._reddit._page_wait()
+            yield items[i]
+
+    def new(self, limit: Optional[int] = 100, **kwargs) -> Iterator[FakeSubmission]:
+        return self._listing(self._posts, limit)
+
+    def hot(self, limit: Optional[int] = 100, **kwargs) -> Iterator[FakeSubmission]:
+        return self._listing(sorted(self._posts, key=lambda s: s.score or 0, reverse=True), limit)
+
+    def search(self, query: str = "", sort: str = "relevance", syntax: str = None,
+               limit: Optional[int] = 100, **kwargs) -> Iterator[FakeSubmission]:
+        return self._listing(self._matching(query), limit)
+
+class FakeSubreddits:
+    def __init__(self, reddit: "FakeReddit"):
+        self._reddit = reddit
+
+    def search(self, query: str, limit: Optional[int] = 100) -> List[FakeSubreddit]:
+        words = [w.lower() for w in query.split()]
+        subs = list(self._reddit._subs.values())
+        hits = [s for s in subs if any(w in f"{s.display_name} {s.title} {s.public_description}".lower() for w in words)]
+        return (hits or subs)[:limit or None]
+
+class FakeReddit:
+    def __init__(self, data: Dict[str, Any], latency_ms: float = 0.0, listing_cap: int = 1000):
+        self.latency_ms = latency_ms
+        self.listing_cap = listing_cap
+        self.requests = 0
+        self._subs: Dict[str, FakeSubreddit] = {
+            name: FakeSubreddit(self, name, meta) for name, meta in (data.get("subreddits") or {}).items()
+        }
+        self._by_id = {s.id: s for sub in self._subs.values() for s in sub._posts}
+        self.subreddits = FakeSubreddits(self)
+
+    def _page_wait(self):
+        self.requests += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        if name == "all":
+            merged = {"posts": [s._raw for sub in self._subs.values() for s in sub._posts]}
+            return FakeSubreddit(self, "all", merged)
+        key = next((k for k in self._subs if k.lower() == name.lower()), None)
+        if key is None:
+            return FakeSubreddit(self, name, {})
+        return self._subs[key]
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> FakeListing:
+        m = _LISTING_PATH_RE.match(path)
+        if not m:
+            raise ValueError(f"FakeReddit.get: unsupported path {path!r}")
+        params = params or {}
+        sub = self.subreddit(m.group(1))
+        items = sub._posts if m.group(2) == "new" else sub._matching(str(params.get("q", "")))
+        items = items[:self.listing_cap]
+
+        start = 0
+        after = params.get("after")
+        if after:
+            ids = [s.name for s in items]
+            start = ids.index(after) + 1 if after in ids else len(items)
+        page = items[start:start + int(params.get("limit", 100) or 100)]
+        self._page_wait()
+        more = start + len(page) < len(items)
+        return FakeListing(page, page[-1].name if page and more else None)
+
+    def submission(self, id: str = None, **kwargs) -> FakeSubmission:
+        return self._by_id[id]
+
+    def info(self, fullnames: List[str] = None, **kwargs) -> Iterator[FakeSubmission]:
+        self._page_wait()
+        for fn in fullnames or []:
+            s = self._by_id.get(fn.split("_", 1)[-1])
+            if s is not None:
+                yield s
+
+    # ---- constructors ----
+
+    @classmethod
+    def from_fixture(cls, path: str, **kwargs) -> "FakeReddit":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    @classmethod
+    def synthetic(cls, subreddits: int = 3, posts_per_sub: int = 500, comments_per_post: int = 20,
+                  seed: int = 0, **kwargs) -> "FakeReddit":
+        return cls(synthetic_corpus(subreddits, posts_per_sub, comments_per_post, seed), **kwargs)
+
+# ---------------- Replay through praw ----------------
+
+_SUB_PATH_RE = re.compile(r"^/r/([^/]+)/(new|hot|search|about)/?$")
+_COMMENTS_PATH_RE = re.compile(r"^/comments/([^/]+)")
+
+def _listing_json(children: List[Dict[str, Any]], after: Optional[str] = None) -> Dict[str, Any]:
+    return {"kind": "Listing", "data": {"after": after, "before": None, "dist": len(children),
+                                        "children": children}}
+
+def _t3(s: FakeSubmission) -> Dict[str, Any]:
+    d = {k: v for k, v in s._raw.items() if k != "comments"}
+    name = s.subreddit.display_name
+    d.update(id=s.id, name=s.name, subreddit=name, subreddit_name_prefixed=f"r/{name}",
+             author=str(s.author) if s.author else "[deleted]", permalink=s.permalink,
+             num_comments=len(s._raw.get("comments", [])) if d.get("num_comments") is None else d["num_comments"])
+    return {"kind": "t3", "data": d}
+
+def _t5(sr: FakeSubreddit) -> Dict[str, Any]:
+    return {"kind": "t5", "data": {
+        "id": sr.display_name.lower(), "name": f"t5_{sr.display_name.lower()}", "display_name": sr.display_name,
+        "display_name_prefixed": sr.display_name_prefixed, "title": sr.title,
+        "public_description": sr.public_description, "subscribers": sr.subscribers,
+        "accounts_active": sr.accounts_active, "lang": sr.lang, "over18": sr.over18}}
+
+def _comment_tree(s: FakeSubmission) -> List[Dict[str, Any]]:
+    """Flat fixture comments → Reddit's nested t1 things (replies listings); orphans go top-level."""
+    raw = s._raw.get("comments", [])
+    names = {f"t1_{c['id']}" for c in raw}
+    kids: Dict[str, List[Dict[str, Any]]] = {}
+    for c in raw:
+        parent = c.get("parent_id") or s.name
+        kids.setdefault(parent if parent in names else s.name, []).append(c)
+
+    def thing(c: Dict[str, Any]) -> Dict[str, Any]:
+        d = {k: v for k, v in c.items() if k not in ("kind", "submission_id")}
+        replies = [thing(r) for r in kids.get(f"t1_{c['id']}", [])]
+        d.update(name=f"t1_{c['id']}", link_id=s.name, subreddit=s.subreddit.display_name,
+                 author=c.get("author") or "[deleted]", parent_id=c.get("parent_id") or s.name,
+                 permalink=(c.get("permalink") or "").replace("https://www.reddit.com", ""),
+                 replies=_listing_json(replies) if replies else "")
+        return {"kind": "t1", "data": d}
+
+    return [thing(c) for c in kids.get(s.name, [])]
+
+class ReplaySession:
+    """
+    requests.Session stand-in for prawcore's Requestor: answers each call from a FakeReddit
+    corpus with the JSON Reddit would send (404 for anything else). Rate-limit headers always
+    report a fresh window, so prawcore's limiter runs but never sleeps.
+    """
+    def __init__(self, fake: FakeReddit):
+        self.fake = fake
+        self.headers: Dict[str, str] = {}
+
+    def close(self):
+        pass
+
+    def _response(self, url: str, payload: Any, status: int = 200) -> requests.Response:
+        r = requests.Response()
+        r.status_code = status
+        r.url = url
+        r.encoding = "utf-8"
+        r._content = json.dumps(payload).encode("utf-8")
+        r.headers = CaseInsensitiveDict({
+            "content-type": "application/json; charset=UTF-8",
+            "x-ratelimit-remaining": "996.0", "x-ratelimit-used": "0", "x-ratelimit-reset": "600",
+        })
+        return r
+
+    def _page(self, items: List[FakeSubmission], params: Dict[str, Any]) -> Dict[str, Any]:
+        items = items[:self.fake.listing_cap]
+        start = 0
+        after = params.get("after")
+        if after:
+            ids = [s.name for s in items]
+            start = ids.index(after) + 1 if after in ids else len(items)
+        page = items[start:start + int(params.get("limit", 100) or 100)]
+        self.fake._page_wait()
+        more = start + len(page) < len(items)
+        return _listing_json([_t3(s) for s in page], page[-1].name if page and more else None)
+
+    def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        parts = urlsplit(url)
+        path = "/" + parts.path.strip("/")
+        params = {**dict(parse_qsl(parts.query)), **{k: v for k, v in (params or {}).items() if v is not None}}
+        fake = self.fake
+
+        if path == "/api/v1/access_token":
+            return self._response(url, {"access_token": "replay", "token_type": "bearer",
+                                        "expires_in": 86400, "scope": "*"})
+        m = _SUB_PATH_RE.match(path)
+        if m:
+            sub = fake.subreddit(m.group(1))
+            if m.group(2) == "about":
+                return self._response(url, _t5(sub))
+            if m.group(2) == "new":
+                items = sub._posts
+            elif m.group(2) == "hot":
+                items = sorted(sub._posts, key=lambda s: s.score or 0, reverse=True)
+            else:
+                items = sub._matching(str(params.get("q", "")))
+            return self._response(url, self._page(items, params))
+        m = _COMMENTS_PATH_RE.match(path)
+        if m and m.group(1) in fake._by_id:
+            s = fake._by_id[m.group(1)]
+            fake._page_wait()
+            return self._response(url, [_listing_json([_t3(s)]), _listing_json(_comment_tree(s))])
+        if path == "/api/info":
+            fake._page_wait()
+            ids = [i.split("_", 1)[-1] for i in str(params.get("id", "")).split(",") if i]
+            return self._response(url, _listing_json([_t3(fake._by_id[i]) for i in ids if i in fake._by_id]))
+        if path == "/subreddits/search":
+            fake._page_wait()
+            hits = fake.subreddits.search(str(params.get("q", "")), int(params.get("limit", 100) or 100))
+            return self._response(url, _listing_json([_t5(sr) for sr in hits]))
+        return self._response(url, {"message": "Not Found", "error": 404}, status=404)
+
+def replay_reddit(fake: FakeReddit):
+    """A real praw.Reddit (read-only app) whose HTTP calls are answered by ReplaySession(fake)."""
+    import praw  # the duck-typed FakeReddit doesn't need it
+    from metrics import InstrumentedRequestor
+    return praw.Reddit(client_id="replay", client_secret="replay", user_agent="fakereddit replay",
+                       requestor_class=InstrumentedRequestor, requestor_kwargs={"session": ReplaySession(fake)},
+                       check_for_updates=False, check_for_async=False)
+
+# ---------------- Synthetic data ----------------
+
+def _b36(n: int) -> str:
+    chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = chars[r] + out
+        if not n:
+            return out
+
+def _text(rng: random.Random, lo: int, hi: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(lo, hi)))
+
+def synthetic_corpus(subreddits: int = 3, posts_per_sub: int = 500, comments_per_post: int = 20,
+                     seed: int = 0, now: int = 1_750_000_000, span_days: int = 30) -> Dict[str, Any]:
+    """Deterministic posts + comment trees (random parent among earlier comments, so depth varies)."""
+    rng = random.Random(seed)
+    next_id = 36 ** 5  # 6-char base36 ids like real ones
+    data: Dict[str, Any] = {"subreddits": {}}
+    for si in range(subreddits):
+        name = f"synthetic{si}"
+        posts = []
+        for _ in range(posts_per_sub):
+            pid = _b36(next_id)
+            next_id += 1
+            created = now - rng.randint(0, span_days * 86400)
+            selftext = _text(rng, 0, 120) if rng.random() < 0.6 else ""
+            comments, depths = [], []
+            for ci in range(rng.randint(0, 2 * comments_per_post)):
+                cid = _b36(next_id)
+                next_id += 1
+                if ci == 0 or rng.random() < 0.4:
+                    parent, depth = f"t3_{pid}", 0
+                else:
+                    j = rng.randrange(len(comments))
+                    parent, depth = f"t1_{comments[j]['id']}", depths[j] + 1
+                depths.append(depth)
+                comments.append({
+                    "id": cid, "author": f"user{rng.randint(1, 5000)}", "body": _text(rng, 3, 60),
+                    "score": rng.randint(-5, 500), "created_utc": created + rng.randint(60, 86400),
+                    "is_submitter": rng.random() < 0.05, "parent_id": parent, "depth": depth,
+                    "permalink": f"/r/{name}/comments/{pid}/_/{cid}/",
+                })
+            posts.append({
+                "id": pid, "author": f"user{rng.randint(1, 5000)}", "title": _text(rng, 4, 16),
+                "selftext": selftext, "url": f"https://www.reddit.com/r/{name}/comments/{pid}/",
+                "is_self": bool(selftext), "over_18": rng.random() < 0.02, "spoiler": False,
+                "stickied": False, "locked": False, "upvote_ratio": round(rng.uniform(0.5, 1.0), 2),
+                "ups": rng.randint(0, 5000), "downs": 0, "score": rng.randint(0, 5000),
+                "num_comments": len(comments), "created_utc": created, "link_flair_text": None,
+                "edited": False, "permalink": f"/r/{name}/comments/{pid}/", "comments": comments,
+            })
+        data["subreddits"][name] = {
+            "title": f"Synthetic {si}", "public_description": _text(rng, 5, 20),
+            "subscribers": rng.randint(1_000, 2_000_000), "lang": "en", "posts": posts,
+        }
+    return data
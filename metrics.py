@@ -0,0 +1,248 @@
+"""
+Crawl instrumentation: counters, gauges and histograms with JSON / Prometheus export.
+
+- METRICS is the process-wide registry used by redditCrawler.py
+- InstrumentedRequestor times every HTTP call praw makes and labels it by endpoint
+  (search, new, comments, replace_more, info, auth, other)
+- start_reporter() rewrites a JSON snapshot every interval_s seconds
+- serve_prometheus() exposes the same data as Prometheus text on http://<host>:<port>/metrics
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import prawcore
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in items) + "}"
+
+class Metrics:
+    def __init__(self, prefix: str = "reddit_crawler", buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters: Dict[Tuple[str, LabelKey], float] = {}
+            self.gauges: Dict[Tuple[str, LabelKey], float] = {}
+            # name, labels -> [per-bucket counts..., +Inf count], sum
+            self.hists: Dict[Tuple[str, LabelKey], List[Any]] = {}
+
+    # ---- recording ----
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = float(value)
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self.hists.get(key)
+            if h is None:
+                h = self.hists[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = h[0]
+            for i, b in enumerate(self.buckets):
+                if seconds <= b:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            h[1] += seconds
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def sleep(self, seconds: float, **labels):
+        if seconds <= 0:
+            return
+        time.sleep(seconds)
+        self.observe("sleep_seconds", seconds, **labels)
+
+    def timed_iter(self, it: Iterable, name: str, **labels) -> Iterator:
+        """Yields from it, recording the time spent waiting inside next()."""
+        it = iter(it)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.observe(name, time.perf_counter() - t0, **labels)
+            yield item
+
+    # ---- export ----
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())]
+            gauges = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.gauges.items())]
+            hists = []
+            for (n, l), (counts, total) in sorted(self.hists.items()):
+                cnt = sum(counts)
+                hists.append({
+                    "name": n,
+                    "labels": dict(l),
+                    "count": cnt,
+                    "sum": round(total, 6),
+                    "mean": round(total / cnt, 6) if cnt else None,
+                    "buckets": {str(b): c for b, c in zip(list(self.buckets) + ["+Inf"], counts)},
+                })
+        return {
+            "started_utc": int(self.started),
+            "uptime_s": round(time.time() - self.started, 3),
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": hists,
+        }
+
+    def write_json(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp, path)
+
+    def prometheus_text(self) -> str:
+        p = self.prefix
+        lines: List[str] = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            hists = sorted((k, (list(v[0]), v[1])) for k, v in self.hists.items())
+        typed = set()
+        for (n, l), v in counters:
+            if n not in typed:
+                lines.append(f"# TYPE {p}_{n} counter")
+                typed.add(n)
+            lines.append(f"{p}_{n}{_fmt_labels(l)} {v:g}")
+        for (n, l), v in gauges:
+            if n not in typed:
+                lines.append(f"# TYPE {p}_{n} gauge")
+                typed.add(n)
+            lines.append(f"{p}_{n}{_fmt_labels(l)} {v:g}")
+        for (n, l), (counts, total) in hists:
+            if n not in typed:
+                lines.append(f"# TYPE {p}_{n} histogram")
+                typed.add(n)
+            acc = 0
+            for b, c in zip(list(self.buckets) + ["+Inf"], counts):
+                acc += c
+                lines.append(f"{p}_{n}_bucket{_fmt_labels(l, ('le', str(b)))} {acc}")
+            lines.append(f"{p}_{n}_sum{_fmt_labels(l)} {total:.6f}")
+            lines.append(f"{p}_{n}_count{_fmt_labels(l)} {acc}")
+        return "\n".join(lines) + "\n"
+
+    # ---- background exporters ----
+
+    def start_reporter(self, json_path: str, interval_s: float = 15.0):
+        """Rewrites json_path every interval_s seconds until stop_reporter()."""
+        self.stop_reporter()
+        stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(interval_s):
+                try:
+                    self.write_json(json_path)
+                except Exception:
+                    pass
+            self.write_json(json_path)
+
+        self._reporter = (stop, threading.Thread(target=_loop, name="metrics-json", daemon=True))
+        self._reporter[1].start()
+
+    def stop_reporter(self):
+        """Stops the JSON reporter (if any) after one final write."""
+        reporter = getattr(self, "_reporter", None)
+        if reporter:
+            reporter[0].set()
+            reporter[1].join(timeout=10)
+            self._reporter = None
+
+    def serve_prometheus(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        metrics = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+METRICS = Metrics()
+
+# ---------------- praw hook ----------------
+
+_ENDPOINTS = [
+    (re.compile(r"/api/morechildren"), "replace_more"),
+    (re.compile(r"/api/info"), "info"),
+    (re.compile(r"/api/v1/access_token"), "auth"),
+    (re.compile(r"/comments/"), "comments"),
+    (re.compile(r"/search"), "search"),
+    (re.compile(r"/new(/|$|\?)"), "new"),
+]
+
+def endpoint_of(url: str) -> str:
+    for pat, name in _ENDPOINTS:
+        if pat.search(url or ""):
+            return name
+    return "other"
+
+class InstrumentedRequestor(prawcore.Requestor):
+    """prawcore requestor that records count, latency and status of every HTTP call."""
+
+    def request(self, *args, timeout=None, **kwargs):
+        url = args[1] if len(args) > 1 else kwargs.get("url", "")
+        endpoint = endpoint_of(url)
+        t0 = time.perf_counter()
+        status = "error"
+        try:
+            response = super().request(*args, timeout=timeout, **kwargs)
+            status = str(getattr(response, "status_code", "?"))
+            return response
+        finally:
+            METRICS.observe("api_call_seconds", time.perf_counter() - t0, endpoint=endpoint)
+            METRICS.inc("api_calls_total", endpoint=endpoint, status=status)
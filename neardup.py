@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for preprocessed posts (reposts, crossposts, lightly edited titles).
+
+What it does
+- Shingles text_clean into character 5-grams (first 2000 chars) and MinHashes them: 64 hash
+  functions, computed for a whole batch at once with NumPy (no per-shingle Python loop)
+- LSH: the signature is cut into 16 bands of 4 rows; posts sharing any band bucket become
+  candidates, so work grows with the number of posts, not the number of pairs
+- Every row in a shared bucket is a candidate (up to MAX_BUCKET per bucket); candidates are kept
+  only if their estimated Jaccard similarity (share of equal MinHash values) is >= --threshold
+  (default 0.7), and a post links to its most similar one
+- Each post gets dup_cluster_id = id of the first post seen in its cluster (its own id if unique);
+  rows are labelled, not dropped
+- Incremental: with an index dir, signatures / cluster roots / ids are appended across runs, so
+  today's posts are matched against everything seen before; known ids keep their cluster and
+  existing cluster ids never change
+    meta.json       n, num_perm, bands, seed, band_runs (written last — files are truncated back
+                    to n on reopen)
+    sigs.u32        n × num_perm MinHash signatures (memory-mapped)
+    roots.i64       cluster root row per post
+    ids.txt         post id per row
+    bands-<lo>-<hi>.{keys,rows}.npy
+                    LSH buckets of rows lo..hi-1, sorted per band (memory-mapped). Each run adds one;
+                    runs no larger than the one after them are merged, so there are O(log n) of them
+                    and a daily run reads and sorts only its own rows
+
+Usage
+  python neardup.py -i out/posts_preprocessed.csv -o out/posts_dups.csv --index out/neardup
+  python preprocess.py -i posts_clean.csv -o posts_preprocessed.csv --near-dups --dup-index out/neardup
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SHINGLE = 5         # bytes per shingle (keys fit exactly in 40 bits)
+MAX_CHARS = 2000    # long selftexts: the opening is enough to spot a repost
+SIG_BATCH = 10_000  # texts per MinHash batch (bounds the shingle arrays)
+MAX_BUCKET = 32     # rows compared per band bucket (the oldest; a bucket that full is one big cluster)
+
+# -----------------------
+# MinHash
+# -----------------------
+
+def shingle_keys(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Character SHINGLE-grams of every text as uint64 keys, concatenated; text i owns
+    keys[offsets[i]:offsets[i + 1]]. Texts shorter than SHINGLE are padded to one shingle.
+    """
+    docs = [(t if isinstance(t, str) else "")[:MAX_CHARS].encode("utf-8").ljust(SHINGLE) for t in texts]
+    lens = np.fromiter((len(d) for d in docs), dtype=np.int64, count=len(docs))
+    buf = np.frombuffer(b"".join(docs), dtype=np.uint8).astype(np.uint64)
+
+    n_win = lens - SHINGLE + 1
+    offsets = np.concatenate([[0], np.cumsum(n_win)]).astype(np.int64)
+    doc_start = np.concatenate([[0], np.cumsum(lens)[:-1]]).astype(np.int64)
+    # window start positions in buf: skip the last SHINGLE-1 bytes of each text
+    starts = np.arange(offsets[-1], dtype=np.int64) + np.repeat(doc_start - offsets[:-1], n_win)
+
+    keys = np.zeros(len(starts), dtype=np.uint64)
+    for j in range(SHINGLE):
+        keys |= buf[starts + j] << np.uint64(8 * j)
+    return keys, offsets
+
+def minhash(texts: Sequence[str], a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(len(texts), len(a)) uint32 signatures; hash j is multiply-shift ((a_j * x + b_j) mod 2^64) >> 32."""
+    sig = np.empty((len(texts), len(a)), dtype=np.uint32)
+    shift = np.uint64(32)
+    for s in range(0, len(texts), SIG_BATCH):
+        keys, offsets = shingle_keys(texts[s:s + SIG_BATCH])
+        for j in range(len(a)):
+            h = (keys * a[j] + b[j]) >> shift
+            sig[s:s + SIG_BATCH, j] = np.minimum.reduceat(h, offsets[:-1])
+    return sig
+
+def band_keys(sig: np.ndarray, bands: int) -> np.ndarray:
+    """(n, bands) uint64 bucket keys: each band's rows folded FNV-style."""
+    rows = sig.shape[1] // bands
+    s = np.asarray(sig[:, :bands * rows]).reshape(len(sig), bands, rows).astype(np.uint64)
+    h = np.full((len(sig), bands), 0xCBF29CE484222325, dtype=np.uint64)
+    prime = np.uint64(0x100000001B3)
+    for r in range(rows):
+        h = (h ^ s[:, :, r]) * prime
+    return h
+
+# -----------------------
+# Index
+# -----------------------
+
+class NearDupIndex:
+    """
+    MinHash LSH index with union-by-first-seen clusters.
+
+    In memory if index_dir is None; otherwise loaded from / appended to index_dir on save().
+    num_perm / bands / seed are fixed by the first save (signatures must stay comparable).
+    """
+    def __init__(self, index_dir: Optional[str] = None, num_perm: int = 64, bands: int = 16,
+                 threshold: float = 0.7, seed: int = 1):
+        self.index_dir = index_dir
+        self.threshold = threshold
+        n, band_runs = 0, []
+        meta_path = os.path.join(index_dir, "meta.json") if index_dir else None
+        if meta_path and os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            n, num_perm, bands, seed = meta["n"], meta["num_perm"], meta["bands"], meta["seed"]
+            band_runs = meta.get("band_runs")
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm, self.bands, self.seed = num_perm, bands, seed
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        # signatures: rows on disk (memory-mapped, never copied) + chunks appended since, one per batch
+        self._base = np.zeros((0, num_perm), dtype=np.uint32)
+        self._chunks: List[np.ndarray] = []
+        self.roots = np.zeros(0, dtype=np.int64)
+        self.ids = np.array([], dtype="S1")
+        if n:
+            self._base = np.memmap(self._path("sigs.u32"), dtype=np.uint32, mode="r", shape=(n, num_perm))
+            self.roots = np.fromfile(self._path("roots.i64"), dtype=np.int64, count=n)
+            with open(self._path("ids.txt"), "r", encoding="utf-8") as f:
+                self.ids = np.array([next(f).rstrip("\n") for _ in range(n)], dtype="S")
+        self._saved = n
+        # band tables: runs of (lo, hi, keys (bands, k), rows (bands, k)), oldest rows first;
+        # None for an index saved before band runs were kept (built from sigs on first use)
+        self._runs: Optional[List[Tuple[int, int, np.ndarray, np.ndarray]]] = None if n and band_runs is None else [
+            (lo, hi, np.load(self._path(f"bands-{lo}-{hi}.keys.npy"), mmap_mode="r"),
+             np.load(self._path(f"bands-{lo}-{hi}.rows.npy"), mmap_mode="r")) for lo, hi in band_runs or []]
+        self._runs_saved = {(lo, hi) for lo, hi in band_runs or []}
+        self._id_order: Optional[np.ndarray] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_clusters(self) -> int:
+        return int(np.unique(self.roots).size)
+
+    # ---- lookups ----
+
+    def _sig_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Signatures of the given rows, from the mapped file or the chunks added since."""
+        out = np.empty((len(rows), self.num_perm), dtype=np.uint32)
+        start = len(self._base)
+        on_disk = rows < start
+        out[on_disk] = self._base[rows[on_disk]]
+        for chunk in self._chunks:
+            sel = (rows >= start) & (rows < start + len(chunk))
+            out[sel] = chunk[rows[sel] - start]
+            start += len(chunk)
+        return out
+
+    def _rows_for(self, ids: np.ndarray) -> np.ndarray:
+        """Row of each id (bytes array), -1 if not indexed."""
+        out = np.full(len(ids), -1, dtype=np.int64)
+        if not len(self.ids) or not len(ids):
+            return out
+        if self._id_order is None:
+            self._id_order = np.argsort(self.ids, kind="stable")
+        sorted_ids = self.ids[self._id_order]
+        pos = np.searchsorted(sorted_ids, ids)
+        pc = np.minimum(pos, len(sorted_ids) - 1)
+        hit = (pos < len(sorted_ids)) & (sorted_ids[pc] == ids)
+        out[hit] = self._id_order[pc[hit]]
+        return out
+
+    def _band_runs(self) -> List[Tuple[int, int, np.ndarray, np.ndarray]]:
+        if self._runs is None:
+            n = len(self)
+            self._runs = [(0, n, *self._sorted_run(band_keys(self._base, self.bands), np.arange(n)))]
+        return self._runs
+
+    def _sorted_run(self, keys: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(bands, m) keys sorted per band and their rows (ascending rows within a bucket)."""
+        order = np.argsort(keys, axis=0, kind="stable").T
+        return np.take_along_axis(keys.T, order, axis=1), np.asarray(rows, dtype=np.int64)[order]
+
+    def _add_run(self, lo: int, hi: int, keys: np.ndarray):
+        """Adds the buckets of rows lo..hi-1, merging runs no larger than the one after them."""
+        runs = self._band_runs()
+        runs.append((lo, hi, *self._sorted_run(keys, np.arange(lo, hi))))
+        while len(runs) >= 2 and runs[-2][1] - runs[-2][0] <= runs[-1][1] - runs[-1][0]:
+            (lo, _, ok, orow), (_, hi, nk, nrow) = runs[-2], runs.pop()
+            mk = np.empty((self.bands, ok.shape[1] + nk.shape[1]), dtype=np.uint64)
+            mr = np.empty(mk.shape, dtype=np.int64)
+            for b in range(self.bands):
+                at = np.searchsorted(ok[b], nk[b], side="right")  # after older rows in the bucket
+                mk[b] = np.insert(ok[b], at, nk[b])
+                mr[b] = np.insert(orow[b], at, nrow[b])
+            runs[-1] = (lo, hi, mk, mr)
+
+    # ---- insert ----
+
+    def _candidates(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (new row, candidate row) pairs, deduplicated: every indexed row sharing a band bucket with a
+        new row (the oldest MAX_BUCKET per bucket and run), and the up to MAX_BUCKET rows of this batch
+        right before it in the bucket. Rows of this batch are numbered from len(self).
+        """
+        n, m = len(self), len(keys)
+        pairs = []
+        for b in range(self.bands):
+            k = keys[:, b]
+            for _, _, rk, rr in self._band_runs():
+                tk = rk[b]
+                if not len(tk):
+                    continue
+                left = np.searchsorted(tk, k, side="left")
+                cnt = np.minimum(np.searchsorted(tk, k, side="right") - left, MAX_BUCKET)
+                total = int(cnt.sum())
+                if total:
+                    off = np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+                    pairs.append(np.repeat(np.arange(m), cnt) * (n + m) + rr[b][np.repeat(left, cnt) + off])
+            order = np.argsort(k, kind="stable")  # stable: earlier rows of the batch first in a bucket
+            ks = k[order]
+            for d in range(1, min(MAX_BUCKET, m - 1) + 1):
+                same = np.flatnonzero(ks[d:] == ks[:-d])
+                if not len(same):
+                    break
+                pairs.append(order[same + d] * (n + m) + n + order[same])
+        pair = np.unique(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+        return pair // (n + m), pair % (n + m)
+
+    def _insert(self, sig: np.ndarray) -> np.ndarray:
+        """Appends signatures; returns the cluster root row of each."""
+        n, m = len(self), len(sig)
+        keys = band_keys(sig, self.bands)
+        i, c = self._candidates(keys)
+
+        link = np.arange(n, n + m, dtype=np.int64)
+        if len(i):
+            old = c < n
+            c_sig = np.empty((len(c), self.num_perm), dtype=np.uint32)
+            c_sig[old] = self._sig_rows(c[old])
+            c_sig[~old] = sig[c[~old] - n]
+            sim = (c_sig == sig[i]).mean(axis=1)
+            ok = sim >= self.threshold
+            i, c, sim = i[ok], c[ok], sim[ok]
+            order = np.lexsort((-sim, i))  # most similar candidate first per row
+            i, c = i[order], c[order]
+            best = np.r_[True, i[1:] != i[:-1]] if len(i) else np.zeros(0, dtype=bool)
+            link[i[best]] = c[best]
+
+        # links point to strictly older rows, so pointer jumping reaches the batch-level root
+        root = link.copy()
+        while True:
+            inner = root >= n
+            nxt = root.copy()
+            nxt[inner] = root[root[inner] - n]
+            if np.array_equal(nxt, root):
+                break
+            root = nxt
+        old = root < n
+        root[old] = self.roots[root[old]]
+
+        self._chunks.append(sig)
+        self.roots = np.concatenate([self.roots, root])
+        self._add_run(n, n + m, keys)
+        return root
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> List[str]:
+        """
+        Indexes (id, text) pairs in order and returns dup_cluster_id for each.
+        Ids already indexed (or repeated in this call) keep their first cluster.
+        """
+        if not len(ids):
+            return []
+        batch = np.array([str(x) for x in ids], dtype="S")
+        uniq, first, inv = np.unique(batch, return_index=True, return_inverse=True)
+        rows = self._rows_for(uniq)
+        new = np.flatnonzero(rows < 0)
+        new = new[np.argsort(first[new], kind="stable")]  # input order: earlier rows become roots
+        if len(new):
+            sig = minhash([texts[k] for k in first[new]], self.a, self.b)
+            n = len(self)
+            self._insert(sig)
+            rows[new] = np.arange(n, n + len(new))
+            self.ids = np.concatenate([self.ids, uniq[new]])
+            self._id_order = None
+        labels = self.ids[self.roots[rows[inv.reshape(-1)]]]
+        return [x.decode("utf-8") for x in labels.tolist()]
+
+    # ---- persistence ----
+
+    def save(self):
+        if not self.index_dir:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        start, n = self._saved, len(self)
+        parts = [
+            ("sigs.u32", self._sig_rows(np.arange(start, n)).tobytes(), self.num_perm * 4),
+            ("roots.i64", self.roots[start:n].tobytes(), 8),
+        ]
+        for name, data, row_bytes in parts:
+            path = self._path(name)
+            with open(path, "ab") as f:
+                f.truncate(start * row_bytes)  # drop rows of an interrupted save
+                f.write(data)
+        ids_path = self._path("ids.txt")
+        with open(ids_path, "ab"):
+            pass
+        with open(ids_path, "r+b") as f:
+            for _ in range(start):
+                f.readline()
+            f.truncate(f.tell())
+            f.write(b"".join(x + b"\n" for x in self.ids[start:n].tolist()))
+
+        runs = self._band_runs()
+        for lo, hi, rk, rr in runs:
+            if (lo, hi) not in self._runs_saved:  # new names only: the old meta stays readable until replaced
+                np.save(self._path(f"bands-{lo}-{hi}.keys.npy"), rk)
+                np.save(self._path(f"bands-{lo}-{hi}.rows.npy"), rr)
+
+        meta = {"n": n, "num_perm": self.num_perm, "bands": self.bands, "seed": self.seed,
+                "band_runs": [[lo, hi] for lo, hi, _, _ in runs]}
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, self._path("meta.json"))
+        self._saved = n
+        self._runs_saved = {(lo, hi) for lo, hi, _, _ in runs}
+        keep = {f"bands-{lo}-{hi}.{part}.npy" for lo, hi in self._runs_saved for part in ("keys", "rows")}
+        for name in os.listdir(self.index_dir):
+            if name.startswith("bands-") and name not in keep:
+                os.remove(self._path(name))  # merged away, or left by an interrupted save
+
+# -----------------------
+# DataFrame helper
+# -----------------------
+
+def add_dup_clusters(df: pd.DataFrame, index: Optional[NearDupIndex] = None,
+                     text_col: str = "text_clean", id_col: str = "id") -> pd.DataFrame:
+    """
+    Adds dup_cluster_id. Rows are indexed oldest first (created_utc when present), so a cluster
+    is named after its original post rather than the latest repost. Without an id column the
+    rows are labelled by position and a persistent index is neither matched nor extended.
+    """
+    if text_col not in df.columns:
+        raise ValueError(f"Input must have a '{text_col}' column (run preprocess.py first).")
+    if id_col not in df.columns and index is not None and index.index_dir:
+        # row numbers aren't post ids: they would collide with rows of earlier runs, so match this
+        # input against itself only and leave the persistent index untouched
+        print(f"[warn] no '{id_col}' column: not using the index in {index.index_dir}", file=sys.stderr)
+        index = NearDupIndex(num_perm=index.num_perm, bands=index.bands, threshold=index.threshold, seed=index.seed)
+    index = index if index is not None else NearDupIndex()
+    ids = df[id_col].astype(str) if id_col in df.columns else pd.Series(range(len(df)), index=df.index).astype(str)
+    if "created_utc" in df.columns:
+        order = np.argsort(pd.to_numeric(df["created_utc"], errors="coerce").fillna(np.inf).to_numpy(), kind="stable")
+    else:
+        order = np.arange(len(df))
+    texts = df[text_col].fillna("").astype(str).to_numpy()
+    labels = index.add(ids.to_numpy()[order].tolist(), texts[order].tolist())
+    out = np.empty(len(df), dtype=object)
+    out[order] = labels
+    df["dup_cluster_id"] = out
+    return df
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Label near-duplicate posts with a dup_cluster_id column.")
+    p.add_argument("-i", "--input", required=True, help="Preprocessed CSV (needs text_clean)")
+    p.add_argument("-o", "--output", required=True, help="Output CSV")
+    p.add_argument("--index", default=None, help="Index dir to match against and extend (incremental runs)")
+    p.add_argument("--threshold", type=float, default=0.7, help="Min estimated Jaccard similarity (default: 0.7)")
+    args = p.parse_args(argv)
+
+    df = pd.read_csv(args.input)
+    index = NearDupIndex(args.index, threshold=args.threshold)
+    df = add_dup_clusters(df, index)
+    index.save()
+    df.to_csv(args.output, index=False)
+    n_dup = int((df["dup_cluster_id"] != df["id"].astype(str)).sum()) if "id" in df.columns else 0
+    print(f"[neardup] {n_dup} of {len(df)} rows are near-duplicates (index: {len(index)} posts, "
+          f"{index.n_clusters} clusters)")
+    print(f"[write] csv → {args.output} (rows={len(df)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Hive-style partitioned Parquet dataset for preprocessed Reddit posts.
+
+Layout
+  <root>/subreddit=<name>/dt=<YYYY-MM-DD>/part-<run>-<nnn>.parquet
+  <root>/_manifest.json   one entry per file: path, subreddit, dt, rows, min/max created_utc, source
+  <root>/_manifest.lock   held while the manifest is read-modified-written
+
+What it does
+- Splits a frame by (subreddit, dt) and writes each group as size-bounded Parquet files
+- Appends: every run writes new part files under a unique run id; existing files are never rewritten
+- Idempotent per source: writing the same input (source=path) again replaces the files written for
+  it before instead of duplicating its rows
+- Concurrent writers take a lock file around the manifest update, so neither loses the other's entries
+- Partition values live in the directory names (Hive/Spark convention), not inside the files
+- Keeps the manifest so readers can prune by subreddit / date without listing or opening files
+
+Usage
+  python partitioned.py -i out/posts_preprocessed.csv -o out/posts_ds
+  python preprocess.py -i out/posts_clean.csv -o out/posts_preprocessed.csv --partition-dir out/posts_ds
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+MANIFEST = "_manifest.json"
+MANIFEST_LOCK = "_manifest.lock"
+LOCK_STALE_S = 600  # a lock this old was left by a crashed writer
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+PARTITION_COLS = ("subreddit", "dt")
+
+_UNSAFE_RE = re.compile(r"[^\w.\-]")
+
+def _part_value(v: Any) -> str:
+    if v is None or (isinstance(v, float) and pd.isna(v)) or str(v).strip() == "":
+        return DEFAULT_PARTITION
+    return _UNSAFE_RE.sub("_", str(v).strip())
+
+# -----------------------
+# Manifest
+# -----------------------
+
+def load_manifest(root: str) -> Dict[str, Any]:
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {"files": []}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.setdefault("files", [])
+    return data
+
+def save_manifest(root: str, manifest: Dict[str, Any]):
+    path = os.path.join(root, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+
+@contextmanager
+def manifest_lock(root: str, timeout_s: float = 60.0):
+    """Exclusive lock file next to the manifest (O_EXCL create works on every OS and most shares)."""
+    path = os.path.join(root, MANIFEST_LOCK)
+    deadline = time.time() + timeout_s
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > LOCK_STALE_S:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"manifest lock held too long: {path}")
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+# -----------------------
+# Writer
+# -----------------------
+
+def _rows_per_file(df: pd.DataFrame, max_rows: int, max_file_mb: Optional[float]) -> int:
+    if not max_file_mb or len(df) == 0:
+        return max_rows
+    # in-memory size is an upper bound for the compressed Parquet size
+    row_bytes = max(1.0, float(df.memory_usage(deep=True).sum()) / len(df))
+    return max(1, min(max_rows, int(max_file_mb * 1024 * 1024 / row_bytes)))
+
+def write_partitioned(df: pd.DataFrame,
+                      root: str,
+                      max_rows_per_file: int = 500_000,
+                      max_file_mb: Optional[float] = 128,
+                      source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Appends df to the dataset at root and returns the new manifest entries.
+    Requires 'subreddit' and 'dt' columns (preprocess.py output).
+    source (e.g. the input path): files written earlier for the same source are replaced.
+    """
+    missing = [c for c in PARTITION_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Input must have partition column(s): {missing}")
+
+    df = df.reset_index(drop=True)
+    os.makedirs(root, exist_ok=True)
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    per_file = _rows_per_file(df, max_rows_per_file, max_file_mb)
+
+    keys = df[list(PARTITION_COLS)].apply(lambda col: col.map(_part_value))
+    created = pd.to_numeric(df["created_utc"], errors="coerce") if "created_utc" in df.columns else None
+
+    new_entries: List[Dict[str, Any]] = []
+    for (sub, day), idx in df.groupby([keys["subreddit"], keys["dt"]], sort=True).groups.items():
+        rel_dir = f"subreddit={sub}/dt={day}"
+        os.makedirs(os.path.join(root, rel_dir), exist_ok=True)
+        group = df.loc[idx].drop(columns=list(PARTITION_COLS))
+        for n, start in enumerate(range(0, len(group), per_file)):
+            chunk = group.iloc[start:start + per_file]
+            rel_path = f"{rel_dir}/part-{run_id}-{n:03d}.parquet"
+            chunk.to_parquet(os.path.join(root, rel_path), index=False)
+
+            entry: Dict[str, Any] = {
+                "path": rel_path,
+                "subreddit": sub,
+                "dt": day,
+                "rows": int(len(chunk)),
+                "min_created_utc": None,
+                "max_created_utc": None,
+                "written_utc": run_id[:15],
+            }
+            if source is not None:
+                entry["source"] = source
+            if created is not None:
+                c = created.loc[chunk.index].dropna()
+                if len(c):
+                    entry["min_created_utc"] = int(c.min())
+                    entry["max_created_utc"] = int(c.max())
+            new_entries.append(entry)
+
+    with manifest_lock(root):
+        manifest = load_manifest(root)
+        replaced = [e for e in manifest["files"] if source is not None and e.get("source") == source]
+        manifest["files"] = [e for e in manifest["files"] if e not in replaced] + new_entries
+        save_manifest(root, manifest)
+    # only after the manifest stops listing them, so readers never see a missing file
+    for e in replaced:
+        try:
+            os.remove(os.path.join(root, e["path"]))
+        except FileNotFoundError:
+            pass
+    return new_entries
+
+# -----------------------
+# Readers
+# -----------------------
+
+def prune(root: str,
+          subreddits: Optional[List[str]] = None,
+          since: Optional[int] = None,
+          until: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Manifest entries that may contain rows matching the filters.
+    since/until are epoch seconds (inclusive).
+    """
+    wanted = {_part_value(s).lower() for s in subreddits} if subreddits else None
+    out = []
+    for e in load_manifest(root)["files"]:
+        if wanted is not None and e["subreddit"].lower() not in wanted:
+            continue
+        lo, hi = e.get("min_created_utc"), e.get("max_created_utc")
+        if since is not None and hi is not None and hi < since:
+            continue
+        if until is not None and lo is not None and lo > until:
+            continue
+        out.append(e)
+    return out
+
+def read_partitioned(root: str,
+                     subreddits: Optional[List[str]] = None,
+                     since: Optional[int] = None,
+                     until: Optional[int] = None,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Reads only the pruned files and restores the partition columns from the manifest."""
+    frames = []
+    for e in prune(root, subreddits, since, until):
+        df = pd.read_parquet(os.path.join(root, e["path"]), columns=columns)
+        df["subreddit"] = e["subreddit"]
+        df["dt"] = e["dt"]
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=(columns or []) + list(PARTITION_COLS))
+    return pd.concat(frames, ignore_index=True)
+
+# -----------------------
+# CLI
+# -----------------------
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Append preprocessed Reddit rows to a subreddit=/dt= Parquet dataset.")
+    p.add_argument("-i", "--input", required=True, nargs="+", help="Input CSV/Parquet file(s) from preprocess.py")
+    p.add_argument("-o", "--output", required=True, help="Dataset root directory")
+    p.add_argument("--max-rows", type=int, default=500_000, help="Max rows per Parquet file (default: 500000)")
+    p.add_argument("--max-file-mb", type=float, default=128, help="Approx. max size per file in MB (default: 128)")
+    args = p.parse_args(argv)
+
+    for path in args.input:
+        if path.lower().endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path)
+        try:
+            entries = write_partitioned(df, args.output, args.max_rows, args.max_file_mb,
+                                        source=os.path.abspath(path))
+        except ValueError as e:
+            print(f"[warn] skipped {path}: {e}", file=sys.stderr)
+            continue
+        print(f"[write] {path} → {args.output} ({len(df)} rows, {len(entries)} files)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline: crawl → clean → preprocess → sentiment in one pass.
+
+What it does
+- Crawls posts exactly like redditCrawler.py (same config.yaml, same flatten_submission)
+- Groups rows into batches and hands them to cleaner.clean_posts → preprocess.preprocess
+  → sentiment.add_sentiment, each stage running in its own thread
+- Stages are connected by bounded queues, so a slow stage blocks the ones upstream
+  instead of letting batches pile up in memory (at most queue_size batches per hop)
+- Writes only the final enriched CSV; --tee-dir additionally appends every stage's
+  batches to <tee-dir>/<stage>.csv
+- Drops ids already written by earlier batches (per-batch dedupe can't see across batches); only the
+  last --dedupe-window ids are remembered, so memory stays flat on long crawls
+
+Comments are not part of this pipeline; cleaner/preprocess/sentiment are post stages.
+
+Usage
+  python pipeline.py --config config.yaml -o out/posts_enriched.csv
+  python pipeline.py --config config.yaml -o out/posts_enriched.csv --tee-dir out/stages --batch-size 500
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+
+from redditCrawler import PostRow, load_settings, iter_subreddit_posts, make_client
+from cleaner import clean_posts
+from preprocess import preprocess
+from sentiment import add_sentiment
+
+_END = object()  # end-of-stream marker passed down the queues
+
+# ---------------- Queue helpers ----------------
+
+def _put(q: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q: "queue.Queue", stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.2)
+        except queue.Empty:
+            continue
+    return _END
+
+def _append_csv(path: str, df: pd.DataFrame, header_written: Dict[str, bool]):
+    first = not header_written.get(path)
+    df.to_csv(path, index=False, header=first, mode="w" if first else "a", encoding="utf-8")
+    header_written[path] = True
+
+# ---------------- Stages ----------------
+
+class Stage(threading.Thread):
+    """
+    Pulls batches from in_q, applies fn and pushes the result to out_q.
+    fn may return None / an empty frame to drop a batch. Errors stop the whole pipeline.
+    """
+    def __init__(self, name: str, fn: Callable[[pd.DataFrame], Optional[pd.DataFrame]],
+                 in_q: "queue.Queue", out_q: "queue.Queue", stop: threading.Event,
+                 tee_path: Optional[str] = None):
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.in_q = in_q
+        self.out_q = out_q
+        self.stop = stop
+        self.tee_path = tee_path
+        self.error: Optional[BaseException] = None
+        self.rows_in = 0
+        self.rows_out = 0
+        self._headers: Dict[str, bool] = {}
+
+    def run(self):
+        try:
+            while True:
+                batch = _get(self.in_q, self.stop)
+                if batch is _END:
+                    break
+                self.rows_in += len(batch)
+                out = self.fn(batch)
+                if out is None or len(out) == 0:
+                    continue
+                self.rows_out += len(out)
+                if self.tee_path:
+                    _append_csv(self.tee_path, out, self._headers)
+                if not _put(self.out_q, out, self.stop):
+                    break
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            _put(self.out_q, _END, self.stop)
+
+def _produce(rows: Iterable[Union[PostRow, Dict[str, Any]]], out_q: "queue.Queue", batch_size: int,
+             stop: threading.Event, errors: List[BaseException]):
+    batch: List[Union[PostRow, Dict[str, Any]]] = []
+    try:
+        for row in rows:
+            if stop.is_set():
+                return
+            batch.append(row)
+            if len(batch) >= batch_size:
+                if not _put(out_q, pd.DataFrame(batch), stop):
+                    return
+                batch = []
+        if batch:
+            _put(out_q, pd.DataFrame(batch), stop)
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(out_q, _END, stop)
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    # filters are already applied at crawl time; this is normalization + per-batch dedupe
+    return clean_posts(df, since=None, until=None, subs=None, min_score=None,
+                       anonymize_authors=False, salt="", verbose=False).reset_index(drop=True)
+
+def _make_preprocess(keep_nsfw: bool, tz_str: str, offset_hours: int) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    def _pre(df: pd.DataFrame) -> pd.DataFrame:
+        return preprocess(df, keep_nsfw=keep_nsfw, tz_str=tz_str, offset_hours=offset_hours)
+    return _pre
+
+# ---------------- Runner ----------------
+
+def iter_crawled_posts(config_path: str, subreddits: Optional[List[str]] = None) -> Iterable[PostRow]:
+    settings = load_settings(config_path, subreddits)
+    rc = make_client(settings.raw.get("retry"))
+    print(f"MODE: {'search' if settings.use_search else 'new'} | subs={settings.subreddits}")
+    for sub in settings.subreddits:
+        for _, p in iter_subreddit_posts(rc, sub, settings):
+            yield p
+
+def run_pipeline(rows: Iterable[Union[PostRow, Dict[str, Any]]],
+                 output: str,
+                 batch_size: int = 500,
+                 queue_size: int = 4,
+                 tee_dir: Optional[str] = None,
+                 keep_nsfw: bool = False,
+                 tz_str: str = "Asia/Bangkok",
+                 offset_hours: int = 7,
+                 dedupe_window: int = 200_000) -> int:
+    """
+    Runs rows through clean → preprocess → sentiment and appends the result to `output`.
+    Ids are deduped against the last `dedupe_window` ids written.
+    Returns the number of rows written.
+    """
+    stop = threading.Event()
+    stage_fns = [
+        ("clean", _clean),
+        ("preprocess", _make_preprocess(keep_nsfw, tz_str, offset_hours)),
+        ("sentiment", add_sentiment),
+    ]
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stage_fns) + 1)]
+
+    if tee_dir:
+        os.makedirs(tee_dir, exist_ok=True)
+    stages = [
+        Stage(name, fn, queues[i], queues[i + 1], stop,
+              tee_path=os.path.join(tee_dir, f"{name}.csv") if tee_dir else None)
+        for i, (name, fn) in enumerate(stage_fns)
+    ]
+    producer_errors: List[BaseException] = []
+    producer = threading.Thread(
+        target=_produce, args=(rows, queues[0], batch_size, stop, producer_errors),
+        name="crawl", daemon=True,
+    )
+
+    for t in [producer, *stages]:
+        t.start()
+
+    # Sink runs on the calling thread
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    headers: Dict[str, bool] = {}
+    seen_ids = set()
+    seen_order: deque = deque()  # eviction order for seen_ids
+    written = 0
+    try:
+        while True:
+            batch = _get(queues[-1], stop)
+            if batch is _END:
+                break
+            if "id" in batch.columns:
+                batch = batch[~batch["id"].isin(seen_ids)]
+                new_ids = list(dict.fromkeys(batch["id"].tolist()))
+                seen_ids.update(new_ids)
+                seen_order.extend(new_ids)
+                while len(seen_order) > dedupe_window:
+                    seen_ids.discard(seen_order.popleft())
+            if len(batch) == 0:
+                continue
+            _append_csv(output, batch, headers)
+            written += len(batch)
+    except KeyboardInterrupt:
+        stop.set()
+        raise
+    finally:
+        producer.join(timeout=5)
+        for t in stages:
+            t.join(timeout=5)
+
+    for e in producer_errors + [t.error for t in stages if t.error]:
+        raise e
+
+    for t in stages:
+        print(f"[stage] {t.name}: rows in={t.rows_in} out={t.rows_out}")
+    print(f"[write] csv → {output} (rows={written})")
+    return written
+
+def main():
+    ap = argparse.ArgumentParser(description="Crawl → clean → preprocess → sentiment in one streaming pass.")
+    ap.add_argument("--config", default="config.yaml", help="Path to YAML config.")
+    ap.add_argument("--subreddit", nargs="+", help="Override subreddits from config")
+    ap.add_argument("-o", "--output", required=True, help="Final enriched CSV path")
+    ap.add_argument("--batch-size", type=int, default=500, help="Rows per batch between stages (default: 500)")
+    ap.add_argument("--queue-size", type=int, default=4, help="Max batches buffered between two stages (default: 4)")
+    ap.add_argument("--tee-dir", default=None, help="Also write each stage's output to <dir>/<stage>.csv")
+    ap.add_argument("--keep-nsfw", action="store_true", help="Keep NSFW posts (default: drop)")
+    ap.add_argument("--timezone", default="Asia/Bangkok", help="IANA timezone name (default: Asia/Bangkok)")
+    ap.add_argument("--offset", type=int, default=7,
+                    help="Fallback UTC offset hours if zoneinfo unavailable (default: 7)")
+    ap.add_argument("--dedupe-window", type=int, default=200_000,
+                    help="How many recent ids to dedupe against across batches (default: 200000)")
+    args = ap.parse_args()
+
+    if os.path.exists(args.output):
+        print(f"[warn] overwriting {args.output}", file=sys.stderr)
+
+    run_pipeline(
+        iter_crawled_posts(args.config, args.subreddit),
+        output=args.output,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        tee_dir=args.tee_dir,
+        keep_nsfw=args.keep_nsfw,
+        tz_str=args.timezone,
+        offset_hours=args.offset,
+        dedupe_window=args.dedupe_window,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -11,17 +11,23 @@ What it does
 - Drops NSFW rows (over_18 == True) unless --keep-nsfw
 - Drops empty text rows
 - Deduplicates by (id, permalink, url, title) keeping the newest
+- Optionally labels near-duplicates (reposts, edited titles) with dup_cluster_id (--near-dups, see neardup.py)
 - Writes CSV (optionally Parquet with --parquet)
+- Optionally appends to a subreddit=/dt= partitioned Parquet dataset (--partition-dir, see partitioned.py)
 
 Usage
   python preprocess_reddit.py -i posts_clean.csv -o posts_preprocessed.csv
   python preprocess_reddit.py -i posts_clean.csv -o out/ --parquet   # writes Parquet folder
+  python preprocess_reddit.py -i posts_clean.csv -o posts_preprocessed.csv --partition-dir out/posts_ds
+  python preprocess_reddit.py -i posts_clean.csv -o posts_preprocessed.csv --near-dups --dup-index out/neardup
 """
 
 import argparse
+import os
 import re
 import sys
 from datetime import datetime, timezone, timedelta
+from typing import List, Optional
 
 import numpy as np
 import pandas as pd
@@ -78,6 +84,8 @@ def preprocess(
     keep_nsfw: bool = False,
     tz_str: str = "Asia/Bangkok",
     offset_hours: int = 7,
+    near_dups: bool = False,
+    dup_index=None,
 ):
     # ----- choose a text field -----
     has_self = "selftext" in df.columns
@@ -129,6 +137,11 @@ def preprocess(
         df = df.sort_values(by=["created_at_utc"], ascending=False)\
                .drop_duplicates(subset=keys, keep="first")
 
+    # ----- near-duplicates (labelled, not dropped) -----
+    if near_dups or dup_index is not None:
+        from neardup import add_dup_clusters
+        df = add_dup_clusters(df, dup_index)
+
     # ----- keep useful columns if present -----
     keep_cols = [
         "id", "subreddit", "author",
@@ -136,12 +149,12 @@ def preprocess(
         "url", "permalink", "link_flair_text",
         "ups", "downs", "score", "num_comments", "upvote_ratio",
         "is_self", "over_18", "spoiler", "stickied", "locked",
-        "created_utc", "created_at_utc", "created_at_local", "dt"
+        "created_utc", "created_at_utc", "created_at_local", "dt", "dup_cluster_id"
     ]
     existing = [c for c in keep_cols if c in df.columns]
     return df[existing].reset_index(drop=True)
 
-def main():
+def main(argv: Optional[List[str]] = None):
     p = argparse.ArgumentParser(description="Preprocess Reddit CSV for Hive/Spark.")
     p.add_argument("-i", "--input", required=True, help="Input CSV path")
     p.add_argument("-o", "--output", required=True,
@@ -153,10 +166,20 @@ def main():
                    help="Fallback UTC offset hours if zoneinfo unavailable (default: 7)")
     p.add_argument("--parquet", action="store_true",
                    help="Write Parquet instead of CSV (output treated as directory)")
+    p.add_argument("--partition-dir", default=None,
+                   help="Also append rows to a Hive-style subreddit=/dt= Parquet dataset here")
+    p.add_argument("--max-file-mb", type=float, default=128,
+                   help="Approx. max Parquet file size for --partition-dir (default: 128)")
+    p.add_argument("--near-dups", action="store_true",
+                   help="Add dup_cluster_id (MinHash LSH over text_clean, see neardup.py)")
+    p.add_argument("--dup-index", default=None,
+                   help="Near-dup index dir shared across runs (implies --near-dups)")
+    p.add_argument("--dup-threshold", type=float, default=0.7,
+                   help="Min estimated Jaccard similarity for --near-dups (default: 0.7)")
     p.add_argument("--encoding", default="utf-8",
                    help="CSV encoding (default: utf-8)")
     p.add_argument("--sep", default=",", help="CSV delimiter (default: ,)")
-    args = p.parse_args()
+    args = p.parse_args(argv)
 
     try:
         df = pd.read_csv(args.input, encoding=args.encoding, sep=args.sep, on_bad_lines="skip")
@@ -164,12 +187,23 @@ def main():
         # pandas < 1.4 compatibility (no on_bad_lines)
         df = pd.read_csv(args.input, encoding=args.encoding, sep=args.sep, error_bad_lines=False)
 
+    dup_index = None
+    if args.near_dups or args.dup_index:
+        from neardup import NearDupIndex
+        dup_index = NearDupIndex(args.dup_index, threshold=args.dup_threshold)
+
     out = preprocess(
         df,
         keep_nsfw=args.keep_nsfw,
         tz_str=args.timezone,
         offset_hours=args.offset,
+        near_dups=dup_index is not None,
+        dup_index=dup_index,
     )
+    if dup_index is not None:
+        dup_index.save()
+        n_dup = int((out["dup_cluster_id"] != out["id"].astype(str)).sum()) if "id" in out.columns else 0
+        print(f"[neardup] {n_dup} near-duplicate row(s), {dup_index.n_clusters} cluster(s) in index")
 
     if args.parquet:
         # write parquet; args.output is a folder
@@ -179,6 +213,12 @@ def main():
         out.to_csv(args.output, index=False)
         print(f"[write] csv → {args.output} (rows={len(out)})")
 
+    if args.partition_dir:
+        from partitioned import write_partitioned
+        entries = write_partitioned(out, args.partition_dir, max_file_mb=args.max_file_mb,
+                                    source=os.path.abspath(args.input))
+        print(f"[write] partitions → {args.partition_dir} (files={len(entries)})")
+
 if __name__ == "__main__":
     # Optional: make pandas printing predictable if user runs interactively
     pd.set_option("display.max_colwidth", 200)
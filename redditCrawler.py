@@ -1,19 +1,27 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import time
+import threading
+import csv
 import json
 import argparse
 import pathlib
 import datetime as dt
-from typing import List, Dict, Any, Optional, Union
+import dataclasses
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Union, Iterator, Tuple, Callable, NamedTuple
 
 import praw
-import pandas as pd
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from tqdm import tqdm
 
+from metrics import METRICS, InstrumentedRequestor
+from resilience import Retrier, CircuitOpen, is_transient
+from sharding import ShardedSearch, shard_options
+from scheduler import Scheduler, SubSchedule
+
 # ---------------- Utils ----------------
 
 def iso_to_epoch(iso_str: str) -> Optional[int]:
@@ -53,12 +61,56 @@ def normalize_depth(cfg_val: Union[str, int, None]) -> Optional[int]:
         return cfg_val
     return None
 
+# ---------------- Rows ----------------
+
+class PostRow(NamedTuple):
+    """One crawled post. A plain tuple (no per-row dict); the field order is the CSV column order."""
+    kind: str
+    id: str
+    subreddit: str
+    author: Optional[str]
+    title: str
+    selftext: str
+    url: str
+    is_self: Optional[bool]
+    over_18: Optional[bool]
+    spoiler: Optional[bool]
+    stickied: Optional[bool]
+    locked: Optional[bool]
+    upvote_ratio: Optional[float]
+    ups: Optional[int]
+    downs: Optional[int]
+    score: Optional[int]
+    num_comments: Optional[int]
+    created_utc: Optional[int]
+    link_flair_text: Optional[str]
+    edited: Union[bool, int, None]
+    permalink: Optional[str]
+
+class CommentRow(NamedTuple):
+    """One crawled comment (see PostRow)."""
+    kind: str
+    id: str
+    subreddit: str
+    submission_id: str
+    author: Optional[str]
+    body: str
+    score: Optional[int]
+    created_utc: Optional[int]
+    is_submitter: Optional[bool]
+    parent_id: Optional[str]
+    permalink: str
+    depth: Optional[int]
+
+Row = Union[PostRow, CommentRow]
+
 # ---------------- Output Writers ----------------
 
 class RotatingWriter:
     """
     Supports CSV and NDJSON ("json") with file rotation.
-    - CSV: writes header once per part; fields = union of seen keys so far in that part.
+    - Rows are PostRow / CommentRow tuples (dicts still work, e.g. from other tools).
+    - CSV: writes header once per part; fields = the row schema (or union of keys for dict rows).
     - JSON: newline-delimited JSON (one object per line).
     """
     def __init__(self, out_dir: str, base_name: str, fmt: str, rotate_every: int):
@@ -66,7 +118,7 @@ class RotatingWriter:
         self.base_name = base_name
         self.fmt = fmt.lower()
         self.rotate_every = rotate_every or 10_000
-        self.buffer: List[Dict[str, Any]] = []
+        self.buffer: List[Union[Row, Dict[str, Any]]] = []
         self.part = 0
         self.csv_fields: List[str] = []
         ensure_dir(out_dir)
@@ -79,24 +131,35 @@ class RotatingWriter:
         filename = f"{self.base_name}.part{self.part:03d}.{ext}"
         return os.path.join(self.out_dir, filename)
 
-    def add(self, row: Dict[str, Any]):
+    def add(self, row: Union[Row, Dict[str, Any]]):
         self.buffer.append(row)
         if len(self.buffer) >= self.rotate_every:
             self.flush()
 
-    def _write_csv(self, path: str, rows: List[Dict[str, Any]]):
-        # Build/extend field list for this part
-        for r in rows:
-            for k in r.keys():
-                if k not in self.csv_fields:
-                    self.csv_fields.append(k)
-        df = pd.DataFrame(rows, columns=self.csv_fields)
-        header = True  # new part => write header
-        df.to_csv(path, index=False, header=header, mode="w", encoding="utf-8")
-
-    def _write_ndjson(self, path: str, rows: List[Dict[str, Any]]):
+    def _write_csv(self, path: str, rows: List[Union[Row, Dict[str, Any]]]):
+        first = rows[0]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, lineterminator="\n")
+            if isinstance(first, tuple) and all(type(r) is type(first) for r in rows):
+                # one schema for the whole part: tuples go straight to the csv writer
+                self.csv_fields = list(first._fields)
+                w.writerow(self.csv_fields)
+                w.writerows(rows)
+                return
+            # Build/extend field list for this part
+            dicts = [r._asdict() if isinstance(r, tuple) else r for r in rows]
+            for r in dicts:
+                for k in r.keys():
+                    if k not in self.csv_fields:
+                        self.csv_fields.append(k)
+            w.writerow(self.csv_fields)
+            w.writerows([r.get(k) for k in self.csv_fields] for r in dicts)
+
+    def _write_ndjson(self, path: str, rows: List[Union[Row, Dict[str, Any]]]):
         with open(path, "w", encoding="utf-8") as f:
             for obj in rows:
+                if isinstance(obj, tuple):
+                    obj = dict(zip(obj._fields, obj))
                 f.write(json.dumps(obj, ensure_ascii=False) + "\n")
 
     def flush(self, final: bool = False):
@@ -104,12 +167,14 @@ class RotatingWriter:
             return
         self.part += 1
         fpath = self._next_path()
-        if self.fmt == "csv":
-            # reset fields for each part
-            self.csv_fields = []
-            self._write_csv(fpath, self.buffer)
-        else:
-            self._write_ndjson(fpath, self.buffer)
+        with METRICS.timer("stage_seconds", stage="write", file=self.base_name):
+            if self.fmt == "csv":
+                # reset fields for each part
+                self.csv_fields = []
+                self._write_csv(fpath, self.buffer)
+            else:
+                self._write_ndjson(fpath, self.buffer)
+        METRICS.inc("rows_written_total", len(self.buffer), file=self.base_name)
         self.buffer.clear()
         if final:
             print(f"[write] → {fpath}")
@@ -119,23 +184,77 @@ class RotatingWriter:
 
 # ---------------- Reddit Client ----------------
 
+CREDENTIAL_FIELDS = {
+    "client_id": "CLIENT_ID",
+    "client_secret": "CLIENT_SECRET",
+    "username": "USERNAME",
+    "password": "PASSWORD",
+    "user_agent": "USER_AGENT",
+}
+
+def load_credentials() -> List[Dict[str, Optional[str]]]:
+    """
+    Credential sets from the environment / .env, one per registered app:
+      REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, ...           (unsuffixed set, as before)
+      REDDIT_CLIENT_ID_1, REDDIT_CLIENT_SECRET_1, ... _N    (additional apps)
+    """
+    load_dotenv()
+    suffixes = sorted({m.group(1) for m in (re.match(r"REDDIT_CLIENT_ID_(\d+)$", k) for k in os.environ) if m},
+                      key=int)
+    creds = []
+    for tail in [""] + [f"_{n}" for n in suffixes]:
+        if not os.getenv(f"REDDIT_CLIENT_ID{tail}"):
+            continue
+        cred = {k: os.getenv(f"REDDIT_{v}{tail}") for k, v in CREDENTIAL_FIELDS.items()}
+        cred["user_agent"] = cred["user_agent"] or os.getenv("REDDIT_USER_AGENT", "reddit-crawler")
+        creds.append(cred)
+    return creds
+
 class RedditClient:
-    def __init__(self):
-        load_dotenv()
-        self.reddit = praw.Reddit(
-            client_id=os.getenv("REDDIT_CLIENT_ID"),
-            client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-            username=os.getenv("REDDIT_USERNAME"),
-            password=os.getenv("REDDIT_PASSWORD"),
-            user_agent=os.getenv("REDDIT_USER_AGENT", "reddit-crawler")
+    def __init__(self, reddit: Optional[praw.Reddit] = None, retry_cfg: Optional[Dict[str, Any]] = None,
+                 credentials: Optional[Dict[str, Optional[str]]] = None, retrier: Optional[Retrier] = None):
+        # page-level retries + per-subreddit circuit breaker (see resilience.py)
+        self.retrier = retrier or Retrier.from_config(retry_cfg)
+        self.credentials = credentials
+        self._injected = reddit is not None
+        # `reddit` lets callers inject a praw-compatible instance (e.g. fakereddit.FakeReddit)
+        if reddit is not None:
+            self.reddit = reddit
+            return
+        self.reddit = self._new_reddit(credentials)
+
+    @staticmethod
+    def _new_reddit(credentials: Optional[Dict[str, Optional[str]]] = None) -> praw.Reddit:
+        if credentials is None:
+            found = load_credentials()
+            credentials = found[0] if found else {
+                k: os.getenv(f"REDDIT_{v}") for k, v in CREDENTIAL_FIELDS.items()
+            }
+        return praw.Reddit(
+            client_id=credentials.get("client_id"),
+            client_secret=credentials.get("client_secret"),
+            username=credentials.get("username"),
+            password=credentials.get("password"),
+            user_agent=credentials.get("user_agent") or "reddit-crawler",
+            requestor_class=InstrumentedRequestor,
         )
 
-    @retry(
-        reraise=True,
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
-        retry=retry_if_exception_type(Exception),
-    )
+    def fork(self) -> "RedditClient":
+        """
+        Client for another thread: own praw session, shared retry policies / circuit breaker.
+        Injected instances are shared as-is.
+        """
+        clone = RedditClient.__new__(RedditClient)
+        clone.retrier = self.retrier
+        clone.credentials = self.credentials
+        clone._injected = self._injected
+        clone.reddit = self.reddit if self._injected else self._new_reddit(self.credentials)
+        return clone
+
+    def for_comments(self, submission):
+        """The submission to fetch comments through (RedditClientPool may rebind it)."""
+        return submission
+
     def search_submissions(self, subreddit: str, query: str, since: Optional[int], until: Optional[int]):
         # Use CloudSearch syntax with timestamp filter
         time_query = ""
@@ -147,81 +266,177 @@ class RedditClient:
             time_query = f"timestamp:0..{until}"
 
         final_query = " ".join(x for x in [query, time_query] if x).strip()
-        return self.reddit.subreddit(subreddit).search(
-            query=final_query,
-            sort="new",
-            syntax="cloudsearch",
-            limit=None
+        # paged by hand so a failed page is retried from its `after` cursor
+        return self.retrier.listing(
+            self.reddit,
+            f"r/{subreddit}/search/",
+            {"q": final_query, "restrict_sr": True, "sort": "new", "syntax": "cloudsearch", "t": "all"},
+            endpoint="search",
+            key=subreddit,
         )
 
-    @retry(
-        reraise=True,
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
-        retry=retry_if_exception_type(Exception),
-    )
     def new_submissions(self, subreddit: str):
-        return self.reddit.subreddit(subreddit).new(limit=None)
+        return self.retrier.listing(self.reddit, f"r/{subreddit}/new", {}, endpoint="new", key=subreddit)
+
+# full x-ratelimit window per OAuth app (100 QPM averaged over 10 minutes)
+FULL_BUDGET = 1000.0
+
+class _Budget:
+    """Rate-limit budget of one app, shared by every session (fork) using its credentials."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.remaining: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.used: Optional[int] = None
+        self.picks = 0  # calls routed here since the last header update
+
+    def observe(self, limits: Dict[str, Any]):
+        remaining = (limits or {}).get("remaining")
+        if remaining is None:
+            return
+        with self._lock:
+            if limits.get("used") != self.used:
+                self.picks = 0
+            self.remaining = float(remaining)
+            self.used = limits.get("used")
+            self.reset_at = limits.get("reset_timestamp")
+
+    def estimate(self, now: float) -> float:
+        with self._lock:
+            if self.remaining is None or (self.reset_at and now >= self.reset_at):
+                return FULL_BUDGET - self.picks
+            return self.remaining - self.picks
+
+    def reserve(self):
+        with self._lock:
+            self.picks += 1
+
+class RedditClientPool:
+    """
+    Several RedditClients (one per registered app) behind the RedditClient interface.
+    Every listing and comment fetch goes to the client with the most rate-limit budget left,
+    as reported by praw's x-ratelimit bookkeeping (reddit.auth.limits).
+    """
+    def __init__(self, clients: List[RedditClient], budgets: Optional[List[_Budget]] = None):
+        if not clients:
+            raise ValueError("RedditClientPool needs at least one client")
+        self.clients = clients
+        self.budgets = budgets or [_Budget() for _ in clients]
+        # one retrier, so the per-subreddit breaker sees failures from every app
+        self.retrier = clients[0].retrier
+
+    @classmethod
+    def from_credentials(cls, credentials: List[Dict[str, Optional[str]]],
+                         retry_cfg: Optional[Dict[str, Any]] = None) -> "RedditClientPool":
+        retrier = Retrier.from_config(retry_cfg)
+        return cls([RedditClient(credentials=c, retrier=retrier) for c in credentials])
+
+    @property
+    def reddit(self):
+        return self.clients[0].reddit
+
+    def pick(self) -> RedditClient:
+        now = time.time()
+        for client, budget in zip(self.clients, self.budgets):
+            auth = getattr(client.reddit, "auth", None)
+            budget.observe(getattr(auth, "limits", None))
+        best = max(range(len(self.clients)), key=lambda i: self.budgets[i].estimate(now))
+        self.budgets[best].reserve()
+        METRICS.inc("pool_picks_total", client=str(best))
+        METRICS.set("pool_budget", self.budgets[best].estimate(now), client=str(best))
+        return self.clients[best]
+
+    def fork(self) -> "RedditClientPool":
+        return RedditClientPool([c.fork() for c in self.clients], self.budgets)
+
+    def search_submissions(self, subreddit: str, query: str, since: Optional[int], until: Optional[int]):
+        return self.pick().search_submissions(subreddit, query=query, since=since, until=until)
+
+    def new_submissions(self, subreddit: str):
+        return self.pick().new_submissions(subreddit)
+
+    def for_comments(self, submission):
+        # a lazy submission on the chosen app: the comment fetch is the same single call either way
+        return self.pick().reddit.submission(id=submission.id)
+
+def make_client(retry_cfg: Optional[Dict[str, Any]] = None):
+    """A RedditClientPool when several credential sets are configured, else a plain RedditClient."""
+    creds = load_credentials()
+    if len(creds) > 1:
+        print(f"[client] pooling {len(creds)} credential sets")
+        return RedditClientPool.from_credentials(creds, retry_cfg)
+    return RedditClient(retry_cfg=retry_cfg, credentials=creds[0] if creds else None)
+
 
 # ---------------- Flatteners ----------------
 
-def flatten_submission(s) -> Dict[str, Any]:
-    return {
-        "kind": "submission",
-        "id": s.id,
-        "subreddit": str(s.subreddit),
-        "author": str(s.author) if s.author else None,
-        "title": s.title,
-        "selftext": s.selftext,
-        "url": s.url,
-        "is_self": s.is_self,
-        "over_18": getattr(s, "over_18", None),
-        "spoiler": getattr(s, "spoiler", None),
-        "stickied": getattr(s, "stickied", None),
-        "locked": getattr(s, "locked", None),
-        "upvote_ratio": getattr(s, "upvote_ratio", None),
-        "ups": getattr(s, "ups", None),
-        "downs": getattr(s, "downs", None) if hasattr(s, "downs") else None,
-        "score": getattr(s, "score", None),
-        "num_comments": getattr(s, "num_comments", None),
-        "created_utc": to_safe_int(getattr(s, "created_utc", None)),
-        "link_flair_text": getattr(s, "link_flair_text", None),
-        "edited": s.edited if isinstance(getattr(s, "edited", False), bool) else to_safe_int(getattr(s, "edited", None)),
-        "permalink": f"https://www.reddit.com{s.permalink}" if getattr(s, "permalink", None) else None,
-    }
-
-def flatten_comment(c, submission_id: str, subreddit: str) -> Dict[str, Any]:
-    return {
-        "kind": "comment",
-        "id": c.id,
-        "subreddit": subreddit,
-        "submission_id": submission_id,
-        "author": str(c.author) if c.author else None,
-        "body": c.body,
-        "score": getattr(c, "score", None),
-        "created_utc": to_safe_int(getattr(c, "created_utc", None)),
-        "is_submitter": getattr(c, "is_submitter", None),
-        "parent_id": getattr(c, "parent_id", None),
-        "permalink": f"https://www.reddit.com{getattr(c, 'permalink', '')}",
-        "depth": getattr(c, "depth", None),
-    }
+def flatten_submission(s) -> PostRow:
+    return PostRow(
+        "submission",
+        s.id,
+        str(s.subreddit),
+        str(s.author) if s.author else None,
+        s.title,
+        s.selftext,
+        s.url,
+        s.is_self,
+        getattr(s, "over_18", None),
+        getattr(s, "spoiler", None),
+        getattr(s, "stickied", None),
+        getattr(s, "locked", None),
+        getattr(s, "upvote_ratio", None),
+        getattr(s, "ups", None),
+        getattr(s, "downs", None),
+        getattr(s, "score", None),
+        getattr(s, "num_comments", None),
+        to_safe_int(getattr(s, "created_utc", None)),
+        getattr(s, "link_flair_text", None),
+        s.edited if isinstance(getattr(s, "edited", False), bool) else to_safe_int(getattr(s, "edited", None)),
+        f"https://www.reddit.com{s.permalink}" if getattr(s, "permalink", None) else None,
+    )
+
+def flatten_comment(c, submission_id: str, subreddit: str) -> CommentRow:
+    return CommentRow(
+        "comment",
+        c.id,
+        subreddit,
+        submission_id,
+        str(c.author) if c.author else None,
+        c.body,
+        getattr(c, "score", None),
+        to_safe_int(getattr(c, "created_utc", None)),
+        getattr(c, "is_submitter", None),
+        getattr(c, "parent_id", None),
+        f"https://www.reddit.com{getattr(c, 'permalink', '')}",
+        getattr(c, "depth", None),
+    )
 
 # ---------------- Comment Crawling ----------------
 
-def crawl_comments_for_submission(submission, max_comments: int, sleep_ms: int, depth_limit: Optional[int]) -> List[Dict[str, Any]]:
+def crawl_comments_for_submission(submission, max_comments: int, sleep_ms: int, depth_limit: Optional[int],
+                                  retrier: Optional[Retrier] = None, subreddit: Optional[str] = None) -> List[CommentRow]:
     """
     depth_limit:
       None -> all
       1    -> only top-level (depth==0)
       2    -> <=1, etc.
+    retrier: retries the comment fetch on transient errors (keyed by subreddit)
+    subreddit: the submission's subreddit when already known; a lazy submission (RedditClientPool)
+      would otherwise be fetched just to read it, outside the retrier
     """
+    sub_name = subreddit or str(submission.subreddit)
     try:
         # expand all "MoreComments" so .list() returns a flat list with .depth set
-        submission.comments.replace_more(limit=0)
+        with METRICS.timer("stage_seconds", stage="replace_more"):
+            if retrier:
+                retrier.call(lambda: submission.comments.replace_more(limit=0),
+                             endpoint="comments", key=sub_name)
+            else:
+                submission.comments.replace_more(limit=0)
     except Exception:
-        pass
+        METRICS.inc("errors_total", stage="replace_more")
 
-    comments_data: List[Dict[str, Any]] = []
+    comments_data: List[CommentRow] = []
     count = 0
     for c in submission.comments.list():
         d = getattr(c, "depth", 0)
@@ -232,57 +447,65 @@ def crawl_comments_for_submission(submission, max_comments: int, sleep_ms: int,
             if d is not None and d > allowed_max_depth:
                 continue
 
-        comments_data.append(flatten_comment(c, submission.id, str(submission.subreddit)))
+        with METRICS.timer("stage_seconds", stage="flatten", kind="comment"):
+            comments_data.append(flatten_comment(c, submission.id, sub_name))
         count += 1
 
         if max_comments and count >= max_comments:
             break
         if sleep_ms:
-            time.sleep(sleep_ms / 1000.0)
+            METRICS.sleep(sleep_ms / 1000.0, stage="comment")
 
     return comments_data
 
-# ---------------- Main Runner ----------------
-
-def run(args):
-    # Load config
-    with open(args.config, "r", encoding="utf-8") as f:
+# ---------------- Settings ----------------
+
+@dataclass
+class CrawlSettings:
+    subreddits: List[str]
+    query: str
+    since_iso: str
+    until_iso: str
+    since: Optional[int]
+    until: Optional[int]
+    max_posts: Optional[int]
+    fetch_comments: bool
+    max_comments_per_post: int
+    depth_limit: Optional[int]
+    out_dir: str
+    fmt: str
+    rotate_every: int
+    sleep_ms: int
+    raw: Dict[str, Any] = field(default_factory=dict)
+    mode: Optional[str] = None  # "search" / "new" forces the listing (coordinator tasks)
+
+    @property
+    def use_search(self) -> bool:
+        # - If query is non-empty -> SEARCH mode (server-side filtering).
+        # - If query is empty     -> NEW mode (client-side time filtering using since/until).
+        if self.mode:
+            return self.mode == "search"
+        return bool(self.query)
+
+def load_settings(config_path: str, subreddits: Optional[List[str]] = None) -> CrawlSettings:
+    with open(config_path, "r", encoding="utf-8") as f:
         import yaml
-        cfg = yaml.safe_load(f)
-        
-        # Override subreddits from CLI if provided
-    if getattr(args, "subreddit", None):
-        cfg["subreddits"] = args.subreddit
-        
-    import os, time, json
-    config_path = os.path.abspath(args.config)
-    try:
-        st = os.stat(config_path)
-        print(f"[CONFIG] Using: {config_path} (size={st.st_size}B, mtime={time.ctime(st.st_mtime)})")
-    except Exception as e:
-        print(f"[CONFIG] Using: {config_path} (stat failed: {e})")
-
-    print("[CONFIG] Parsed subreddits:", json.dumps(cfg.get("subreddits", [])))
-    print("[CONFIG] query:", repr((cfg.get("query","") or "").strip()),
-          "| since:", repr(cfg.get("since","") or ""),
-          "| until:", repr(cfg.get("until","") or ""))
+        cfg = yaml.safe_load(f) or {}
 
+    # Override subreddits from CLI if provided
+    if subreddits:
+        cfg["subreddits"] = subreddits
 
-    subs: List[str] = cfg.get("subreddits", [])
     query: str = (cfg.get("query", "") or "").strip()
     since_iso: str = (cfg.get("since", "") or "").strip()
     until_iso: str = (cfg.get("until", "") or "").strip()
 
-    since = iso_to_epoch(since_iso)
-    until = iso_to_epoch(until_iso)
-
     raw_max = cfg.get("max_posts_per_subreddit", None)
     if raw_max in (None, 0, "0", "", "none", "None"):
         max_posts = None
     else:
         max_posts = to_safe_int(raw_max, None)
 
-
     # Comments settings
     fetch_comments = bool(cfg.get("fetch_comments", cfg.get("comments", {}).get("fetch", True)))
     max_comments_per_post = to_safe_int(
@@ -290,7 +513,6 @@ def run(args):
         500
     )
     comment_depth_cfg = cfg.get("comment_depth", cfg.get("comments", {}).get("depth", "all"))
-    depth_limit = normalize_depth(comment_depth_cfg)
 
     # Output
     out_dir = cfg.get("out_dir", cfg.get("output", {}).get("out_dir", "out"))
@@ -306,71 +528,215 @@ def run(args):
         250
     )
 
-    # Writers
-    posts_writer = RotatingWriter(out_dir, "posts", fmt, rotate_every)
-    comments_writer = RotatingWriter(out_dir, "comments", fmt, rotate_every) if fetch_comments and max_comments_per_post != 0 else None
+    return CrawlSettings(
+        subreddits=cfg.get("subreddits", []) or [],
+        query=query,
+        since_iso=since_iso,
+        until_iso=until_iso,
+        since=iso_to_epoch(since_iso),
+        until=iso_to_epoch(until_iso),
+        max_posts=max_posts,
+        fetch_comments=fetch_comments,
+        max_comments_per_post=max_comments_per_post,
+        depth_limit=normalize_depth(comment_depth_cfg),
+        out_dir=out_dir,
+        fmt=fmt,
+        rotate_every=rotate_every,
+        sleep_ms=sleep_ms,
+        raw=cfg,
+    )
 
-    # Client
-    rc = RedditClient()
+# ---------------- Subreddit Crawling ----------------
 
-    # Decide mode:
-    # - If query is non-empty -> SEARCH mode (server-side filtering).
-    # - If query is empty     -> NEW mode (client-side time filtering using since/until).
-    use_search = bool(query)
+def iter_subreddit_posts(rc: "RedditClient", sub: str, settings: CrawlSettings) -> Iterator[Tuple[Any, PostRow]]:
+    """
+    Yields (submission, flattened row) for one subreddit, applying the local
+    time window guard, max_posts and the polite sleep between posts.
+    """
+    shard_cfg = settings.raw.get("search_shards", {}) or {}
+    if shard_cfg.get("enabled") and (settings.use_search or settings.since):
+        # time-sliced windows searched in parallel, so a backfill isn't cut off at ~1000 posts
+        it = ShardedSearch(rc.fork, sub, settings.query, settings.since, settings.until,
+                           reddit=rc.reddit, **shard_options(shard_cfg))
+    elif settings.use_search:
+        it = rc.search_submissions(sub, query=settings.query, since=settings.since, until=settings.until)
+    else:
+        it = rc.new_submissions(sub)
+
+    since, until = settings.since, settings.until
+    count_posts = 0
+    # time spent waiting on the listing itself (page fetches, retries), apart from flatten/comments
+    it = METRICS.timed_iter(it, "stage_seconds", stage="listing")
+    for s in tqdm(it, desc=f"posts r/{sub}"):
+        with METRICS.timer("stage_seconds", stage="flatten", kind="post"):
+            p = flatten_submission(s)
 
-    # Helpful debug line (safe to keep)
-    print(f"MODE: {'search' if use_search else 'new'} | query={repr(query)} | since={since_iso or '∅'} | until={until_iso or '∅'} | subs={subs}")
+        # Local time window guard (always applies when provided)
+        if since and p.created_utc and p.created_utc < since:
+            continue
+        if until and p.created_utc and p.created_utc > until:
+            continue
 
-    # Crawl
-    for sub in subs:
-        print(f"\n=== Subreddit: r/{sub} ===")
-        if use_search:
-            it = rc.search_submissions(sub, query=query, since=since, until=until)
-        else:
-            it = rc.new_submissions(sub)
+        yield s, p
+        count_posts += 1
 
-        count_posts = 0
-        for s in tqdm(it, desc=f"posts r/{sub}"):
-            p = flatten_submission(s)
+        if settings.max_posts and count_posts >= settings.max_posts:
+            break
+        if settings.sleep_ms:
+            METRICS.sleep(settings.sleep_ms / 1000.0, stage="post")
+
+def make_writers(settings: CrawlSettings) -> Tuple[RotatingWriter, Optional[RotatingWriter]]:
+    posts_writer = RotatingWriter(settings.out_dir, "posts", settings.fmt, settings.rotate_every)
+    comments_writer = (
+        RotatingWriter(settings.out_dir, "comments", settings.fmt, settings.rotate_every)
+        if settings.fetch_comments and settings.max_comments_per_post != 0 else None
+    )
+    return posts_writer, comments_writer
 
-            # Local time window guard (always applies when provided)
-            if since and p["created_utc"] and p["created_utc"] < since:
-                continue
-            if until and p["created_utc"] and p["created_utc"] > until:
-                continue
+class SubCrawl(NamedTuple):
+    rows: int
+    ok: bool  # False: breaker open or listing retries ran out, rows is a partial count
 
+def crawl_subreddit(rc: "RedditClient", sub: str, settings: CrawlSettings,
+                    posts_writer: RotatingWriter, comments_writer: Optional[RotatingWriter],
+                    on_post: Optional[Callable[[PostRow], None]] = None,
+                    raise_on_failure: bool = False) -> SubCrawl:
+    """
+    Crawls one subreddit (posts + comments) into the given writers; returns rows written and
+    whether the listing finished. Transient failures that outlive the retries end the subreddit
+    early instead of the run, or are re-raised with raise_on_failure (queue workers re-queue them).
+    on_post(row) is called for every post written (e.g. the scheduler collecting created_utc).
+    """
+    sub_t0, sub_rows, ok = time.perf_counter(), 0, True
+    try:
+        for s, p in iter_subreddit_posts(rc, sub, settings):
             posts_writer.add(p)
-            count_posts += 1
+            sub_rows += 1
+            if on_post:
+                on_post(p)
+            METRICS.inc("rows_total", subreddit=sub, kind="post")
 
             if comments_writer:
                 try:
                     comments = crawl_comments_for_submission(
-                        submission=s,
-                        max_comments=max_comments_per_post,
-                        sleep_ms=sleep_ms,
-                        depth_limit=depth_limit
+                        submission=rc.for_comments(s),
+                        max_comments=settings.max_comments_per_post,
+                        sleep_ms=settings.sleep_ms,
+                        depth_limit=settings.depth_limit,
+                        retrier=rc.retrier,
+                        subreddit=p.subreddit,
                     )
                     for c in comments:
                         comments_writer.add(c)
+                    sub_rows += len(comments)
+                    METRICS.inc("rows_total", len(comments), subreddit=sub, kind="comment")
                 except Exception as e:
-                    print(f"[warn] comments failed for {p['id']}: {e}", file=sys.stderr)
+                    METRICS.inc("errors_total", stage="comments")
+                    print(f"[warn] comments failed for {p.id}: {e}", file=sys.stderr)
+
+            METRICS.set("rows_per_second", sub_rows / max(time.perf_counter() - sub_t0, 1e-9), subreddit=sub)
+    except CircuitOpen as e:
+        if raise_on_failure:
+            raise
+        ok = False
+        print(f"[warn] skipping r/{sub}: {e}", file=sys.stderr)
+    except Exception as e:
+        # retries exhausted on a transient error: keep what we have and move on
+        if not is_transient(e):
+            raise
+        METRICS.inc("errors_total", stage="listing")
+        if raise_on_failure:
+            raise
+        ok = False
+        print(f"[warn] listing failed for r/{sub} after retries: {e}", file=sys.stderr)
+    finally:
+        METRICS.inc("subreddit_seconds", time.perf_counter() - sub_t0, subreddit=sub)
+    return SubCrawl(sub_rows, ok)
+
+# ---------------- Main Runner ----------------
+
+def run(args, rc: Optional[RedditClient] = None):
+    settings = load_settings(args.config, getattr(args, "subreddit", None))
+
+    config_path = os.path.abspath(args.config)
+    try:
+        st = os.stat(config_path)
+        print(f"[CONFIG] Using: {config_path} (size={st.st_size}B, mtime={time.ctime(st.st_mtime)})")
+    except Exception as e:
+        print(f"[CONFIG] Using: {config_path} (stat failed: {e})")
+
+    print("[CONFIG] Parsed subreddits:", json.dumps(settings.subreddits))
+    print("[CONFIG] query:", repr(settings.query),
+          "| since:", repr(settings.since_iso),
+          "| until:", repr(settings.until_iso))
+
+    # Writers
+    posts_writer, comments_writer = make_writers(settings)
+
+    # Metrics: periodic JSON snapshot (+ optional Prometheus endpoint)
+    mcfg = settings.raw.get("metrics", {}) or {}
+    metrics_json = mcfg.get("json_path", os.path.join(settings.out_dir, "metrics.json"))
+    if metrics_json:
+        METRICS.start_reporter(metrics_json, float(mcfg.get("interval_s", 15) or 15))
+    prom_port = to_safe_int(mcfg.get("prometheus_port"), 0)
+    if prom_port:
+        METRICS.serve_prometheus(prom_port)
+        print(f"[metrics] Prometheus text on :{prom_port}/metrics")
+
+    # Client
+    rc = rc or make_client(settings.raw.get("retry"))
 
-            if sleep_ms:
-                time.sleep(sleep_ms / 1000.0)
+    # Helpful debug line (safe to keep)
+    sharded = (settings.raw.get("search_shards", {}) or {}).get("enabled") and (settings.use_search or settings.since)
+    mode = "sharded-search" if sharded else ("search" if settings.use_search else "new")
+    print(f"MODE: {mode} | query={repr(settings.query)} | "
+          f"since={settings.since_iso or '∅'} | until={settings.until_iso or '∅'} | subs={settings.subreddits}")
+
+    # Schedule: busy subs first with a page budget to match, quiet ones only when due
+    scfg = settings.raw.get("schedule", {}) or {}
+    scheduler = Scheduler.from_config(scfg, settings.out_dir) if scfg.get("enabled") else None
+    if scheduler:
+        plan = [s for s in scheduler.plan(settings.subreddits, default_posts=settings.max_posts) if s.due]
+        skipped = len(settings.subreddits) - len(plan)
+        print(f"[schedule] {len(plan)} due, {skipped} not due yet")
+    else:
+        plan = [SubSchedule(sub, None, True, 0, settings.max_posts, 0.0) for sub in settings.subreddits]
 
-            if max_posts and count_posts >= max_posts:
-                break
+    # Crawl
+    for item in plan:
+        sub = item.subreddit
+        print(f"\n=== Subreddit: r/{sub} ===")
+        sub_settings = settings
+        if scheduler:
+            sub_settings = dataclasses.replace(settings, max_posts=item.max_posts)
+            rate = f"{item.rate_per_h:.1f} posts/h" if item.rate_per_h is not None else "rate unknown"
+            print(f"[schedule] {rate}, max_posts={item.max_posts or '∞'}")
+        created: List[Any] = []
+        result = crawl_subreddit(rc, sub, sub_settings, posts_writer, comments_writer,
+                                 on_post=lambda p: created.append(p.created_utc))
+        # a skipped / cut-short sub keeps its rate and stays due for the next run
+        if scheduler and result.ok:
+            scheduler.observe(sub, created, crawled_at=time.time())
+            scheduler.save()
 
     posts_writer.close()
     if comments_writer:
         comments_writer.close()
 
+    if metrics_json:
+        METRICS.stop_reporter()
+        print(f"[metrics] → {metrics_json}")
+
     print("\nDone.")
 
 
-if __name__ == "__main__":
+def main(argv: Optional[List[str]] = None):
     ap = argparse.ArgumentParser(description="Reddit crawler (posts + comments) with CSV/JSON + depth control.")
     ap.add_argument("--config", default="config.yaml", help="Path to YAML config.")
     ap.add_argument("--subreddit", nargs="+", help="Override subreddits from config")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
     run(args)
+
+
+if __name__ == "__main__":
+    main()
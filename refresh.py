@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Refresh score / num_comments / upvote_ratio / edited for posts already in the catalog.
+
+What it does
+- Picks stored posts younger than --max-age-days, highest priority first:
+  recent posts and posts that moved a lot since their last refresh go first
+- Re-fetches them 100 at a time through /api/info (reddit.info(fullnames=...)) — one call per
+  100 posts instead of a listing + flatten per post
+- Diffs the returned values against the stored row and writes a compact delta record only for
+  posts that changed: {"id", "subreddit", "observed_utc", <changed fields>, "d_score", "d_num_comments"}
+- Updates the posts table in place and appends the deltas to the post_deltas table, so
+  engagement can be tracked over time (and velocity feeds the next run's priorities)
+- Commits after every 100-post call: if the breaker opens or retries run out, the batches already
+  written are kept and the rest stay due for the next run
+
+Usage
+  python catalog.py ingest out/catalog.db "out/posts.part*.csv"
+  python refresh.py out/catalog.db --max-posts 5000 --max-age-days 3
+  python refresh.py out/catalog.db --subreddits formula1 -o out/deltas/f1.json
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from catalog import connect
+from metrics import METRICS
+from resilience import CircuitOpen, is_transient
+
+TRACKED = ("score", "num_comments", "upvote_ratio", "edited")
+BATCH = 100  # /api/info limit
+
+DELTA_DDL = [
+    "CREATE TABLE IF NOT EXISTS post_deltas ("
+    "id TEXT, subreddit TEXT COLLATE NOCASE, observed_utc INTEGER, score INTEGER, num_comments INTEGER, "
+    "upvote_ratio REAL, edited INTEGER, d_score INTEGER, d_num_comments INTEGER)",
+    "CREATE INDEX IF NOT EXISTS ix_post_deltas_id ON post_deltas (id, observed_utc)",
+    # last refresh per post (also for posts that didn't change)
+    "CREATE TABLE IF NOT EXISTS post_refresh (id TEXT PRIMARY KEY, refreshed_utc INTEGER, velocity REAL)",
+]
+
+def ensure_schema(conn: sqlite3.Connection):
+    for ddl in DELTA_DDL:
+        conn.execute(ddl)
+    conn.commit()
+
+# ---------------- Normalisation ----------------
+
+def _num(v: Any) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def _edited(v: Any) -> int:
+    """praw gives False or an epoch; CSV round-trips give "False" / "1700000000"."""
+    if v in (None, "", False, "False", "false", "0", 0):
+        return 0
+    if v in (True, "True", "true"):
+        return 1
+    n = _num(v)
+    return int(n) if n is not None else 0
+
+def normalise(field: str, v: Any) -> Any:
+    if field == "edited":
+        return _edited(v)
+    n = _num(v)
+    if n is None:
+        return None
+    return round(n, 4) if field == "upvote_ratio" else int(n)
+
+# ---------------- Selection ----------------
+
+def priority(score: Optional[float], num_comments: Optional[float], created_utc: int,
+             velocity: Optional[float], now: float) -> float:
+    """
+    Higher first. Engagement decays with age (gravity like HN ranking); posts whose last refresh
+    showed movement get their measured velocity (points+comments per hour) on top.
+    """
+    age_h = max(0.0, (now - created_utc) / 3600.0)
+    engagement = max(0.0, score or 0.0) + 2.0 * max(0.0, num_comments or 0.0) + 1.0
+    return engagement / math.pow(age_h + 2.0, 1.5) + (velocity or 0.0)
+
+def select_posts(conn: sqlite3.Connection, max_posts: int = 5000, max_age_days: float = 7.0,
+                 min_interval_s: int = 3600, subreddits: Optional[Sequence[str]] = None,
+                 now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Stored posts due for a refresh, best first."""
+    now = now or time.time()
+    clauses = ["p.created_utc >= ?", "(r.refreshed_utc IS NULL OR r.refreshed_utc <= ?)"]
+    params: List[Any] = [int(now - max_age_days * 86400), int(now - min_interval_s)]
+    if subreddits:
+        clauses.append(f"p.subreddit IN ({', '.join('?' * len(subreddits))})")
+        params.extend(subreddits)
+    sql = (
+        "SELECT p.id, p.subreddit, p.created_utc, p.score, p.num_comments, p.upvote_ratio, p.edited, "
+        "r.velocity, r.refreshed_utc "
+        "FROM posts p LEFT JOIN post_refresh r ON r.id = p.id WHERE " + " AND ".join(clauses)
+    )
+    cols = ["id", "subreddit", "created_utc", "score", "num_comments", "upvote_ratio", "edited", "velocity",
+            "refreshed_utc"]
+    rows = [dict(zip(cols, r)) for r in conn.execute(sql, params)]
+    rows.sort(key=lambda r: priority(_num(r["score"]), _num(r["num_comments"]), int(r["created_utc"] or 0),
+                                     r["velocity"], now), reverse=True)
+    return rows[:max_posts] if max_posts else rows
+
+# ---------------- Fetch + diff ----------------
+
+def _batches(items: Sequence[Any], n: int) -> Iterator[Sequence[Any]]:
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+def fetch_info(rc, ids: Sequence[str]) -> Iterator[List[Any]]:
+    """Submissions for ids, one list per /api/info call (100 ids), each call retried like a listing page."""
+    for batch in _batches(list(ids), BATCH):
+        client = rc.pick() if hasattr(rc, "pick") else rc  # RedditClientPool: most budget left
+        fullnames = [f"t3_{i}" for i in batch]
+        with METRICS.timer("stage_seconds", stage="refresh_fetch"):
+            items = rc.retrier.call(lambda: list(client.reddit.info(fullnames=fullnames)),
+                                    endpoint="info", key="refresh")
+        METRICS.inc("refresh_fetched_total", len(items))
+        yield items
+
+def diff(stored: Dict[str, Any], s: Any, now: int) -> Optional[Dict[str, Any]]:
+    """Compact delta for one post, or None if nothing tracked changed."""
+    fresh = {f: normalise(f, getattr(s, f, None)) for f in TRACKED}
+    old = {f: normalise(f, stored.get(f)) for f in TRACKED}
+    changed = {f: v for f, v in fresh.items() if v is not None and v != old[f]}
+    if not changed:
+        return None
+    delta = {"id": stored["id"], "subreddit": stored["subreddit"], "observed_utc": now, **changed}
+    for f in ("score", "num_comments"):
+        if f in changed and old[f] is not None:
+            delta[f"d_{f}"] = changed[f] - old[f]
+    return delta
+
+def _write(conn: sqlite3.Connection, seen: List[Tuple[str, int, float]], deltas: List[Dict[str, Any]]):
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO post_refresh (id, refreshed_utc, velocity) VALUES (?, ?, ?)", seen)
+        conn.executemany(
+            "INSERT INTO post_deltas (id, subreddit, observed_utc, score, num_comments, upvote_ratio, edited, "
+            "d_score, d_num_comments) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(d["id"], d["subreddit"], d["observed_utc"], d.get("score"), d.get("num_comments"),
+              d.get("upvote_ratio"), d.get("edited"), d.get("d_score"), d.get("d_num_comments")) for d in deltas],
+        )
+        for d in deltas:
+            changed = [f for f in TRACKED if f in d]
+            conn.execute(
+                f"UPDATE posts SET {', '.join(f'{f} = ?' for f in changed)} WHERE id = ?",
+                [d[f] for f in changed] + [d["id"]],
+            )
+
+def refresh(conn: sqlite3.Connection, rc, posts: List[Dict[str, Any]], now: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Refreshes `posts` (rows from select_posts); returns the delta records written to the catalog.
+    Each /api/info batch is committed on its own; an open breaker or exhausted retries stop the run
+    early with the batches so far kept.
+    """
+    ensure_schema(conn)
+    now = int(now or time.time())
+    by_id = {p["id"]: p for p in posts}
+    deltas: List[Dict[str, Any]] = []
+
+    try:
+        for items in fetch_info(rc, list(by_id)):
+            seen: List[Tuple[str, int, float]] = []
+            batch_deltas: List[Dict[str, Any]] = []
+            for s in items:
+                stored = by_id.get(s.id)
+                if stored is None:
+                    continue
+                d = diff(stored, s, now)
+                # velocity since the previous observation (crawl time unknown → measure from creation)
+                since_t = stored.get("refreshed_utc") or int(stored["created_utc"] or now)
+                hours = max((now - since_t) / 3600.0, 1.0 / 60)
+                velocity = (abs(d.get("d_score", 0)) + abs(d.get("d_num_comments", 0))) / hours if d else 0.0
+                seen.append((s.id, now, velocity))
+                if d:
+                    batch_deltas.append(d)
+            _write(conn, seen, batch_deltas)
+            deltas.extend(batch_deltas)
+    except Exception as e:
+        if not isinstance(e, CircuitOpen) and not is_transient(e):
+            raise
+        METRICS.inc("errors_total", stage="refresh")
+        print(f"[warn] refresh stopped early, {len(deltas)} change(s) kept: {e}", file=sys.stderr)
+    METRICS.inc("refresh_changed_total", len(deltas))
+    return deltas
+
+def write_deltas(deltas: List[Dict[str, Any]], path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for d in deltas:
+            f.write(json.dumps(d, separators=(",", ":")) + "\n")
+
+# ---------------- CLI ----------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Refresh engagement fields of stored posts via /api/info.")
+    ap.add_argument("db", help="Catalog path (see catalog.py)")
+    ap.add_argument("--config", default="config.yaml", help="Crawler config (retry settings)")
+    ap.add_argument("--max-posts", type=int, default=5000, help="Refresh budget per run (0 = all due)")
+    ap.add_argument("--max-age-days", type=float, default=7.0, help="Only posts younger than this")
+    ap.add_argument("--min-interval-s", type=int, default=3600, help="Skip posts refreshed more recently")
+    ap.add_argument("--subreddits", nargs="*", default=None)
+    ap.add_argument("-o", "--output", default=None,
+                    help="NDJSON file to append deltas to (default: out/deltas/deltas-<utc>.json)")
+    ap.add_argument("--fixture", default=None, help="Refresh against a fakereddit fixture (testing)")
+    args = ap.parse_args()
+
+    from redditCrawler import RedditClient, load_settings, make_client
+    retry_cfg = load_settings(args.config).raw.get("retry") if os.path.exists(args.config) else None
+    if args.fixture:
+        from fakereddit import FakeReddit
+        rc = RedditClient(reddit=FakeReddit.from_fixture(args.fixture), retry_cfg=retry_cfg)
+    else:
+        rc = make_client(retry_cfg)
+
+    conn = connect(args.db)
+    ensure_schema(conn)
+    posts = select_posts(conn, max_posts=args.max_posts, max_age_days=args.max_age_days,
+                         min_interval_s=args.min_interval_s, subreddits=args.subreddits)
+    print(f"[refresh] {len(posts)} post(s) due → {math.ceil(len(posts) / BATCH)} /api/info call(s)")
+    if not posts:
+        return
+    deltas = refresh(conn, rc, posts)
+    output = args.output or os.path.join("out", "deltas", f"deltas-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}.json")
+    if deltas:
+        write_deltas(deltas, output)
+        print(f"[write] → {output} ({len(deltas)} changed of {len(posts)})")
+    else:
+        print(f"[refresh] no changes in {len(posts)} post(s)")
+
+if __name__ == "__main__":
+    main()
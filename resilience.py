@@ -0,0 +1,197 @@
+"""
+Page-level retries for Reddit API calls.
+
+- PagedListing fetches listings one 100-item page at a time through reddit.get() and keeps the
+  `after` cursor, so a failure mid-listing retries only the failed page instead of re-listing
+- Backoff is per endpoint (search / new / comments): exponential with jitter, capped
+- 429 responses honour Retry-After when Reddit sends it
+- CircuitBreaker per subreddit: after `threshold` consecutive failed calls the subreddit is
+  short-circuited (CircuitOpen) for `cooldown_s`, so one broken sub doesn't eat the crawl
+- Non-transient errors (403/404/redirects, bad requests) are raised immediately
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import prawcore
+
+from metrics import METRICS
+
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504, 520, 522}
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the API while a subreddit's breaker is open."""
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_s: float = 1.0
+    cap_s: float = 60.0
+    jitter: float = 0.25
+
+    def backoff(self, attempt: int) -> float:
+        # attempt is 1-based: 1 → base, 2 → 2*base, ...
+        d = min(self.cap_s, self.base_s * (2 ** (attempt - 1)))
+        return d * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+DEFAULT_POLICIES = {
+    "search": RetryPolicy(),
+    "new": RetryPolicy(),
+    "comments": RetryPolicy(max_attempts=3),
+}
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        response = getattr(exc, "response", None)
+        value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if value in (None, ""):
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:  # HTTP-date form
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except Exception:
+        return None
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (prawcore.exceptions.RequestException, prawcore.exceptions.ServerError,
+                        prawcore.exceptions.TooManyRequests)):
+        return True
+    if isinstance(exc, prawcore.exceptions.ResponseException):
+        return getattr(exc.response, "status_code", None) in TRANSIENT_STATUSES
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 3, cooldown_s: float = 600.0):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened: Dict[str, float] = {}
+
+    def allow(self, key: str) -> bool:
+        with self._lock:
+            opened = self._opened.get(key)
+            if opened is None:
+                return True
+            if time.monotonic() - opened >= self.cooldown_s:
+                # half-open: let one call through; a failure re-opens immediately
+                del self._opened[key]
+                self._failures[key] = self.threshold - 1
+                return True
+            return False
+
+    def success(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def failure(self, key: str):
+        with self._lock:
+            n = self._failures.get(key, 0) + 1
+            self._failures[key] = n
+            if n >= self.threshold and key not in self._opened:
+                self._opened[key] = time.monotonic()
+                METRICS.inc("circuit_open_total", key=key)
+
+class Retrier:
+    def __init__(self, policies: Optional[Dict[str, RetryPolicy]] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 sleep: Callable[..., None] = METRICS.sleep):
+        self.policies = dict(DEFAULT_POLICIES)
+        self.policies.update(policies or {})
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Dict[str, Any]]) -> "Retrier":
+        """
+        retry:
+          default: {max_attempts: 5, base_s: 1, cap_s: 60}
+          comments: {max_attempts: 3}
+          breaker_threshold: 3
+          breaker_cooldown_s: 600
+        """
+        cfg = cfg or {}
+        default = cfg.get("default", {}) or {}
+        policies = {}
+        endpoints = set(DEFAULT_POLICIES) | ({k for k, v in cfg.items() if isinstance(v, dict)} - {"default"})
+        for endpoint in endpoints:
+            base = DEFAULT_POLICIES.get(endpoint, RetryPolicy()).__dict__
+            policies[endpoint] = RetryPolicy(**{**base, **default, **(cfg.get(endpoint) or {})})
+        breaker = CircuitBreaker(
+            threshold=int(cfg.get("breaker_threshold", 3)),
+            cooldown_s=float(cfg.get("breaker_cooldown_s", 600)),
+        )
+        return cls(policies, breaker)
+
+    def call(self, fn: Callable[[], Any], endpoint: str, key: str) -> Any:
+        if not self.breaker.allow(key):
+            raise CircuitOpen(f"circuit open for {key}")
+        policy = self.policies.get(endpoint, RetryPolicy())
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_transient(e) or attempt >= policy.max_attempts:
+                    self.breaker.failure(key)
+                    raise
+                wait = retry_after_seconds(e)
+                wait = policy.backoff(attempt) if wait is None else min(wait, policy.cap_s * 5)
+                METRICS.inc("retries_total", endpoint=endpoint)
+                self.sleep(wait, stage="retry")
+                continue
+            self.breaker.success(key)
+            return result
+
+    def listing(self, reddit, path: str, params: Dict[str, Any], endpoint: str, key: str,
+                limit: Optional[int] = None) -> "PagedListing":
+        return PagedListing(self, reddit, path, params, endpoint, key, limit)
+
+class PagedListing:
+    """
+    Iterates a Reddit listing page by page. The `after` cursor only advances after a page
+    was fetched successfully, so retries resume exactly where the listing stopped.
+    """
+    PAGE_SIZE = 100
+
+    def __init__(self, retrier: Retrier, reddit, path: str, params: Dict[str, Any],
+                 endpoint: str, key: str, limit: Optional[int] = None):
+        self.retrier = retrier
+        self.reddit = reddit
+        self.path = path
+        self.params = dict(params)
+        self.endpoint = endpoint
+        self.key = key
+        self.limit = limit
+        self.after: Optional[str] = None
+        self.pages = 0
+
+    def _fetch(self):
+        params = {**self.params, "limit": self.PAGE_SIZE}
+        if self.after:
+            params["after"] = self.after
+        return self.reddit.get(self.path, params=params)
+
+    def __iter__(self) -> Iterator[Any]:
+        yielded = 0
+        while True:
+            page = self.retrier.call(self._fetch, self.endpoint, self.key)
+            self.pages += 1
+            items = list(page or [])
+            for item in items:
+                yield item
+                yielded += 1
+                if self.limit is not None and yielded >= self.limit:
+                    return
+            after = getattr(page, "after", None)
+            if not items or not after or after == self.after:
+                return
+            self.after = after
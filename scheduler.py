@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-subreddit scheduling from posting velocity.
+
+What it does
+- Estimates each subreddit's posting rate (posts/hour) from the created_utc spread of posts seen in
+  previous runs — from the crawl itself, the catalog or existing part files — smoothed with an EWMA
+- Crawl frequency: a subreddit is due once ~target_posts new posts are expected since its last
+  crawl (clamped to [min_interval_s, max_interval_s]), so busy subs come up often and quiet ones rarely;
+  a crawl that finds fewer than two posts counts them over the time since the last crawl (0 posts →
+  rate 0 → max_interval_s). Only never-crawled subs are always due
+- Page budget: max_posts for the run = expected new posts since the last crawl (+25% headroom),
+  rounded up to whole 100-post pages and clamped to [min_posts, max_posts]
+- Worker share: the run's total_posts budget is split across due subs in proportion to their rate;
+  busiest subs are crawled first, never-crawled ones last
+- State (rate, last crawl) lives in a small JSON file next to the output
+
+Config (config.yaml)
+  schedule:
+    enabled: true
+    state_path: "out/schedule.json"
+    target_posts: 200
+    total_posts: 5000          # optional budget for the whole run
+
+Usage
+  python scheduler.py seed --state out/schedule.json --catalog out/catalog.db
+  python scheduler.py seed --state out/schedule.json "out/posts.part*.csv"
+  python scheduler.py show --state out/schedule.json --config config.yaml
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+@dataclass
+class SubSchedule:
+    subreddit: str
+    rate_per_h: Optional[float]
+    due: bool
+    interval_s: int
+    max_posts: Optional[int]
+    share: float
+
+def estimate_rate(created: Iterable[Any]) -> Optional[float]:
+    """Posts/hour over the observed spread; None with fewer than two posts."""
+    ts = sorted(int(float(t)) for t in created if t not in (None, ""))
+    if len(ts) < 2:
+        return None
+    span_h = max(ts[-1] - ts[0], 3600) / 3600.0
+    return (len(ts) - 1) / span_h
+
+class Scheduler:
+    def __init__(self, state_path: str, target_posts: int = 200, min_interval_s: int = 900,
+                 max_interval_s: int = 7 * 86400, min_posts: int = 25, max_posts: int = 1000,
+                 total_posts: Optional[int] = None, alpha: float = 0.5):
+        self.state_path = state_path
+        self.target_posts = target_posts
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.min_posts = min_posts
+        self.max_posts = max_posts
+        self.total_posts = total_posts
+        self.alpha = alpha
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], out_dir: str = "out") -> "Scheduler":
+        keys = ("target_posts", "min_interval_s", "max_interval_s", "min_posts", "max_posts", "total_posts")
+        opts = {k: int(cfg[k]) for k in keys if cfg.get(k) is not None}
+        if cfg.get("alpha") is not None:
+            opts["alpha"] = float(cfg["alpha"])
+        return cls(cfg.get("state_path") or os.path.join(out_dir, "schedule.json"), **opts)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def _key(self, sub: str) -> str:
+        return sub.lower()
+
+    # ---- learning ----
+
+    def observe(self, sub: str, created: Iterable[Any], crawled_at: Optional[float] = None):
+        """Folds one crawl's created_utc values into the rate estimate; marks the sub as crawled."""
+        entry = self.state.setdefault(self._key(sub), {})
+        created = [t for t in created if t not in (None, "")]
+        rate = estimate_rate(created)
+        if rate is None:
+            # quiet sub (0-1 posts): what was seen over the time it covers, since the last crawl or
+            # since the one post; nothing to go on for a first crawl that found nothing but a crawl
+            since = entry.get("last_crawled") or (int(float(created[0])) if created else None)
+            end = crawled_at if crawled_at is not None else time.time()
+            if since is not None:
+                rate = len(created) / (max(end - since, 3600) / 3600.0)
+            elif crawled_at is not None:
+                rate = 0.0
+        if rate is not None:
+            old = entry.get("rate_per_h")
+            entry["rate_per_h"] = rate if old is None else self.alpha * rate + (1 - self.alpha) * old
+        if crawled_at is not None:
+            entry["last_crawled"] = int(crawled_at)
+
+    def seed(self, created_by_sub: Dict[str, List[Any]]):
+        for sub, created in created_by_sub.items():
+            self.observe(sub, created)
+
+    # ---- planning ----
+
+    def interval_s(self, rate: Optional[float]) -> int:
+        if rate is None:
+            return self.min_interval_s
+        if rate <= 0:
+            return self.max_interval_s
+        return int(min(self.max_interval_s, max(self.min_interval_s, self.target_posts / rate * 3600)))
+
+    def plan(self, subreddits: Sequence[str], now: Optional[float] = None,
+             default_posts: Optional[int] = None) -> List[SubSchedule]:
+        """Schedules for every sub, due ones first (busiest first). Never-crawled subs are always due."""
+        now = now or time.time()
+        out: List[SubSchedule] = []
+        for sub in subreddits:
+            entry = self.state.get(self._key(sub), {})
+            rate, last = entry.get("rate_per_h"), entry.get("last_crawled")
+            interval = self.interval_s(rate)
+            due = last is None or now - last >= interval
+            if rate is None:
+                posts = default_posts
+            else:
+                since_h = (now - last) / 3600.0 if last else interval / 3600.0
+                expected = rate * since_h * 1.25
+                posts = int(min(self.max_posts, max(self.min_posts, math.ceil(expected / 100.0) * 100)))
+            out.append(SubSchedule(sub, rate, due, interval, posts, 0.0))
+
+        due = [s for s in out if s.due]
+        total_rate = sum(s.rate_per_h or 0.0 for s in due)
+        for s in due:
+            s.share = (s.rate_per_h or 0.0) / total_rate if total_rate else 1.0 / len(due)
+            if self.total_posts and s.rate_per_h is not None:
+                s.max_posts = max(self.min_posts, min(s.max_posts or self.max_posts,
+                                                      int(self.total_posts * s.share)))
+        due.sort(key=lambda s: s.rate_per_h if s.rate_per_h is not None else -1.0, reverse=True)
+        return due + [s for s in out if not s.due]
+
+# ---------------- Seeding from earlier output ----------------
+
+def created_from_catalog(db_path: str, lookback_days: float = 14.0) -> Dict[str, List[int]]:
+    from catalog import connect
+    conn = connect(db_path)
+    lo = int(time.time() - lookback_days * 86400)
+    out: Dict[str, List[int]] = {}
+    for sub, ts in conn.execute("SELECT subreddit, created_utc FROM posts WHERE created_utc >= ?", (lo,)):
+        out.setdefault(sub, []).append(ts)
+    return out
+
+def created_from_files(paths: Sequence[str]) -> Dict[str, List[int]]:
+    out: Dict[str, List[int]] = {}
+    csv.field_size_limit(sys.maxsize)
+    for path in paths:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = (json.loads(l) for l in f if l.strip()) if path.lower().endswith(".json") else csv.DictReader(f)
+            for r in rows:
+                if r.get("kind", "submission") == "submission" and r.get("created_utc") not in (None, ""):
+                    out.setdefault(r["subreddit"], []).append(int(float(r["created_utc"])))
+    return out
+
+# ---------------- CLI ----------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-subreddit crawl schedule from posting velocity.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sd = sub.add_parser("seed", help="Estimate rates from the catalog or existing post parts")
+    sd.add_argument("--state", default="out/schedule.json")
+    sd.add_argument("--catalog", default=None, help="Catalog DB (see catalog.py)")
+    sd.add_argument("--lookback-days", type=float, default=14.0)
+    sd.add_argument("inputs", nargs="*", help="posts.partNNN files or glob patterns")
+
+    sh = sub.add_parser("show", help="Print the schedule for the configured subreddits")
+    sh.add_argument("--state", default="out/schedule.json")
+    sh.add_argument("--config", default="config.yaml")
+    args = ap.parse_args()
+
+    if args.cmd == "seed":
+        sched = Scheduler(args.state)
+        if args.catalog:
+            sched.seed(created_from_catalog(args.catalog, args.lookback_days))
+        if args.inputs:
+            from catalog import expand_globs
+            sched.seed(created_from_files(expand_globs(args.inputs)))
+        sched.save()
+        print(f"[schedule] {len(sched.state)} subreddit(s) → {args.state}")
+        return
+
+    from redditCrawler import load_settings
+    settings = load_settings(args.config)
+    cfg = dict(settings.raw.get("schedule", {}) or {}, state_path=args.state)
+    for s in Scheduler.from_config(cfg, settings.out_dir).plan(settings.subreddits, default_posts=settings.max_posts):
+        rate = f"{s.rate_per_h:.2f}/h" if s.rate_per_h is not None else "unknown"
+        print(f"  r/{s.subreddit:<24} {'DUE ' if s.due else 'wait'} rate={rate:<10} "
+              f"every={s.interval_s / 3600:.1f}h max_posts={s.max_posts or '∞'} share={s.share:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Semantic search over crawled posts and comments with the vendored MiniLM model.
+
+What it does
+- Embeds posts (text_clean, or cleaned title + selftext) and comments (cleaned body) from
+  crawler parts / preprocessed CSVs, in length-sorted batches (embeddings.encode_texts)
+- Only ids not in the store yet are encoded; each run appends new shards, nothing is re-encoded
+- Store layout (all .npy, opened memory-mapped):
+    meta.json                 model, dim, shard list, IVF state
+    shard-NNNNN.vec.npy       float32 L2-normalised vectors (≤ 262,144 rows per shard)
+    shard-NNNNN.ids.npy       fullnames (t3_… posts, t1_… comments), row-aligned with the vectors
+- Queries (free text, or --like <id> to reuse a stored vector) are scored by cosine similarity:
+    exact   chunked matrix product over every shard + argpartition top-k
+    IVF     once the store holds ≥ 200k rows: spherical k-means lists (vectors stored list-ordered),
+            only the --nprobe closest lists are scanned; rows added after the last build are
+            scanned exactly, and the lists are rebuilt when those exceed 20% of the store
+
+Usage
+  python semsearch.py index out/search "out/posts.part*.csv" "out/comments.part*.csv"
+  python semsearch.py query out/search "tyre degradation in the wet" -k 10 --catalog out/catalog.db
+  python semsearch.py query out/search --like t3_1abcde -k 20 --kind t3
+  python semsearch.py build-ivf out/search --nlist 1024
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from embeddings import MODEL_NAME, encode_texts, load_model
+from preprocess import clean_text
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+SHARD_ROWS = 262_144
+SCAN_CHUNK = 65_536       # rows per matrix product in exact search
+IVF_MIN_ROWS = 200_000    # below this an exact scan is already fast enough
+IVF_REBUILD_TAIL = 0.2    # rebuild lists once unindexed rows exceed this share of the store
+
+# -----------------------
+# Input rows
+# -----------------------
+
+def texts_of(df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+    """(fullnames, texts) for a frame of posts and/or comments; rows without text are skipped."""
+    kinds = df["kind"].astype(str) if "kind" in df.columns else pd.Series("submission", index=df.index)
+    ids, texts = [], []
+    cols = {c: df[c].fillna("").astype(str) if c in df.columns else None
+            for c in ("id", "text_clean", "title", "selftext", "body")}
+    if cols["id"] is None:
+        raise ValueError("Input must have an 'id' column.")
+    for i, kind in enumerate(kinds.tolist()):
+        if kind == "comment":
+            prefix, text = "t1_", clean_text(cols["body"].iat[i]) if cols["body"] is not None else ""
+        else:
+            prefix = "t3_"
+            text = cols["text_clean"].iat[i] if cols["text_clean"] is not None else ""
+            if not text:
+                text = clean_text(" ".join(cols[c].iat[i] for c in ("title", "selftext") if cols[c] is not None))
+        if text:
+            ids.append(prefix + cols["id"].iat[i])
+            texts.append(text)
+    return ids, texts
+
+def _read_chunks(path: str, chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+    if path.lower().endswith(".json"):
+        yield from pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype={"id": str})
+
+# -----------------------
+# Store
+# -----------------------
+
+class VectorStore:
+    def __init__(self, store_dir: str):
+        self.dir = store_dir
+        self.meta: Dict[str, Any] = {"model": MODEL_NAME, "dim": None, "shards": [], "ivf": None}
+        meta_path = os.path.join(store_dir, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        self._vecs: Dict[str, np.ndarray] = {}
+        self._ids: Optional[np.ndarray] = None
+        self._id_order: Optional[np.ndarray] = None
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _save_meta(self):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp, self._path("meta.json"))
+
+    def __len__(self) -> int:
+        return sum(s["rows"] for s in self.meta["shards"])
+
+    def shards(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """(first global row, vectors memmap) per shard."""
+        start = 0
+        for s in self.meta["shards"]:
+            if s["name"] not in self._vecs:
+                self._vecs[s["name"]] = np.load(self._path(f"{s['name']}.vec.npy"), mmap_mode="r")
+            yield start, self._vecs[s["name"]]
+            start += s["rows"]
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Fullname per global row (bytes)."""
+        if self._ids is None:
+            parts = [np.load(self._path(f"{s['name']}.ids.npy")) for s in self.meta["shards"]]
+            self._ids = np.concatenate(parts) if parts else np.array([], dtype="S1")
+        return self._ids
+
+    def rows_for(self, ids: Sequence[str]) -> np.ndarray:
+        """Global row per fullname, -1 if not stored."""
+        keys = np.array([str(i) for i in ids], dtype="S")
+        out = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self.ids) or not len(keys):
+            return out
+        if self._id_order is None:
+            self._id_order = np.argsort(self.ids, kind="stable")
+        sorted_ids = self.ids[self._id_order]
+        pos = np.searchsorted(sorted_ids, keys)
+        pc = np.minimum(pos, len(sorted_ids) - 1)
+        hit = (pos < len(sorted_ids)) & (sorted_ids[pc] == keys)
+        out[hit] = self._id_order[pc[hit]]
+        return out
+
+    def vector(self, row: int) -> np.ndarray:
+        for start, vecs in self.shards():
+            if start <= row < start + len(vecs):
+                return np.asarray(vecs[row - start], dtype=np.float32)
+        raise IndexError(row)
+
+    # ---- write ----
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], model: "SentenceTransformer",
+            batch_size: int = 256) -> int:
+        """Encodes and appends the ids not stored yet (first occurrence wins); returns rows added."""
+        if self.meta.get("model") not in (None, MODEL_NAME):
+            raise ValueError(f"store {self.dir} was built with {self.meta['model']}, not {MODEL_NAME}")
+        seen = set()
+        new = []
+        for i, known in enumerate(self.rows_for(ids) >= 0):
+            if not known and ids[i] not in seen:
+                seen.add(ids[i])
+                new.append(i)
+        if not new:
+            return 0
+
+        dim = model.get_sentence_embedding_dimension()
+        if self.meta["dim"] not in (None, dim):
+            raise ValueError(f"store {self.dir} holds {self.meta['dim']}-d vectors, model gives {dim}")
+        os.makedirs(self.dir, exist_ok=True)
+        for s in range(0, len(new), SHARD_ROWS):
+            idx = new[s:s + SHARD_ROWS]
+            name = f"shard-{len(self.meta['shards']):05d}"
+            tmp = self._path(f"{name}.vec.tmp.npy")
+            mat = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(idx), dim))
+            encode_texts(model, [texts[i] for i in idx], batch_size=batch_size, out=mat)
+            mat.flush()
+            del mat
+            np.save(self._path(f"{name}.ids.npy"), np.array([ids[i] for i in idx], dtype="S"))
+            os.replace(tmp, self._path(f"{name}.vec.npy"))
+            self.meta["shards"].append({"name": name, "rows": len(idx), "added_utc": int(time.time())})
+            self.meta.update(model=MODEL_NAME, dim=dim)
+            self._save_meta()  # shard is only visible once both files are complete
+        self._ids = self._id_order = None
+        return len(new)
+
+    # ---- IVF ----
+
+    def ivf_stale(self) -> bool:
+        n = len(self)
+        if n < IVF_MIN_ROWS:
+            return False
+        ivf = self.meta.get("ivf")
+        return not ivf or (n - ivf["rows"]) > IVF_REBUILD_TAIL * ivf["rows"]
+
+    def build_ivf(self, nlist: Optional[int] = None, iters: int = 10, sample_per_list: int = 50, seed: int = 0):
+        """Spherical k-means over a sample, then every row assigned to its closest list."""
+        n = len(self)
+        if not n:
+            return
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+
+        pick = np.sort(rng.choice(n, size=min(nlist * sample_per_list, n), replace=False))
+        X = np.concatenate([np.asarray(vecs[pick[(pick >= start) & (pick < start + len(vecs))] - start])
+                            for start, vecs in self.shards()]).astype(np.float32)
+        nlist = min(nlist, len(X))
+        C = X[rng.choice(len(X), size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = (X @ C.T).argmax(axis=1)
+            order = np.argsort(assign, kind="stable")
+            lists, starts = np.unique(assign[order], return_index=True)
+            sums = np.zeros_like(C)
+            sums[lists] = np.add.reduceat(X[order], starts, axis=0)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            sums[empty] = X[rng.choice(len(X), size=int(empty.sum()))]  # reseed empty lists
+            C = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start, vecs in self.shards():
+            for s in range(0, len(vecs), SCAN_CHUNK):
+                chunk = np.asarray(vecs[s:s + SCAN_CHUNK], dtype=np.float32)
+                assign[start + s:start + s + len(chunk)] = (chunk @ C.T).argmax(axis=1)
+        order = np.argsort(assign, kind="stable")
+        pos = np.empty(n, dtype=np.int64)
+        pos[order] = np.arange(n)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+
+        tmp = self._path("ivf.vec.tmp.npy")
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(n, C.shape[1]))
+        for start, vecs in self.shards():
+            for s in range(0, len(vecs), SCAN_CHUNK):
+                chunk = np.asarray(vecs[s:s + SCAN_CHUNK])
+                out[pos[start + s:start + s + len(chunk)]] = chunk
+        out.flush()
+        del out
+        np.save(self._path("ivf.centroids.npy"), C)
+        np.save(self._path("ivf.rows.npy"), order.astype(np.int64))
+        np.save(self._path("ivf.offsets.npy"), offsets)
+        os.replace(tmp, self._path("ivf.vec.npy"))
+        self.meta["ivf"] = {"rows": n, "nlist": int(nlist), "built_utc": int(time.time())}
+        self._save_meta()
+        self._ivf = None
+
+    def _load_ivf(self) -> Dict[str, np.ndarray]:
+        if self._ivf is None:
+            self._ivf = {name: np.load(self._path(f"ivf.{name}.npy"), mmap_mode="r")
+                         for name in ("centroids", "rows", "offsets", "vec")}
+        return self._ivf
+
+    # ---- search ----
+
+    def search(self, Q: np.ndarray, k: int = 10, exact: bool = False, nprobe: int = 16,
+               exclude: Optional[Sequence[int]] = None) -> List[List[Tuple[str, float]]]:
+        """Top-k (fullname, cosine) per row of Q (L2-normalised queries)."""
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float32))
+        best = _TopK(len(Q), k + len(exclude or ()))
+        n = len(self)
+        use_ivf = not exact and self.meta.get("ivf") and n >= IVF_MIN_ROWS
+        tail_from = 0
+        if use_ivf:
+            ivf = self._load_ivf()
+            tail_from = self.meta["ivf"]["rows"]
+            probe = np.argsort(-(Q @ np.asarray(ivf["centroids"]).T), axis=1)[:, :nprobe]
+            offsets = ivf["offsets"]
+            for qi in range(len(Q)):
+                for lst in probe[qi]:
+                    lo, hi = int(offsets[lst]), int(offsets[lst + 1])
+                    if hi > lo:
+                        scores = np.asarray(ivf["vec"][lo:hi]) @ Q[qi]
+                        best.push_one(qi, scores, np.asarray(ivf["rows"][lo:hi]))
+        for start, vecs in self.shards():  # exact scan (everything, or rows newer than the IVF)
+            for s in range(max(0, tail_from - start), len(vecs), SCAN_CHUNK):
+                chunk = np.asarray(vecs[s:s + SCAN_CHUNK], dtype=np.float32)
+                best.push(chunk @ Q.T, np.arange(start + s, start + s + len(chunk)))
+
+        ids = self.ids
+        skip = set(exclude or ())
+        out = []
+        for rows, scores in best.result():
+            hits = [(ids[r].decode("utf-8"), float(sc)) for r, sc in zip(rows, scores) if r not in skip]
+            out.append(hits[:k])
+        return out
+
+class _TopK:
+    """Running top-k per query over scored row batches."""
+    def __init__(self, nq: int, k: int):
+        self.k = k
+        self.scores = [np.empty(0, dtype=np.float32) for _ in range(nq)]
+        self.rows = [np.empty(0, dtype=np.int64) for _ in range(nq)]
+
+    def push_one(self, qi: int, scores: np.ndarray, rows: np.ndarray):
+        s = np.concatenate([self.scores[qi], scores])
+        r = np.concatenate([self.rows[qi], rows])
+        if len(s) > self.k:
+            keep = np.argpartition(-s, self.k - 1)[:self.k]
+            s, r = s[keep], r[keep]
+        self.scores[qi], self.rows[qi] = s, r
+
+    def push(self, scores: np.ndarray, rows: np.ndarray):
+        """scores: (rows, queries)."""
+        kk = min(self.k, len(rows))
+        top = np.argpartition(-scores, kk - 1, axis=0)[:kk]  # per query, before merging
+        for qi in range(scores.shape[1]):
+            self.push_one(qi, scores[top[:, qi], qi], rows[top[:, qi]])
+
+    def result(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        out = []
+        for s, r in zip(self.scores, self.rows):
+            order = np.argsort(-s, kind="stable")
+            out.append((r[order], s[order]))
+        return out
+
+# -----------------------
+# Index / display helpers
+# -----------------------
+
+def index_files(store: VectorStore, paths: Sequence[str], model: Optional["SentenceTransformer"] = None,
+                batch_size: int = 256) -> int:
+    """Adds every new post/comment in `paths`; loads the model only if something needs encoding."""
+    total = 0
+    for path in paths:
+        for chunk in _read_chunks(path):
+            ids, texts = texts_of(chunk)
+            if not ids or (store.rows_for(ids) >= 0).all():
+                continue
+            model = model or load_model()
+            total += store.add(ids, texts, model, batch_size=batch_size)
+        print(f"[search] {os.path.basename(path)} (store rows={len(store)})")
+    return total
+
+def describe(catalog_db: str, fullnames: Sequence[str]) -> Dict[str, str]:
+    """'r/sub: title' / 'r/sub: comment body' per fullname from the catalog (see catalog.py)."""
+    from catalog import connect
+    conn = connect(catalog_db)
+    out: Dict[str, str] = {}
+    posts = [f[3:] for f in fullnames if f.startswith("t3_")]
+    comments = [f[3:] for f in fullnames if f.startswith("t1_")]
+    if posts:
+        sql = f"SELECT id, subreddit, title FROM posts WHERE id IN ({', '.join('?' * len(posts))})"
+        for i, sub, title in conn.execute(sql, posts):
+            out[f"t3_{i}"] = f"r/{sub}: {title}"
+    if comments:
+        sql = f"SELECT id, subreddit, body FROM comments WHERE id IN ({', '.join('?' * len(comments))})"
+        for i, sub, body in conn.execute(sql, comments):
+            out[f"t1_{i}"] = f"r/{sub}: {' '.join(str(body).split())[:160]}"
+    return out
+
+# -----------------------
+# CLI
+# -----------------------
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Semantic search over crawled posts and comments (MiniLM).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ix = sub.add_parser("index", help="Embed new posts/comments into the store")
+    ix.add_argument("store", help="Store directory")
+    ix.add_argument("inputs", nargs="+", help="posts/comments parts or preprocessed CSVs (globs ok)")
+    ix.add_argument("--batch-size", type=int, default=256)
+    ix.add_argument("--no-ivf", action="store_true", help="Don't (re)build the IVF lists")
+
+    bi = sub.add_parser("build-ivf", help="(Re)build the IVF lists now")
+    bi.add_argument("store")
+    bi.add_argument("--nlist", type=int, default=None, help="Number of lists (default: sqrt(rows))")
+
+    q = sub.add_parser("query", help="Most similar posts/comments to a text or a stored id")
+    q.add_argument("store")
+    q.add_argument("text", nargs="?", default=None)
+    q.add_argument("--like", default=None, help="Fullname (t3_…/t1_…) whose stored vector is the query")
+    q.add_argument("-k", type=int, default=10)
+    q.add_argument("--kind", choices=("t3", "t1"), default=None, help="Only posts (t3) or comments (t1)")
+    q.add_argument("--exact", action="store_true", help="Scan every row even if an IVF index exists")
+    q.add_argument("--nprobe", type=int, default=16)
+    q.add_argument("--catalog", default=None, help="Catalog DB to show subreddit + title/body of hits")
+    args = ap.parse_args(argv)
+
+    store = VectorStore(args.store)
+    if args.cmd == "index":
+        from catalog import expand_globs
+        added = index_files(store, expand_globs(args.inputs), batch_size=args.batch_size)
+        print(f"[search] +{added} row(s), {len(store)} total in {len(store.meta['shards'])} shard(s)")
+        if not args.no_ivf and store.ivf_stale():
+            t0 = time.perf_counter()
+            store.build_ivf()
+            print(f"[search] IVF rebuilt: {store.meta['ivf']['nlist']} lists ({time.perf_counter() - t0:.1f}s)")
+        return
+    if args.cmd == "build-ivf":
+        store.build_ivf(nlist=args.nlist)
+        print(f"[search] IVF built: {store.meta['ivf']['nlist']} lists over {len(store)} rows")
+        return
+
+    exclude: List[int] = []
+    if args.like:
+        row = int(store.rows_for([args.like])[0])
+        if row < 0:
+            sys.exit(f"[error] {args.like} is not in {args.store}")
+        qv, exclude = store.vector(row), [row]
+    elif args.text:
+        qv = encode_texts(load_model(), [clean_text(args.text)])[0]
+    else:
+        sys.exit("[error] pass a query text or --like <fullname>")
+
+    t0 = time.perf_counter()
+    # over-fetch when filtering by kind, so k hits of that kind usually survive
+    fetch = args.k * 5 if args.kind else args.k
+    hits = store.search(qv, k=fetch, exact=args.exact, nprobe=args.nprobe, exclude=exclude)[0]
+    if args.kind:
+        hits = [h for h in hits if h[0].startswith(args.kind + "_")][:args.k]
+    ms = (time.perf_counter() - t0) * 1000
+    info = describe(args.catalog, [h[0] for h in hits]) if args.catalog else {}
+    for fullname, score in hits:
+        print(f"  {score:.3f}  {fullname:<12} {info.get(fullname, '')}")
+    print(f"[search] {len(hits)} hit(s) over {len(store)} rows in {ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,35 @@
-import pandas as pd
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-
-# One-time: download the VADER lexicon
-nltk.download("vader_lexicon")
+#!/usr/bin/env python3
+"""
+VADER sentiment (POS / NEU / NEG) for preprocessed Reddit posts.
 
-# 1. Load your file from repo's out folder
-df = pd.read_csv("redditCrawler\out\posts_preprocessed.csv")
+Usage
+  python sentiment.py -i out/posts_preprocessed.csv -o out/001_with_sentiment.csv
+"""
+import argparse
+from typing import List, Optional
 
-# 2. Initialize VADER
-sia = SentimentIntensityAnalyzer()
+import pandas as pd
 
-# 3. Define classification function
+_sia = None
+
+def analyzer():
+    """VADER, built on first use; the lexicon is downloaded only if it isn't installed yet."""
+    global _sia
+    if _sia is None:
+        import nltk
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        try:
+            nltk.data.find("sentiment/vader_lexicon.zip")
+        except LookupError:
+            nltk.download("vader_lexicon", quiet=True)
+        _sia = SentimentIntensityAnalyzer()
+    return _sia
+
+# Classification function
 def get_sentiment(text):
     if not isinstance(text, str) or not text.strip():
         return "NEU"
-    score = sia.polarity_scores(text)["compound"]
+    score = analyzer().polarity_scores(text)["compound"]
     if score >= 0.05:
         return "POS"
     elif score <= -0.05:
@@ -23,13 +37,25 @@ def get_sentiment(text):
     else:
         return "NEU"
 
-# 4. Combine title + selftext for richer sentiment analysis
-df["text_for_sentiment"] = df[["title", "text_clean"]].fillna("").agg(" ".join, axis=1)
+def add_sentiment(df: pd.DataFrame) -> pd.DataFrame:
+    # Combine title + selftext for richer sentiment analysis
+    cols = [c for c in ("title", "text_clean") if c in df.columns]
+    df["text_for_sentiment"] = df[cols].fillna("").astype(str).agg(" ".join, axis=1) if cols else ""
+    df["sentiment"] = df["text_for_sentiment"].apply(get_sentiment)
+    return df
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Add VADER sentiment to a preprocessed Reddit CSV.")
+    p.add_argument("-i", "--input", default="redditCrawler/out/posts_preprocessed.csv",
+                   help="Input CSV from preprocess.py (default: redditCrawler/out/posts_preprocessed.csv)")
+    p.add_argument("-o", "--output", default="redditCrawler/out/001_with_sentiment.csv",
+                   help="Output CSV (default: redditCrawler/out/001_with_sentiment.csv)")
+    args = p.parse_args(argv)
 
-# 5. Apply sentiment classifier
-df["sentiment"] = df["text_for_sentiment"].apply(get_sentiment)
+    df = add_sentiment(pd.read_csv(args.input))
+    df.to_csv(args.output, index=False)
 
-# 6. Save result back into the out folder
-df.to_csv("redditCrawler/out/001_with_sentiment.csv", index=False)
+    print(f"✅ Finished! File saved as {args.output}")
 
-print("✅ Finished! File saved as out/001_with_sentiment.csv")
+if __name__ == "__main__":
+    main()
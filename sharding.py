@@ -0,0 +1,130 @@
+"""
+Time-sliced search sharding to get past the ~1000-item listing cap.
+
+- The [since, until] range is cut into `initial_windows` equal windows, each searched with its own
+  `timestamp:lo..hi` cloudsearch query, `workers` windows at a time
+- A window that returns >= cap_threshold items was truncated by Reddit. Its newest items are kept,
+  and the uncovered part [lo, oldest_seen] is split in two and queued again (adaptive)
+- Results stream back as windows finish and are deduped by submission id; each one is rebound to
+  the caller's praw instance, so later lazy fetches (comments) don't go through a worker's session
+- Windows shorter than min_window_s are never split; if such a window still hits the cap it is
+  reported via METRICS (shard_truncated_total) instead of looping forever
+"""
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from metrics import METRICS
+
+REDDIT_EPOCH = 1119484800  # 2005-06-23, nothing older exists
+
+Window = Tuple[int, int]
+
+def plan_windows(since: int, until: int, n: int) -> List[Window]:
+    """n contiguous, non-overlapping windows covering [since, until] (newest first)."""
+    n = max(1, n)
+    step = max(1, (until - since + 1) // n)
+    edges = [since + i * step for i in range(n)] + [until + 1]
+    windows = [(edges[i], edges[i + 1] - 1) for i in range(n) if edges[i] <= edges[i + 1] - 1]
+    return list(reversed(windows))
+
+def split_window(lo: int, hi: int) -> List[Window]:
+    mid = lo + (hi - lo) // 2
+    return [(mid + 1, hi), (lo, mid)]
+
+class ShardedSearch:
+    """
+    client_factory() returns a RedditClient; it is called once per worker thread
+    (praw instances are not meant to be shared across threads). reddit is the caller's praw
+    instance that yielded submissions are rebound to.
+    """
+    def __init__(self, client_factory: Callable[[], Any], subreddit: str, query: str,
+                 since: Optional[int], until: Optional[int], workers: int = 4,
+                 initial_windows: int = 8, cap: int = 1000, cap_threshold: Optional[int] = None,
+                 min_window_s: int = 60, reddit: Any = None):
+        self.client_factory = client_factory
+        self.reddit = reddit
+        self.subreddit = subreddit
+        self.query = query
+        self.since = max(int(since or REDDIT_EPOCH), REDDIT_EPOCH)
+        self.until = int(until or time.time())
+        self.workers = max(1, workers)
+        self.initial_windows = initial_windows
+        # Reddit tends to stop a bit short of 1000; treat anything close as truncated
+        self.cap_threshold = cap_threshold or int(cap * 0.95)
+        self.min_window_s = min_window_s
+        self._local = threading.local()
+        self.windows_done = 0
+        self.splits = 0
+
+    def _client(self):
+        rc = getattr(self._local, "rc", None)
+        if rc is None:
+            rc = self._local.rc = self.client_factory()
+        return rc
+
+    def _fetch(self, window: Window) -> Tuple[Window, List[Any]]:
+        lo, hi = window
+        rc = self._client()
+        with METRICS.timer("shard_seconds", subreddit=self.subreddit):
+            items = list(rc.search_submissions(self.subreddit, query=self.query, since=lo, until=hi))
+        return window, items
+
+    def _follow_up(self, window: Window, items: List[Any]) -> List[Window]:
+        """Windows still to search after `window` returned `items`."""
+        lo, hi = window
+        if len(items) < self.cap_threshold:
+            return []
+        oldest = min(int(getattr(s, "created_utc", hi) or hi) for s in items)
+        rest_hi = min(oldest, hi)  # inclusive: items at exactly `oldest` may have been cut off
+        if rest_hi - lo < self.min_window_s:
+            if rest_hi > lo:
+                METRICS.inc("shard_truncated_total", subreddit=self.subreddit)
+                print(f"[warn] r/{self.subreddit}: window {lo}..{rest_hi} still hits the listing cap",
+                      file=sys.stderr)
+            return []
+        self.splits += 1
+        return split_window(lo, rest_hi)
+
+    def __iter__(self) -> Iterator[Any]:
+        seen = set()
+        pending: Dict[Future, Window] = {}
+        ex = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"shard-{self.subreddit}")
+        try:
+            for w in plan_windows(self.since, self.until, self.initial_windows):
+                pending[ex.submit(self._fetch, w)] = w
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pending.pop(fut)
+                    window, items = fut.result()
+                    self.windows_done += 1
+                    METRICS.inc("shard_windows_total", subreddit=self.subreddit)
+                    for w in self._follow_up(window, items):
+                        pending[ex.submit(self._fetch, w)] = w
+                    for s in items:
+                        if s.id in seen:
+                            continue
+                        seen.add(s.id)
+                        if self.reddit is not None:
+                            s._reddit = self.reddit  # keep the listing data, drop the worker's session
+                        yield s
+        finally:
+            # consumer stopped early (max_posts), closed the generator or an error:
+            # don't wait for running or queued windows
+            ex.shutdown(wait=False, cancel_futures=True)
+
+def shard_options(cfg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    search_shards:
+      enabled: true
+      workers: 4
+      initial_windows: 8
+      cap: 1000
+      min_window_s: 60
+    """
+    cfg = cfg or {}
+    keys = ("workers", "initial_windows", "cap", "cap_threshold", "min_window_s")
+    return {k: int(cfg[k]) for k in keys if cfg.get(k) is not None}
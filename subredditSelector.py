@@ -2,14 +2,15 @@
 from __future__ import annotations
 import json, time, math
 from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, TYPE_CHECKING
 from pathlib import Path
 
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from tqdm import tqdm
 import praw
 
+if TYPE_CHECKING:
+    from centroids import ContentCentroids
+
 @dataclass
 class SubInfo:
     name: str
@@ -22,6 +23,7 @@ class SubInfo:
     recent_activity_score: float
     sim: float
     score: float
+    content_sim: float | None = None
 
 # FAST activity probe (optional, tiny API usage)
 def _recent_activity_score(sr) -> float:
@@ -37,7 +39,11 @@ def _describe(sr) -> str:
     return f"{sr.display_name_prefixed} — {title}. {desc}"
 
 def _blend(sim: float, subs: int, act: float, lang_ok: bool,
-           min_subs: int, prefer_active: bool) -> float:
+           min_subs: int, prefer_active: bool,
+           content_sim: float | None = None, w_content: float = 0.5) -> float:
+    # what the sub actually posts (centroids.py) outweighs what its description claims
+    if content_sim is not None:
+        sim = (1.0 - w_content)*sim + w_content*content_sim
     subs_term = math.log10(max(subs, 10)) / 6.0  # ~0..1 for 10..1M
     act_term  = min(max(act, 0.0), 1.5) / 1.5
     w_sim, w_sub = 0.64, 0.22
@@ -55,6 +61,8 @@ def find_subreddits_for_topics(
     prefer_active: bool = True,
     language_hint: str | None = "en",
     cache_path: str | None = None,
+    content_centroids: ContentCentroids | None = None,
+    content_weight: float = 0.5,
 ) -> Dict[str, List[str]]:
     # ---- per-topic cache (safe) ----
     topics = [t.strip() for t in topics if t and t.strip()]
@@ -70,12 +78,17 @@ def find_subreddits_for_topics(
         except Exception:
             cached = {}
 
-    results: Dict[str, List[str]] = {t: cached.get(t, []) for t in topics if cached.get(t)}
+    # rankings with and without content centroids are cached apart, so neither serves the other
+    def ckey(t: str) -> str:
+        return f"{t} [content]" if content_centroids is not None else t
+
+    results: Dict[str, List[str]] = {t: cached[ckey(t)] for t in topics if cached.get(ckey(t))}
     to_compute = [t for t in topics if not results.get(t)]
     if not to_compute:
         return results
 
-    # ---- model ----
+    # ---- model ---- (imported here: torch + sentence_transformers cost seconds at startup)
+    from sentence_transformers import SentenceTransformer
     model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", cache_folder="./models")
     topic_emb = model.encode(to_compute, normalize_embeddings=True)
 
@@ -102,10 +115,21 @@ def find_subreddits_for_topics(
             continue
 
         emb = model.encode(cand_texts, normalize_embeddings=True)
-        sim = cosine_similarity([topic_emb[i]], emb)[0]
+        sim = emb @ topic_emb[i]  # both normalized → cosine similarity
+
+        # content centroids (recent titles), where available
+        content = [None] * len(cand_objs)
+        if content_centroids is not None:
+            # only subs that can clear the min_subscribers gate are worth a new() listing on a cold cache
+            content_centroids.refresh(model, [sr for sr in cand_objs
+                                              if int(getattr(sr, "subscribers", 0) or 0) >= min_subscribers])
+            cvecs, has = content_centroids.vectors(cand_objs)
+            if has.any():
+                csim = cvecs @ topic_emb[i]
+                content = [float(c) if ok else None for c, ok in zip(csim, has)]
 
         scored: List[Tuple[float, SubInfo]] = []
-        for s, sr in zip(sim, cand_objs):
+        for s, csim, sr in zip(sim, content, cand_objs):
             try:
                 subs = int(getattr(sr, "subscribers", 0) or 0)
                 active = getattr(sr, "accounts_active", None)
@@ -117,7 +141,8 @@ def find_subreddits_for_topics(
                 if language_hint and isinstance(lang, str):
                     lang_ok = (language_hint.lower() in (lang or "").lower()) or (lang is None)
 
-                final = _blend(float(s), subs, activity, lang_ok, min_subscribers, prefer_active)
+                final = _blend(float(s), subs, activity, lang_ok, min_subscribers, prefer_active,
+                               content_sim=csim, w_content=content_weight)
                 scored.append((
                     final,
                     SubInfo(
@@ -131,6 +156,7 @@ def find_subreddits_for_topics(
                         recent_activity_score=activity,
                         sim=float(s),
                         score=final,
+                        content_sim=csim,
                     )
                 ))
             except Exception:
@@ -152,11 +178,15 @@ def find_subreddits_for_topics(
 
         results[topic] = picked
 
+    if content_centroids is not None:
+        content_centroids.save()
+
     # ---- write merged cache & return ----
     if cache_path:
         try:
             Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
-            Path(cache_path).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+            merged = {**cached, **{ckey(t): v for t, v in results.items()}}
+            Path(cache_path).write_text(json.dumps(merged, indent=2, ensure_ascii=False), encoding="utf-8")
         except Exception:
             pass
 
@@ -0,0 +1,58 @@
+"""Offline checks for coordinator workers: a window whose listing fails goes back to the queue."""
+import os
+
+from coordinator import SQLiteQueue, Task, run_worker
+from fakereddit import FakeReddit, synthetic_corpus
+from redditCrawler import CrawlSettings, RedditClient
+
+SUB = "synthetic0"
+
+class FlakyReddit(FakeReddit):
+    """Listing pages raise ConnectionError for the first `failures` calls."""
+
+    def __init__(self, data, failures):
+        super().__init__(data)
+        self.failures = failures
+
+    def get(self, path, params=None):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("connection reset by fake peer")
+        return super().get(path, params)
+
+def _settings(out_dir):
+    return CrawlSettings(subreddits=[SUB], query="", since_iso="", until_iso="", since=None, until=None,
+                         max_posts=None, fetch_comments=False, max_comments_per_post=0, depth_limit=None,
+                         out_dir=str(out_dir), fmt="csv", rotate_every=10_000, sleep_ms=0)
+
+def _client(failures):
+    data = synthetic_corpus(subreddits=1, posts_per_sub=30, comments_per_post=0)
+    # one try per page and no breaker trips, so every failure reaches the worker
+    return RedditClient(reddit=FlakyReddit(data, failures),
+                        retry_cfg={"default": {"max_attempts": 1}, "breaker_threshold": 100})
+
+def _queue(tmp_path, max_attempts=3):
+    queue = SQLiteQueue(str(tmp_path / "queue.db"), max_attempts=max_attempts)
+    queue.add([Task(subreddit=SUB, mode="new")])
+    return queue
+
+def test_failed_window_is_requeued_and_retried(tmp_path):
+    queue = _queue(tmp_path)
+    done = run_worker(queue, _settings(tmp_path / "out"), "w1", _client(failures=2), poll_s=0)
+
+    assert done == 1
+    (task,) = queue.tasks()
+    assert (task.status, task.attempts, task.rows) == ("done", 3, 30)
+    assert task.error is None
+    # each attempt wrote to its own directory
+    assert sorted(os.listdir(tmp_path / "out" / "tasks")) == ["task-00001.a1", "task-00001.a2", "task-00001.a3"]
+
+def test_window_fails_after_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    done = run_worker(queue, _settings(tmp_path / "out"), "w1", _client(failures=10), poll_s=0)
+
+    assert done == 0
+    (task,) = queue.tasks()
+    assert (task.status, task.attempts) == ("failed", 2)
+    assert task.error.startswith("ConnectionError")
+    assert queue.unfinished() == 0
@@ -0,0 +1,56 @@
+"""Offline checks for embeddings.embed_frame's cache (no MiniLM needed: a counting stand-in encodes)."""
+import numpy as np
+import pandas as pd
+
+from embeddings import cache_paths, embed_frame
+from fakereddit import synthetic_corpus
+
+class CountingModel:
+    """Deterministic vectors from the text; remembers how many texts it was asked to encode."""
+    dim = 8
+
+    def __init__(self):
+        self.encoded = 0
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i, len(t) % self.dim] = 1.0
+        return out
+
+def _posts(n=20):
+    posts = synthetic_corpus(subreddits=1, posts_per_sub=n, comments_per_post=0)["subreddits"]["synthetic0"]["posts"]
+    return pd.DataFrame({"id": [p["id"] for p in posts], "text_clean": [p["title"] for p in posts]})
+
+def test_cache_reused_by_id(tmp_path):
+    df, out = _posts(), str(tmp_path / "posts.csv")
+    model = CountingModel()
+    embed_frame(df, out, model=model)
+    assert model.encoded == len(df)
+
+    model = CountingModel()
+    grown = pd.concat([df, _posts(25).iloc[20:]], ignore_index=True)
+    emb = embed_frame(grown, out, model=model)
+    assert model.encoded == 5
+    assert emb.shape == (25, CountingModel.dim)
+
+def test_no_id_column_bypasses_cache(tmp_path):
+    df, out = _posts(), str(tmp_path / "posts.csv")
+    embed_frame(df, out, model=CountingModel())
+
+    # same row count, different texts: row positions must not pick up the cached vectors
+    other = pd.DataFrame({"text_clean": [t + " edited!" for t in df["text_clean"]]})
+    model = CountingModel()
+    emb = embed_frame(other, out, model=model)
+    assert model.encoded == len(other)
+    assert np.array_equal(emb, CountingModel().encode(other["text_clean"].tolist()))
+
+    # and a later run with ids doesn't match the "#<row>" rows the bypass wrote
+    model = CountingModel()
+    embed_frame(df, out, model=model)
+    assert model.encoded == len(df)
+    assert all(not i.startswith("#") for i in np.load(cache_paths(out)[1]))
@@ -0,0 +1,54 @@
+"""Offline checks for trends.fold: re-seen posts add only their difference and keep their first terms."""
+import sqlite3
+
+import pandas as pd
+
+from fakereddit import synthetic_corpus
+from trends import fold, terms_of
+
+def _posts(n=10):
+    posts = synthetic_corpus(subreddits=1, posts_per_sub=n, comments_per_post=0)["subreddits"]["synthetic0"]["posts"]
+    return pd.DataFrame({
+        "id": [p["id"] for p in posts],
+        "subreddit": "synthetic0",
+        "created_utc": [p["created_utc"] for p in posts],
+        "score": [p["score"] for p in posts],
+        "num_comments": [p["num_comments"] for p in posts],
+        "text_clean": [p["title"].lower() for p in posts],
+    })
+
+def _term_posts(conn):
+    return dict(conn.execute("SELECT term, SUM(posts) FROM trend_term_daily GROUP BY term").fetchall())
+
+def _term_scores(conn):
+    return dict(conn.execute("SELECT term, SUM(score_sum) FROM trend_term_daily GROUP BY term").fetchall())
+
+def test_refold_does_not_double_count():
+    conn = sqlite3.connect(":memory:")
+    df = _posts()
+    fold(conn, df)
+    before = conn.execute("SELECT SUM(posts), SUM(score_sum) FROM trend_subreddit_daily").fetchone()
+    assert fold(conn, df)["new"] == 0
+    assert conn.execute("SELECT SUM(posts), SUM(score_sum) FROM trend_subreddit_daily").fetchone() == before
+
+def test_edited_post_moves_its_frozen_terms():
+    conn = sqlite3.connect(":memory:")
+    df = _posts()
+    fold(conn, df)
+    posts0, scores0 = _term_posts(conn), _term_scores(conn)
+
+    # the first post is edited to new words and gains score
+    edited = df.copy()
+    edited.loc[0, "text_clean"] = "zzzedited qqqwords"
+    edited.loc[0, "score"] += 100
+    fold(conn, edited)
+
+    posts1, scores1 = _term_posts(conn), _term_scores(conn)
+    assert posts1 == posts0  # no post counted again, and none under its new words
+    assert "zzzedited" not in scores1
+    first = terms_of(df.loc[0, "text_clean"])
+    assert first
+    for t in first:
+        assert scores1[t] == scores0[t] + 100
+    for t in set(scores0) - set(first):
+        assert scores1[t] == scores0[t]
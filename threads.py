@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Thread index over crawled comments: rebuild a thread or subtree without loading every part.
+
+What it does
+- Post-pass over comments.partNNN files (CSV or NDJSON), reading only id / submission_id / parent_id
+- Stores array-backed structure as .npy files (opened memory-mapped):
+    sub_ids, sub_offsets      comments of submission i are rows [sub_offsets[i], sub_offsets[i+1])
+    comment_ids, cid_order    ids + argsort for id → row lookups
+    parent                    row of the parent comment; -1 = top level, -2 = parent not crawled
+    child_offsets, children   CSR child lists (children of row r: children[child_offsets[r]:child_offsets[r+1]])
+    file_idx, byte_offset     where each comment's row lives in its source file
+- Fetching a thread/subtree seeks straight to those rows, so cost is O(thread size)
+
+Usage
+  python threads.py build out/threads "out/comments.part*.csv"
+  python threads.py show out/threads --submission 1abcde -o out/thread_1abcde.csv
+  python threads.py show out/threads --comment k9xyz12
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+ARRAYS = ("sub_ids", "sub_offsets", "comment_ids", "cid_order", "parent",
+          "child_offsets", "children", "file_idx", "byte_offset")
+
+# -----------------------
+# Row scanning
+# -----------------------
+
+def _decoded_lines(fb, state: Dict[str, Any]) -> Iterator[str]:
+    """Decodes a binary file line by line, remembering where the current CSV record started."""
+    pos = fb.tell()
+    for line in fb:
+        if state["start"] is None:
+            state["start"] = pos
+        pos += len(line)
+        yield line.decode("utf-8")
+
+def _scan_csv(path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    csv.field_size_limit(sys.maxsize)
+    state: Dict[str, Any] = {"start": None}
+    with open(path, "rb") as fb:
+        reader = csv.reader(_decoded_lines(fb, state))
+        header = next(reader, None)
+        if header is None:
+            return
+        state["start"] = None
+        for rec in reader:
+            start, state["start"] = state["start"], None
+            yield start, dict(zip(header, rec))
+
+def _scan_ndjson(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    with open(path, "rb") as fb:
+        pos = 0
+        for line in fb:
+            if line.strip():
+                yield pos, json.loads(line)
+            pos += len(line)
+
+def _scan(path: str):
+    return _scan_ndjson(path) if path.lower().endswith(".json") else _scan_csv(path)
+
+def _strip_prefix(fullname: Optional[str]) -> Tuple[str, str]:
+    # "t1_abc" -> ("t1", "abc"); "t3_xyz" -> ("t3", "xyz")
+    s = str(fullname or "")
+    if len(s) > 3 and s[2] == "_":
+        return s[:2], s[3:]
+    return "", s
+
+# -----------------------
+# Build
+# -----------------------
+
+def build_index(paths: List[str], index_dir: str) -> Dict[str, Any]:
+    cids: List[str] = []
+    sids: List[str] = []
+    pids: List[str] = []
+    fidx: List[int] = []
+    offs: List[int] = []
+
+    for i, path in enumerate(paths):
+        for off, row in _scan(path):
+            if not row.get("id") or not row.get("submission_id"):
+                continue
+            cids.append(str(row["id"]))
+            sids.append(str(row["submission_id"]))
+            kind, pid = _strip_prefix(row.get("parent_id"))
+            pids.append(pid if kind == "t1" else "")
+            fidx.append(i)
+            offs.append(off)
+        print(f"[threads] scanned {os.path.basename(path)} (total={len(cids)})")
+
+    n_raw = len(cids)
+    cid_arr = np.array(cids, dtype="S") if cids else np.array([], dtype="S1")
+    sid_arr = np.array(sids, dtype="S") if sids else np.array([], dtype="S1")
+    pid_arr = np.array(pids, dtype="S") if pids else np.array([], dtype="S1")
+    fidx_arr = np.array(fidx, dtype=np.int32)
+    off_arr = np.array(offs, dtype=np.int64)
+    del cids, sids, pids, fidx, offs
+
+    # dedupe ids, keeping the last occurrence (latest crawl of the comment)
+    rev = np.arange(n_raw)[::-1]
+    _, keep_rev = np.unique(cid_arr[rev], return_index=True)
+    keep = np.sort(rev[keep_rev])
+
+    # group by submission, stable within a submission (crawl order)
+    order = keep[np.argsort(sid_arr[keep], kind="stable")]
+    cid_arr, sid_arr, pid_arr = cid_arr[order], sid_arr[order], pid_arr[order]
+    fidx_arr, off_arr = fidx_arr[order], off_arr[order]
+    n = len(cid_arr)
+
+    sub_ids, sub_start = np.unique(sid_arr, return_index=True)
+    sub_offsets = np.append(sub_start, n).astype(np.int64)
+
+    # parent pointers via sorted id lookup
+    cid_order = np.argsort(cid_arr, kind="stable")
+    sorted_ids = cid_arr[cid_order]
+    parent = np.full(n, -1, dtype=np.int32)
+    has_parent = pid_arr != b""
+    if has_parent.any():
+        pos = np.searchsorted(sorted_ids, pid_arr[has_parent])
+        pos_c = np.minimum(pos, max(n - 1, 0))
+        found = (pos < n) & (sorted_ids[pos_c] == pid_arr[has_parent])
+        parent[has_parent] = np.where(found, cid_order[pos_c], -2)
+
+    # CSR child lists
+    linked = np.flatnonzero(parent >= 0)
+    by_parent = linked[np.argsort(parent[linked], kind="stable")]
+    counts = np.bincount(parent[linked], minlength=n) if n else np.zeros(0, dtype=np.int64)
+    child_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    children = by_parent.astype(np.int32)
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {
+        "sub_ids": sub_ids, "sub_offsets": sub_offsets,
+        "comment_ids": cid_arr, "cid_order": cid_order.astype(np.int64),
+        "parent": parent, "child_offsets": child_offsets, "children": children,
+        "file_idx": fidx_arr, "byte_offset": off_arr,
+    }
+    for name, arr in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), arr)
+
+    meta = {
+        "files": [os.path.abspath(p) for p in paths],
+        "n_comments": int(n),
+        "n_submissions": int(len(sub_ids)),
+        "orphans": int((parent == -2).sum()),
+        "built_utc": int(datetime.now(timezone.utc).timestamp()),
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+# -----------------------
+# Read
+# -----------------------
+
+class ThreadIndex:
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.files: List[str] = self.meta["files"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r"))
+        self._headers: Dict[int, List[str]] = {}
+
+    @staticmethod
+    def _key(arr: np.ndarray, key: str) -> Optional[np.ndarray]:
+        # ids longer than the stored width can't be present (and would be truncated by the cast)
+        if not len(arr) or len(key.encode()) > arr.dtype.itemsize:
+            return None
+        return np.array(key, dtype=arr.dtype)
+
+    def _find(self, sorted_arr: np.ndarray, key: str) -> int:
+        k = self._key(sorted_arr, key)
+        if k is None:
+            return -1
+        i = int(np.searchsorted(sorted_arr, k))
+        return i if i < len(sorted_arr) and sorted_arr[i] == k else -1
+
+    def comment_row(self, comment_id: str) -> int:
+        _, cid = _strip_prefix(comment_id)
+        k = self._key(self.comment_ids, cid)
+        if k is None:
+            return -1
+        order = self.cid_order
+        lo, hi = 0, len(order)
+        while lo < hi:  # binary search through the argsort (keeps comment_ids memory-mapped)
+            mid = (lo + hi) // 2
+            if self.comment_ids[order[mid]] < k:
+                lo = mid + 1
+            else:
+                hi = mid
+        return int(order[lo]) if lo < len(order) and self.comment_ids[order[lo]] == k else -1
+
+    def thread_rows(self, submission_id: str) -> np.ndarray:
+        _, sid = _strip_prefix(submission_id)
+        i = self._find(self.sub_ids, sid)
+        if i < 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.arange(self.sub_offsets[i], self.sub_offsets[i + 1])
+
+    def subtree_rows(self, comment_id: str) -> np.ndarray:
+        root = self.comment_row(comment_id)
+        if root < 0:
+            return np.zeros(0, dtype=np.int64)
+        out, frontier = [root], [root]
+        while frontier:
+            nxt = []
+            for r in frontier:
+                nxt.extend(self.children[self.child_offsets[r]:self.child_offsets[r + 1]].tolist())
+            out.extend(nxt)
+            frontier = nxt
+        return np.array(out, dtype=np.int64)
+
+    def _csv_header(self, fi: int) -> List[str]:
+        if fi not in self._headers:
+            with open(self.files[fi], "r", encoding="utf-8", newline="") as f:
+                self._headers[fi] = next(csv.reader(f))
+        return self._headers[fi]
+
+    def read_rows(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """Seeks to each row in its source file; returns dicts in the order of `rows`."""
+        out: Dict[int, Dict[str, Any]] = {}
+        rows = np.asarray(rows, dtype=np.int64)
+        fis = np.asarray(self.file_idx[rows])
+        offs = np.asarray(self.byte_offset[rows])
+        for fi in np.unique(fis):
+            path = self.files[int(fi)]
+            sel = np.flatnonzero(fis == fi)
+            sel = sel[np.argsort(offs[sel])]
+            is_json = path.lower().endswith(".json")
+            header = None if is_json else self._csv_header(int(fi))
+            with open(path, "rb") as fb:
+                for j in sel:
+                    fb.seek(int(offs[j]))
+                    if is_json:
+                        out[int(j)] = json.loads(fb.readline())
+                    else:
+                        rec = next(csv.reader(_decoded_lines(fb, {"start": None})))
+                        out[int(j)] = dict(zip(header, rec))
+        return [out[j] for j in range(len(rows))]
+
+    def thread(self, submission_id: str) -> List[Dict[str, Any]]:
+        return self.read_rows(self.thread_rows(submission_id))
+
+    def subtree(self, comment_id: str) -> List[Dict[str, Any]]:
+        return self.read_rows(self.subtree_rows(comment_id))
+
+# -----------------------
+# CLI
+# -----------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Build / query the comment thread index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Index comment part files")
+    b.add_argument("index_dir", help="Output directory for the index (e.g. out/threads)")
+    b.add_argument("inputs", nargs="+", help="comments.partNNN files or glob patterns")
+
+    s = sub.add_parser("show", help="Print or export a thread / subtree")
+    s.add_argument("index_dir")
+    g = s.add_mutually_exclusive_group(required=True)
+    g.add_argument("--submission", help="Submission id (with or without t3_)")
+    g.add_argument("--comment", help="Comment id (with or without t1_); returns its subtree")
+    s.add_argument("-o", "--output", default=None, help="Write rows to CSV")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        paths: List[str] = []
+        for pat in args.inputs:
+            matched = sorted(glob.glob(pat))
+            if not matched:
+                print(f"[warn] no files matched pattern: {pat}", file=sys.stderr)
+            paths.extend(matched)
+        if not paths:
+            raise SystemExit("[error] no input files found.")
+        meta = build_index(paths, args.index_dir)
+        print(f"[write] thread index → {args.index_dir} "
+              f"(comments={meta['n_comments']}, submissions={meta['n_submissions']}, orphans={meta['orphans']})")
+        return
+
+    idx = ThreadIndex(args.index_dir)
+    rows = idx.thread(args.submission) if args.submission else idx.subtree(args.comment)
+    if args.output:
+        fields: List[str] = []
+        for r in rows:
+            fields.extend(k for k in r if k not in fields)
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=fields)
+            w.writeheader()
+            w.writerows(rows)
+        print(f"[write] → {args.output} ({len(rows)} rows)")
+    else:
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import os, sys, subprocess, itertools
 from pathlib import Path
 from typing import List, Optional
@@ -5,14 +6,18 @@ from typing import List, Optional
 from dotenv import load_dotenv
 import praw
 
+from centroids import ContentCentroids
 from subredditSelector import find_subreddits_for_topics
 
 # ---- setup ----
 load_dotenv()  # loads .env from repo root if present
 SCRIPT_PATH = "redditCrawler.py"  # adjust if your legacy script is elsewhere
 
-# Optional: simple ban list to avoid meme/low-signal subs (edit as you like)
+# Optional: simple ban list to avoid meme/low-signal subs (edit as you like).
+# Only applied with --ban or --no-content: content centroids (centroids.py) already rank
+# subs by what they actually post, which is what this list used to approximate.
 BAN_PATTERNS = ("shit", "toilet", "totally", "circlejerk", "memes")
+CATALOG_DB = "out/catalog.db"
 
 def get_reddit() -> praw.Reddit:
     return praw.Reddit(
@@ -37,7 +42,8 @@ def prompt_topics() -> List[str]:
         topics.append(line)
     return topics
 
-def resolve_subreddits(topics: List[str], reddit: praw.Reddit) -> List[str]:
+def resolve_subreddits(topics: List[str], reddit: praw.Reddit,
+                       centroids: Optional[ContentCentroids] = None, ban: bool = False) -> List[str]:
     topic2subs = find_subreddits_for_topics(
         reddit=reddit,
         topics=topics,
@@ -46,14 +52,16 @@ def resolve_subreddits(topics: List[str], reddit: praw.Reddit) -> List[str]:
         prefer_active=True,
         language_hint="en",
         cache_path="out/topic2subs.json",   # set to None to bypass cache
+        content_centroids=centroids,
     ) or {}
 
     merged = list(dict.fromkeys(
         itertools.chain.from_iterable(v for v in topic2subs.values() if isinstance(v, (list, tuple)))
     ))
 
-    # Filter banned patterns (optional)
-    merged = [s for s in merged if not any(p in s.lower() for p in BAN_PATTERNS)]
+    # Filter banned patterns (optional; always without content centroids)
+    if ban or centroids is None:
+        merged = [s for s in merged if not any(p in s.lower() for p in BAN_PATTERNS)]
 
     print("\n[selector] Topics -> subreddits")
     for t, subs in topic2subs.items():
@@ -93,8 +101,16 @@ def confirm_selection(subs: List[str]) -> bool:
             return False
         print("Please answer y or n.")
 
-def main():
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Topic-driven crawl: pick subreddits for a topic, then crawl them.")
+    ap.add_argument("--no-content", action="store_true",
+                    help="Rank subreddits by description only (no recent-title centroids; applies BAN_PATTERNS)")
+    ap.add_argument("--ban", action="store_true", help="Also drop subreddits matching BAN_PATTERNS")
+    ap.add_argument("--catalog", default=CATALOG_DB,
+                    help=f"Catalog of crawled posts to sample titles from (default: {CATALOG_DB})")
+    args = ap.parse_args(argv)
     reddit = get_reddit()
+    centroids = None if args.no_content else ContentCentroids(catalog_db=args.catalog)
 
     # QoL loop: let user re-enter topics until they confirm
     while True:
@@ -103,7 +119,7 @@ def main():
             print("No topics entered. Exiting.")
             sys.exit(0)
 
-        subreddits = resolve_subreddits(topics, reddit)
+        subreddits = resolve_subreddits(topics, reddit, centroids=centroids, ban=args.ban)
         if not subreddits:
             print("No subreddits found. Try different keywords.\n")
             continue
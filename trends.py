@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Incremental trend rollups: per-(subreddit, dt) and per-(term, dt) daily counts in SQLite.
+
+What it does
+- Folds preprocessed (optionally sentiment-labelled) posts into two small tables:
+    trend_subreddit_daily   subreddit, dt → posts, score_sum, comments_sum, pos, neu, neg
+    trend_term_daily        term, dt      → posts, score_sum, pos, neu, neg
+  Terms are the distinct non-stopword tokens of text_clean (each post counts once per term)
+- Each batch is grouped in pandas and upserted, so only the (key, dt) rows it touches are written
+- Posts already folded in (trend_seen) only move their score / comments / sentiment by the
+  difference — re-ingesting an overlapping crawl never double-counts. A post's terms are frozen at
+  first sight (kept in trend_seen), so an edited post moves the terms it was counted under
+- Input files are remembered by (path, size, mtime); unchanged files are skipped on re-runs
+- Rolling-window series and rising terms are answered from the rollups alone (dt-indexed ranges),
+  never from the raw posts
+
+Usage
+  python trends.py ingest out/catalog.db out/001_with_sentiment.csv "out/preprocessed/*.csv"
+  python trends.py series out/catalog.db --subreddits formula1 nba --days 30 --window 7 -o out/trends_subs.csv
+  python trends.py series out/catalog.db --terms verstappen hamilton --days 30 --window 7
+  python trends.py rising out/catalog.db --days 7 --min-posts 20
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalog import connect, expand_globs
+
+SENTIMENTS = ("pos", "neu", "neg")
+MIN_TERM_LEN = 3
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each even few for from further get got had
+has have having he her here hers herself him himself his how i if im in into is it its itself just
+know like me more most much my myself no nor not now of off on once one only or other our ours
+ourselves out over own people really same she should so some still such than that thats the their
+theirs them themselves then there these they think this those through to too under until up us very
+want was we were what when where which while who whom why will with would you your yours yourself
+yourselves dont doesnt didnt cant wont isnt arent wasnt ive youre theyre
+""".split())
+
+TRENDS_DDL = [
+    "CREATE TABLE IF NOT EXISTS trend_subreddit_daily ("
+    "subreddit TEXT COLLATE NOCASE, dt TEXT, posts INTEGER, score_sum INTEGER, comments_sum INTEGER, "
+    "pos INTEGER, neu INTEGER, neg INTEGER, PRIMARY KEY (subreddit, dt)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS trend_term_daily ("
+    "term TEXT, dt TEXT, posts INTEGER, score_sum INTEGER, pos INTEGER, neu INTEGER, neg INTEGER, "
+    "PRIMARY KEY (term, dt)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_trend_term_dt ON trend_term_daily (dt)",
+    # what each post last contributed, so a re-seen post only adds its difference
+    "CREATE TABLE IF NOT EXISTS trend_seen ("
+    "id TEXT PRIMARY KEY, subreddit TEXT, dt TEXT, score INTEGER, num_comments INTEGER, sentiment TEXT, "
+    "terms TEXT)",
+    "CREATE TABLE IF NOT EXISTS trend_files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, rows INTEGER)",
+]
+
+def ensure_schema(conn: sqlite3.Connection):
+    for ddl in TRENDS_DDL:
+        conn.execute(ddl)
+    if "terms" not in {r[1] for r in conn.execute("PRAGMA table_info(trend_seen)")}:
+        conn.execute("ALTER TABLE trend_seen ADD COLUMN terms TEXT")  # older catalogs
+    conn.commit()
+
+# ---------------- Batch → contributions ----------------
+
+def terms_of(text: Any) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    return sorted({w for w in text.split()
+                   if len(w) >= MIN_TERM_LEN and w not in STOPWORDS and not w.isdigit()})
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """id / subreddit / dt / score / num_comments / sentiment / text_clean, one row per id (last wins)."""
+    if "id" not in df.columns or "subreddit" not in df.columns:
+        raise ValueError("Input must have 'id' and 'subreddit' columns.")
+    out = pd.DataFrame({"id": df["id"].astype(str), "subreddit": df["subreddit"].astype(str)})
+    if "dt" in df.columns:
+        out["dt"] = df["dt"].astype(str)
+    elif "created_utc" in df.columns:
+        ts = pd.to_numeric(df["created_utc"], errors="coerce")
+        out["dt"] = pd.to_datetime(ts, unit="s", utc=True).dt.strftime("%Y-%m-%d")
+    else:
+        raise ValueError("Input must have a 'dt' or 'created_utc' column (run preprocess.py first).")
+    for col in ("score", "num_comments"):
+        out[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(np.int64) if col in df.columns else 0
+    out["sentiment"] = (df["sentiment"].astype(str).str.lower().where(lambda s: s.isin(SENTIMENTS))
+                        if "sentiment" in df.columns else None)
+    out["text_clean"] = df["text_clean"] if "text_clean" in df.columns else ""
+    out = out[out["dt"].str.match(r"\d{4}-\d{2}-\d{2}$", na=False)]
+    return out.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
+
+def _seen(conn: sqlite3.Connection, ids: Sequence[str]) -> pd.DataFrame:
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_ids (id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM batch_ids")
+    conn.executemany("INSERT OR IGNORE INTO batch_ids (id) VALUES (?)", ((i,) for i in ids))
+    rows = conn.execute(
+        "SELECT s.id, s.subreddit, s.dt, s.score, s.num_comments, s.sentiment, s.terms "
+        "FROM trend_seen s JOIN batch_ids b ON b.id = s.id"
+    ).fetchall()
+    return pd.DataFrame(rows, columns=["id", "subreddit", "dt", "score", "num_comments", "sentiment", "terms"])
+
+def contributions(batch: pd.DataFrame, seen: pd.DataFrame) -> pd.DataFrame:
+    """
+    What each post adds to the rollups: the full row for new posts, the difference to what was
+    folded in before for seen ones (counted on their original subreddit/dt and terms).
+    """
+    prev = batch.merge(seen, on="id", how="left", suffixes=("", "_old"))
+    is_seen = prev["dt_old"].notna().to_numpy()
+    frozen = prev["terms"].notna().to_numpy()  # NULL: seen before terms were kept
+    c = pd.DataFrame({
+        "subreddit": prev["subreddit_old"].where(is_seen, prev["subreddit"]),
+        "dt": prev["dt_old"].where(is_seen, prev["dt"]),
+        "terms": [t.split() if f else terms_of(x) for t, f, x in zip(prev["terms"], frozen, prev["text_clean"])],
+        "posts": np.where(is_seen, 0, 1),
+        "score_sum": prev["score"] - prev["score_old"].fillna(0).astype(np.int64),
+        "comments_sum": prev["num_comments"] - prev["num_comments_old"].fillna(0).astype(np.int64),
+    })
+    for s in SENTIMENTS:
+        c[s] = (prev["sentiment"] == s).astype(np.int64) - (prev["sentiment_old"] == s).astype(np.int64)
+    changed = (c[["posts", "score_sum", "comments_sum", *SENTIMENTS]] != 0).any(axis=1)
+    return c[changed]
+
+# ---------------- Upserts ----------------
+
+def _upsert(conn: sqlite3.Connection, table: str, keys: Tuple[str, ...], cols: Tuple[str, ...], rows: pd.DataFrame):
+    if rows.empty:
+        return
+    names = keys + cols
+    sql = (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+           f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+           + ", ".join(f"{c} = {c} + excluded.{c}" for c in cols))
+    conn.executemany(sql, rows[list(names)].itertuples(index=False, name=None))
+
+def fold(conn: sqlite3.Connection, df: pd.DataFrame) -> Dict[str, int]:
+    """Adds a batch of posts to the rollups in one transaction; returns what was touched."""
+    ensure_schema(conn)
+    batch = _prepare(df)
+    if batch.empty:
+        return {"posts": 0, "new": 0, "subreddit_days": 0, "term_days": 0}
+    c = contributions(batch, _seen(conn, batch["id"].tolist()))
+    sums = ["posts", "score_sum", "comments_sum", *SENTIMENTS]
+
+    by_sub = c.groupby(["subreddit", "dt"], as_index=False)[sums].sum()
+    terms = c.rename(columns={"terms": "term"}).explode("term").dropna(subset=["term"])
+    term_sums = ["posts", "score_sum", *SENTIMENTS]
+    by_term = terms.groupby(["term", "dt"], as_index=False)[term_sums].sum()
+
+    with conn:
+        _upsert(conn, "trend_subreddit_daily", ("subreddit", "dt"), tuple(sums), by_sub)
+        _upsert(conn, "trend_term_daily", ("term", "dt"), tuple(term_sums), by_term)
+        # seen posts keep their first subreddit/dt/terms; only the values move
+        conn.executemany(
+            "INSERT INTO trend_seen (id, subreddit, dt, score, num_comments, sentiment, terms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET score = excluded.score, num_comments = excluded.num_comments, "
+            "sentiment = excluded.sentiment, terms = COALESCE(terms, excluded.terms)",
+            [(i, s, d, int(sc), int(nc), se if isinstance(se, str) else None, " ".join(terms_of(t)))
+             for i, s, d, sc, nc, se, t in batch[["id", "subreddit", "dt", "score", "num_comments", "sentiment",
+                                                  "text_clean"]]
+             .itertuples(index=False, name=None)],
+        )
+    return {"posts": len(batch), "new": int(c["posts"].sum()),
+            "subreddit_days": len(by_sub), "term_days": len(by_term)}
+
+def ingest_file(conn: sqlite3.Connection, path: str, force: bool = False, chunksize: int = 100_000) -> int:
+    ensure_schema(conn)
+    st = os.stat(path)
+    known = conn.execute("SELECT size, mtime FROM trend_files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+    if known and not force and known[0] == st.st_size and known[1] == st.st_mtime:
+        return 0
+    rows = 0
+    if path.lower().endswith(".json"):
+        chunks = pd.read_json(path, lines=True, chunksize=chunksize)
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize)
+    for chunk in chunks:
+        rows += fold(conn, chunk)["posts"]
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO trend_files (path, size, mtime, rows) VALUES (?, ?, ?, ?)",
+                     (os.path.abspath(path), st.st_size, st.st_mtime, rows))
+    return rows
+
+# ---------------- Queries ----------------
+
+def _day(s: str) -> date:
+    return datetime.strptime(s, "%Y-%m-%d").date()
+
+def latest_dt(conn: sqlite3.Connection) -> Optional[str]:
+    return conn.execute("SELECT MAX(dt) FROM trend_subreddit_daily").fetchone()[0]
+
+def series(conn: sqlite3.Connection, kind: str, keys: Sequence[str], until: Optional[str] = None,
+           days: int = 30, window: int = 7) -> pd.DataFrame:
+    """
+    Daily rollups for subreddits (kind="subreddit") or terms (kind="term") over the `days` ending
+    at `until` (default: latest dt), with trailing `window`-day sums. Missing days count as zero.
+    Columns: key, dt, posts, score_sum, ..., posts_w, avg_score_w, pos_share_w, net_sentiment_w.
+    """
+    table, col = {"subreddit": ("trend_subreddit_daily", "subreddit"),
+                  "term": ("trend_term_daily", "term")}[kind]
+    until = until or latest_dt(conn) or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    end = _day(until)
+    start = end - timedelta(days=days - 1)
+    lead = start - timedelta(days=window - 1)  # so the first day already has a full window
+    keys = [k.lower() for k in keys]
+
+    sums = ["posts", "score_sum", "comments_sum", *SENTIMENTS] if kind == "subreddit" \
+        else ["posts", "score_sum", *SENTIMENTS]
+    sql = (f"SELECT LOWER({col}), dt, {', '.join(sums)} FROM {table} "
+           f"WHERE {col} IN ({', '.join('?' * len(keys))}) AND dt >= ? AND dt <= ?")
+    raw = pd.DataFrame(conn.execute(sql, [*keys, lead.isoformat(), end.isoformat()]).fetchall(),
+                       columns=["key", "dt", *sums])
+
+    full = pd.MultiIndex.from_product(
+        [keys, pd.date_range(lead, end, freq="D").strftime("%Y-%m-%d")], names=["key", "dt"])
+    daily = raw.groupby(["key", "dt"])[sums].sum().reindex(full, fill_value=0)
+    rolled = daily.groupby(level="key").rolling(window, min_periods=1).sum().droplevel(0)
+
+    out = daily.copy()
+    labelled = rolled[list(SENTIMENTS)].sum(axis=1).replace(0, np.nan)
+    out["posts_w"] = rolled["posts"]
+    out["avg_score_w"] = rolled["score_sum"] / rolled["posts"].replace(0, np.nan)
+    out["pos_share_w"] = rolled["pos"] / labelled
+    out["net_sentiment_w"] = (rolled["pos"] - rolled["neg"]) / labelled
+    out = out.reset_index()
+    return out[out["dt"] >= start.isoformat()].reset_index(drop=True)
+
+def rising_terms(conn: sqlite3.Connection, until: Optional[str] = None, days: int = 7,
+                 min_posts: int = 10, limit: int = 50) -> pd.DataFrame:
+    """
+    Terms ranked by how much more often they appeared in the last `days` than in the `days`
+    before (add-one smoothed ratio), from the term rollups' dt range only.
+    """
+    until = until or latest_dt(conn) or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    end = _day(until)
+    recent_start = end - timedelta(days=days - 1)
+    prev_start = recent_start - timedelta(days=days)
+    sql = (
+        "SELECT term, SUM(CASE WHEN dt >= ? THEN posts ELSE 0 END) AS recent, "
+        "SUM(CASE WHEN dt < ? THEN posts ELSE 0 END) AS previous, "
+        "SUM(CASE WHEN dt >= ? THEN score_sum ELSE 0 END) AS recent_score, "
+        "SUM(CASE WHEN dt >= ? THEN pos - neg ELSE 0 END) AS recent_net "
+        "FROM trend_term_daily WHERE dt >= ? AND dt <= ? GROUP BY term HAVING recent >= ?"
+    )
+    r = recent_start.isoformat()
+    df = pd.DataFrame(conn.execute(sql, [r, r, r, r, prev_start.isoformat(), end.isoformat(), min_posts]).fetchall(),
+                      columns=["term", "recent", "previous", "recent_score", "recent_net"])
+    df["growth"] = (df["recent"] + 1) / (df["previous"] + 1)
+    return df.sort_values(["growth", "recent"], ascending=False).head(limit).reset_index(drop=True)
+
+# ---------------- CLI ----------------
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Incremental per-subreddit / per-term trend rollups.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ig = sub.add_parser("ingest", help="Fold preprocessed / sentiment CSV or NDJSON files into the rollups")
+    ig.add_argument("db", help="SQLite file (e.g. the catalog, see catalog.py)")
+    ig.add_argument("inputs", nargs="+", help="Files or glob patterns")
+    ig.add_argument("--force", action="store_true", help="Re-read files even if unchanged")
+
+    se = sub.add_parser("series", help="Daily + rolling-window series for subreddits or terms")
+    se.add_argument("db")
+    se.add_argument("--subreddits", nargs="*", default=None)
+    se.add_argument("--terms", nargs="*", default=None)
+    se.add_argument("--until", default=None, help="Last day YYYY-MM-DD (default: latest in the rollups)")
+    se.add_argument("--days", type=int, default=30)
+    se.add_argument("--window", type=int, default=7)
+    se.add_argument("-o", "--output", default=None, help="CSV file (default: print)")
+
+    ri = sub.add_parser("rising", help="Terms growing fastest in the last --days vs the days before")
+    ri.add_argument("db")
+    ri.add_argument("--until", default=None)
+    ri.add_argument("--days", type=int, default=7)
+    ri.add_argument("--min-posts", type=int, default=10)
+    ri.add_argument("--limit", type=int, default=50)
+    ri.add_argument("-o", "--output", default=None)
+    args = ap.parse_args(argv)
+
+    conn = connect(args.db)
+    ensure_schema(conn)
+    if args.cmd == "ingest":
+        for path in expand_globs(args.inputs):
+            n = ingest_file(conn, path, force=args.force)
+            print(f"[trends] {os.path.basename(path)}: {n} post(s)" if n else
+                  f"[trends] {os.path.basename(path)}: unchanged, skipped")
+        return
+
+    if args.cmd == "series":
+        if not (args.subreddits or args.terms):
+            sys.exit("series: pass --subreddits and/or --terms")
+        parts = []
+        if args.subreddits:
+            parts.append(series(conn, "subreddit", args.subreddits, args.until, args.days, args.window)
+                         .assign(kind="subreddit"))
+        if args.terms:
+            parts.append(series(conn, "term", args.terms, args.until, args.days, args.window)
+                         .assign(kind="term"))
+        out = pd.concat(parts, ignore_index=True)
+    else:
+        out = rising_terms(conn, args.until, args.days, args.min_posts, args.limit)
+
+    if args.output:
+        out.to_csv(args.output, index=False)
+        print(f"[write] csv → {args.output} (rows={len(out)})")
+    else:
+        with pd.option_context("display.max_rows", 200, "display.width", 200):
+            print(out.to_string(index=False))
+
+if __name__ == "__main__":
+    main()